@@ -1,6 +1,7 @@
 # agents/__init__.py
 """AAHB Multi-Agent System"""
 from .core.orchestrator import AgentOrchestrator
+from .core.async_orchestrator import AsyncAgentOrchestrator
 from .vision_agent import VisionAgent
 from .knowledge_agent import KnowledgeAgent
 from .planning_agent import PlanningAgent
@@ -8,6 +9,7 @@ from .personality_agent import PersonalityAgent
 
 __all__ = [
     "AgentOrchestrator",
+    "AsyncAgentOrchestrator",
     "VisionAgent",
     "KnowledgeAgent",
     "PlanningAgent",
@@ -1,25 +1,5 @@
 # agents/core/mcp_protocol.py
-import time
-import uuid
-from pydantic import BaseModel
-from typing import Dict, Any
+# One message model for the gateway and the agents; see common/mcp_protocol.py
+from common.mcp_protocol import MCPHeader, MCPMessage, STREAM_CHUNK, STREAM_END, BACKEND_ERROR, UNAVAILABLE_ERROR
 
-class MCPHeader(BaseModel):
-    protocol: str = "MCP/1.0"
-    source: str
-    destination: str
-    context_id: str
-    timestamp: float = time.time()
-    message_id: str = str(uuid.uuid4())
-    message_type: str = "request"  # request/response/error
-
-class MCPMessage(BaseModel):
-    header: MCPHeader
-    payload: Dict[str, Any]
-    
-    def serialize(self) -> str:
-        return self.json()
-    
-    @classmethod
-    def deserialize(cls, data: str):
-        return cls.parse_raw(data)
\ No newline at end of file
+__all__ = ["MCPHeader", "MCPMessage", "STREAM_CHUNK", "STREAM_END", "BACKEND_ERROR", "UNAVAILABLE_ERROR"]
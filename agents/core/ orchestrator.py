@@ -1,77 +1,583 @@
 # agents/core/orchestrator.py
 import logging
+import asyncio
 import threading
 import queue
+import itertools
 import time
-from typing import Dict, Callable
+from typing import Dict, Callable, List, Optional
 from common.logger import get_logger
-from .mcp_protocol import MCPMessage
+from .mcp_protocol import MCPHeader, MCPMessage, BACKEND_ERROR, UNAVAILABLE_ERROR
+from .context_store import ContextStore
+from .process_pool import ProcessAgentHandler
+from .circuit_breaker import CircuitBreaker
+from .trace import TraceRecorder
 from common.config import settings
+from common.correlation import ResponseCorrelator
+
+# Sorts ahead of every deadline so stop() wakes idle workers immediately
+_STOP_DEADLINE = float("-inf")
+
+def _stop_item(sequence):
+    return (_STOP_DEADLINE, 0, next(sequence), None, None)
+
+OVERFLOW_POLICIES = ("block", "timeout", "reject")
+
+class AgentQueueFull(queue.Full):
+    """Raised when an agent's queue is full and the message cannot be enqueued"""
+    pass
+
+class AgentWorkerPool:
+    """Bounded queue plus dedicated worker threads for a single agent"""
+    
+    def __init__(
+        self,
+        agent_id: str,
+        handler: Callable,
+        workers: int,
+        queue_size: int,
+        batch_handler: Optional[Callable] = None,
+        max_batch_size: int = 1,
+        max_batch_wait: float = 0.0
+    ):
+        self.agent_id = agent_id
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue = queue.PriorityQueue(maxsize=queue_size)
+        # Called with a list of messages instead of handler when set
+        self.batch_handler = batch_handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_wait = max_batch_wait
+        self.breaker = CircuitBreaker(agent_id) if settings.breaker_enabled else None
+        self.threads: List[threading.Thread] = []
+    
+    def start(self, target: Callable):
+        self.threads = [
+            threading.Thread(
+                target=target,
+                args=(self,),
+                name=f"{self.agent_id}-worker-{i}",
+                daemon=True
+            )
+            for i in range(self.workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+    
+    def stop(self, sequence):
+        # One sentinel per worker; workers keep draining so a full queue frees up
+        for _ in self.threads:
+            self.queue.put(_stop_item(sequence))
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+    
+    def depth(self) -> int:
+        return self.queue.qsize()
 
 class AgentOrchestrator:
     def __init__(self):
         self.agents: Dict[str, Callable] = {}
-        self.message_queue = queue.PriorityQueue()
-        self.context_map = {}
+        self.pools: Dict[str, AgentWorkerPool] = {}
+        self.context_store = ContextStore()
+        self.process_handlers: List[ProcessAgentHandler] = []
         self.logger = get_logger("orchestrator")
         self.running = False
-        self.thread = threading.Thread(target=self._process_messages)
+        self.stats = {"expired": 0, "batches": 0, "batched_messages": 0, "shed": 0, "fast_failed": 0}
+        # Pending request() calls waiting on a reply
+        self.correlator = ResponseCorrelator()
+        # Called with messages whose destination is not a local agent (e.g. broker replies)
+        self.egress: Optional[Callable[[MCPMessage], None]] = None
+        # Set by start_capture() to record traffic for offline replay
+        self.recorder: Optional[TraceRecorder] = None
+        # Tie-breaker so equal priorities never fall through to comparing messages
+        self._sequence = itertools.count()
+        # Runs async agents' coroutines; clients they create stay bound to this one loop
+        self._agent_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._agent_loop_thread: Optional[threading.Thread] = None
+        self._agent_loop_lock = threading.Lock()
+        self._agent_workers = self._parse_agent_workers(settings.orchestrator_agent_workers)
+    
+    def register_agent(
+        self,
+        agent_id: str,
+        agent_handler: Callable,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        batch_handler: Optional[Callable] = None,
+        max_batch_size: Optional[int] = None,
+        max_batch_wait: Optional[float] = None
+    ):
+        """Register an agent handler.
         
-    def register_agent(self, agent_id: str, agent_handler: Callable):
-        self.agents[agent_id.lower()] = agent_handler
-        self.logger.info(f"Registered agent: {agent_id}")
+        With `batch_handler` (usually the agent's process_batch) each worker
+        takes up to `max_batch_size` queued messages, waiting at most
+        `max_batch_wait` seconds for more to arrive, and hands them over in
+        one call. The handler returns one response per message, in order.
+        """
+        agent_key = agent_id.lower()
+        if workers is None:
+            workers = self._agent_workers.get(agent_key, settings.orchestrator_workers)
+        if queue_size is None:
+            queue_size = settings.orchestrator_queue_size
+        max_batch_size, max_batch_wait = self._batch_limits(max_batch_size, max_batch_wait)
         
-    def route_message(self, message: MCPMessage):
-        priority = 1 if message.header.message_type == "request" else 2
-        self.message_queue.put((priority, time.time(), message))
+        pool = AgentWorkerPool(
+            agent_key, agent_handler, workers, queue_size,
+            batch_handler, max_batch_size, max_batch_wait
+        )
+        self.agents[agent_key] = agent_handler
+        self.pools[agent_key] = pool
+        if self.running:
+            pool.start(self._process_messages)
+        batching = f", batch: {max_batch_size}" if batch_handler else ""
+        self.logger.info(f"Registered agent: {agent_id} (workers: {pool.workers}, queue size: {queue_size}{batching})")
+    
+    def register_process_agent(
+        self,
+        agent_id: str,
+        agent_factory: Callable,
+        processes: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        start_method: Optional[str] = None,
+        max_batch_size: Optional[int] = None,
+        max_batch_wait: Optional[float] = None
+    ):
+        """Run an agent in its own pool of worker processes.
+        
+        Meant for CPU-bound agents (vision, speech) that would otherwise
+        contend for the GIL with every other agent in this process.
+        A `max_batch_size` above 1 sends whole batches to the agent's
+        process_batch in one round trip.
+        """
+        processes = processes or settings.agent_processes
+        handler = ProcessAgentHandler(agent_factory, processes, start_method)
+        self.process_handlers.append(handler)
+        batch_handler = handler.process_batch if max_batch_size and max_batch_size > 1 else None
+        # One dispatching thread per process keeps every process busy
+        self.register_agent(
+            agent_id, handler,
+            workers=handler.processes,
+            queue_size=queue_size,
+            batch_handler=batch_handler,
+            max_batch_size=max_batch_size,
+            max_batch_wait=max_batch_wait
+        )
+    
+    def route_message(
+        self,
+        message: MCPMessage,
+        overflow: Optional[str] = None,
+        timeout: Optional[float] = None,
+        on_complete: Optional[Callable[[MCPMessage], None]] = None
+    ) -> bool:
+        """Enqueue a message on its destination agent's queue.
+        
+        When the queue is full the overflow policy decides what happens:
+        'block' waits for space, 'timeout' waits up to `timeout` seconds and
+        'reject' fails immediately. Both of the latter raise AgentQueueFull.
+        `on_complete` is called with the message once its handler has finished.
+        Messages for agents that are not registered locally go to `egress`.
+        Requests to an agent whose circuit is open, or low-priority requests
+        to an overloaded agent, are answered with an error right away.
+        """
+        self._trace(message)
+        target_agent = message.header.destination.lower()
+        pool = self.pools.get(target_agent)
+        if pool is None:
+            return self._egress(message)
+        
+        refusal = self._refusal(pool, message)
+        if refusal is not None:
+            self._forward(refusal)
+            self._complete(message, on_complete)
+            return True
         
+        overflow, timeout = self._overflow_policy(overflow, timeout)
+        item = self._queue_item(message, on_complete)
+        try:
+            if overflow == "block":
+                pool.queue.put(item)
+            elif overflow == "timeout":
+                pool.queue.put(item, timeout=timeout)
+            else:
+                pool.queue.put_nowait(item)
+        except queue.Full:
+            self.logger.warning(f"Queue for {target_agent} is full ({pool.depth()} messages), message rejected")
+            raise AgentQueueFull(f"Queue for agent {target_agent} is full")
+        return True
+    
+    def request(self, message: MCPMessage, timeout: Optional[float] = None) -> MCPMessage:
+        """Route a message and block until its correlated reply arrives.
+        
+        The reply is addressed to the message's source, which must not be a
+        locally registered agent. Raises TimeoutError if no reply arrives.
+        """
+        pending = self.correlator.expect(message)
+        try:
+            routed = self.route_message(message)
+        except Exception:
+            self.correlator.discard(message.header.message_id)
+            raise
+        if not routed:
+            self.correlator.discard(message.header.message_id)
+            raise ValueError(f"Agent {message.header.destination} not found")
+        return pending.result(timeout or settings.orchestrator_request_timeout)
+    
+    def start_capture(self, path: str, include_payloads: bool = False) -> TraceRecorder:
+        """Record every routed message (and handler times) to a trace file"""
+        self.stop_capture()
+        self.recorder = TraceRecorder(path, include_payloads)
+        self.logger.info(f"Capturing MCP traffic to {path}")
+        return self.recorder
+    
+    def stop_capture(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
+    
+    def _trace(self, message: MCPMessage):
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record(message, internal=message.header.source.lower() in self.pools)
+    
+    def _overflow_policy(self, overflow: Optional[str], timeout: Optional[float]):
+        overflow = overflow or settings.orchestrator_overflow_policy
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        if timeout is None:
+            timeout = settings.orchestrator_enqueue_timeout
+        return overflow, timeout
+    
+    def _batch_limits(self, max_batch_size: Optional[int], max_batch_wait: Optional[float]):
+        if max_batch_size is None:
+            max_batch_size = settings.orchestrator_max_batch_size
+        if max_batch_wait is None:
+            max_batch_wait = settings.orchestrator_max_batch_wait
+        return max_batch_size, max_batch_wait
+    
+    def _queue_item(self, message: MCPMessage, on_complete: Optional[Callable] = None):
+        # Earliest deadline first; requests before responses among equal deadlines
+        priority = 1 if message.header.message_type == "request" else 2
+        return (self._deadline(message), priority, next(self._sequence), message, on_complete)
+    
+    def _deadline(self, message: MCPMessage) -> float:
+        header = message.header
+        if header.deadline is not None:
+            return header.deadline
+        if settings.orchestrator_default_budget > 0:
+            return header.timestamp + settings.orchestrator_default_budget
+        return float("inf")
+    
+    def _refusal(self, pool, message: MCPMessage) -> Optional[MCPMessage]:
+        """Error reply for a request that should not be queued, else None"""
+        if message.header.message_type != "request":
+            return None
+        if pool.breaker is not None and pool.breaker.is_open():
+            self.stats["fast_failed"] += 1
+            return self._error_reply(pool, message, f"Circuit open for {pool.agent_id}")
+        if self._should_shed(pool, message):
+            self.stats["shed"] += 1
+            self.logger.warning(
+                f"Shedding priority {message.header.priority} request for {pool.agent_id} ({pool.depth()} queued)"
+            )
+            return self._error_reply(pool, message, f"{pool.agent_id} is overloaded")
+        return None
+    
+    def _should_shed(self, pool, message: MCPMessage) -> bool:
+        capacity = pool.queue.maxsize
+        threshold = capacity * settings.orchestrator_shed_threshold
+        if capacity <= 0 or settings.orchestrator_shed_threshold >= 1 or pool.depth() < threshold:
+            return False
+        # The bar rises from priority 1 at the threshold to 9 on a full queue
+        required = 1 + int(8 * (pool.depth() - threshold) / max(capacity - threshold, 1))
+        return message.header.priority < required
+    
+    def _breaker_allows(self, pool, message: MCPMessage) -> bool:
+        if pool.breaker is None or message.header.message_type != "request":
+            return True
+        if pool.breaker.allow():
+            return True
+        self.stats["fast_failed"] += 1
+        return False
+    
+    def _record_call(self, pool, messages: List[MCPMessage], responses, started: float, failed: bool = False):
+        """Feed the outcome of one handler call to the agent's breaker and the trace"""
+        elapsed = time.monotonic() - started
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record_service(messages, elapsed)
+        if pool.breaker is None:
+            return
+        # One outcome per request, matching the trial slot each took in _breaker_allows
+        for i, message in enumerate(messages):
+            if message.header.message_type != "request":
+                continue
+            # Agents report backend failures as error replies rather than exceptions;
+            # errors about the request itself (e.g. a missing field) say nothing about health
+            ok = not failed and not (responses and self._is_backend_error(responses[i]))
+            pool.breaker.record(ok, elapsed)
+    
+    @staticmethod
+    def _is_backend_error(response) -> bool:
+        return (
+            isinstance(response, MCPMessage)
+            and response.header.message_type == "error"
+            and response.payload.get("error_type") in (BACKEND_ERROR, UNAVAILABLE_ERROR)
+        )
+    
+    def _is_expired(self, pool, message: MCPMessage) -> bool:
+        deadline = self._deadline(message)
+        if time.time() <= deadline:
+            return False
+        self.stats["expired"] += 1
+        self.logger.warning(
+            f"Dropping expired message {message.header.message_id} for {pool.agent_id} "
+            f"({time.time() - deadline:.3f}s past deadline)"
+        )
+        return True
+    
+    def _error_reply(self, pool, message: MCPMessage, error: str) -> Optional[MCPMessage]:
+        """Error response for a request the orchestrator could not run"""
+        # Replies and errors are never answered, which would risk a loop
+        if message.header.message_type != "request":
+            return None
+        return MCPMessage(
+            header=MCPHeader(
+                source=pool.agent_id.upper(),
+                destination=message.header.source,
+                context_id=message.header.context_id,
+                message_type="error",
+                correlation_id=message.header.message_id
+            ),
+            payload={"error": error}
+        )
+    
+    def _egress(self, message: MCPMessage) -> bool:
+        target_agent = message.header.destination.lower()
+        # Replies to in-process request() callers never leave the orchestrator
+        if message.header.message_type != "request" and self.correlator.resolve(message):
+            return True
+        if self.egress is None:
+            self.logger.error(f"Agent {target_agent} not found")
+            # Create error response
+            return False
+        self.egress(message)
+        return True
+    
+    def queue_depths(self) -> Dict[str, int]:
+        return {agent_id: pool.depth() for agent_id, pool in self.pools.items()}
+    
+    def circuit_states(self) -> Dict[str, Dict[str, object]]:
+        return {agent_id: pool.breaker.snapshot() for agent_id, pool in self.pools.items() if pool.breaker}
+    
     def start(self):
         self.running = True
-        self.thread.start()
+        for pool in self.pools.values():
+            pool.start(self._process_messages)
         self.logger.info("Agent orchestrator started")
-        
+    
     def stop(self):
         self.running = False
-        self.thread.join()
+        for pool in self.pools.values():
+            pool.stop(self._sequence)
+        self._stop_agent_loop()
+        self._shutdown_process_handlers()
+        self.stop_capture()
         self.logger.info("Agent orchestrator stopped")
+    
+    def _process_messages(self, pool: AgentWorkerPool):
+        while True:
+            # Block until a message (or the stop sentinel) arrives
+            item = pool.queue.get()
+            if item[3] is None:
+                break
+            if pool.batch_handler is not None:
+                items, stopped = self._collect_batch(pool, item)
+                self._handle_batch(pool, items)
+                if stopped:
+                    break
+                continue
+            _, _, _, message, on_complete = item
+            self._handle_message(pool, message)
+            self._complete(message, on_complete)
+    
+    def _collect_batch(self, pool: AgentWorkerPool, first):
+        """Gather up to max_batch_size items, waiting at most max_batch_wait for stragglers.
         
-    def _process_messages(self):
-        while self.running:
-            if not self.message_queue.empty():
-                _, _, message = self.message_queue.get()
-                self._handle_message(message)
+        Returns the items and whether the stop sentinel was taken off the queue.
+        """
+        items = [first]
+        window_end = time.monotonic() + pool.max_batch_wait
+        while len(items) < pool.max_batch_size:
+            remaining = window_end - time.monotonic()
+            try:
+                # Past the window, still take whatever is already queued
+                item = pool.queue.get(timeout=remaining) if remaining > 0 else pool.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[3] is None:
+                return items, True
+            items.append(item)
+        return items, False
+    
+    def _handle_batch(self, pool: AgentWorkerPool, items):
+        live = []
+        for _, _, _, message, on_complete in items:
+            # Each message gets its own deadline and breaker check, not just the first
+            if self._reject_expired(pool, message) or self._reject_open_circuit(pool, message):
+                self._complete(message, on_complete)
             else:
-                time.sleep(0.1)  # Prevent busy waiting
-                
-    def _handle_message(self, message: MCPMessage):
-        target_agent = message.header.destination.lower()
+                live.append((message, on_complete))
+        if not live:
+            return
+        
+        self._run_batch(pool, [message for message, _ in live])
+        
+        for message, on_complete in live:
+            self._complete(message, on_complete)
+    
+    def _run_batch(self, pool: AgentWorkerPool, messages: List[MCPMessage]):
+        self.logger.debug(f"Dispatching batch of {len(messages)} messages to {pool.agent_id}")
+        self.stats["batches"] += 1
+        self.stats["batched_messages"] += len(messages)
+        started = time.monotonic()
+        try:
+            try:
+                responses = pool.batch_handler(messages)
+                if asyncio.iscoroutine(responses):
+                    responses = self._run_coroutine(responses)
+            finally:
+                # After the agent ran, so recording never parses a payload it left encoded
+                for message in messages:
+                    self.context_store.record(message)
+            self._check_batch(pool, messages, responses)
+            self._record_call(pool, messages, responses, started)
+            
+            # Fan the batch back out as individual replies
+            for response in responses:
+                if isinstance(response, MCPMessage):
+                    self._forward(response)
+        
+        except Exception as e:
+            self._record_call(pool, messages, None, started, failed=True)
+            self.logger.exception(f"Error processing batch: {str(e)}")
+            self._fail_all(pool, messages, f"Error processing message: {str(e)}")
+    
+    def _fail_all(self, pool, messages: List[MCPMessage], error: str):
+        """Answer each request in messages with an error reply"""
+        for message in messages:
+            reply = self._error_reply(pool, message, error)
+            if reply is not None:
+                self._forward(reply)
+    
+    def _check_batch(self, pool, messages: List[MCPMessage], responses):
+        if responses is None or len(responses) != len(messages):
+            count = "no" if responses is None else len(responses)
+            raise ValueError(f"{pool.agent_id} returned {count} responses for a batch of {len(messages)}")
+    
+    def _reject_expired(self, pool, message: MCPMessage) -> bool:
+        """Answer an expired request with an error instead of running it"""
+        if not self._is_expired(pool, message):
+            return False
+        self._fail_all(pool, [message], "Deadline exceeded")
+        return True
+    
+    def _reject_open_circuit(self, pool, message: MCPMessage) -> bool:
+        """Answer a request with an error instead of running it while the circuit is open"""
+        if self._breaker_allows(pool, message):
+            return False
+        self._fail_all(pool, [message], f"Circuit open for {pool.agent_id}")
+        return True
+    
+    def _handle_message(self, pool: AgentWorkerPool, message: MCPMessage):
         context_id = message.header.context_id
         
-        self.logger.debug(f"Routing message to {target_agent} (Context: {context_id})")
+        self.logger.debug(f"Dispatching message to {pool.agent_id} (Context: {context_id})")
         
-        if target_agent not in self.agents:
-            error_msg = f"Agent {target_agent} not found"
-            self.logger.error(error_msg)
-            # Create error response
+        # Skip the work entirely if the caller has already given up
+        if self._reject_expired(pool, message):
             return
         
+        # Fail fast while the agent's backend is known to be unhealthy
+        if self._reject_open_circuit(pool, message):
+            return
+        
+        started = time.monotonic()
         try:
-            # Update context state
-            if context_id not in self.context_map:
-                self.context_map[context_id] = {
-                    "state": "ACTIVE",
-                    "history": []
-                }
-            self.context_map[context_id]["history"].append(message)
-            
-            # Dispatch to agent
-            response = self.agents[target_agent](message)
+            try:
+                # Dispatch to agent
+                response = pool.handler(message)
+                if asyncio.iscoroutine(response):
+                    # Async agents still work in thread mode, on the orchestrator's agent loop
+                    response = self._run_coroutine(response)
+            finally:
+                # Update context state once the agent has parsed (or skipped) the payload
+                self.context_store.record(message)
+            self._record_call(pool, [message], [response], started)
             
             # If agent returns a response message, route it
             if isinstance(response, MCPMessage):
-                self.route_message(response)
-                
+                self._forward(response)
+        
         except Exception as e:
+            self._record_call(pool, [message], None, started, failed=True)
             error_msg = f"Error processing message: {str(e)}"
             self.logger.exception(error_msg)
-            # Create error response
\ No newline at end of file
+            self._fail_all(pool, [message], error_msg)
+    
+    def _forward(self, message: MCPMessage):
+        """Route an agent's reply without letting a full queue stall the worker"""
+        try:
+            self.route_message(message, overflow="timeout")
+        except AgentQueueFull:
+            self.logger.error(f"Dropped reply to {message.header.destination}: queue full")
+    
+    def _run_coroutine(self, coroutine):
+        """Run an async agent call on the shared agent loop and wait for its result.
+        
+        A fresh loop per call (asyncio.run) would strand connection pools that
+        agents create on their first call, such as the OpenAI client's.
+        """
+        with self._agent_loop_lock:
+            if self._agent_loop is None:
+                self._agent_loop = asyncio.new_event_loop()
+                self._agent_loop_thread = threading.Thread(
+                    target=self._agent_loop.run_forever,
+                    name="orchestrator-agent-loop",
+                    daemon=True
+                )
+                self._agent_loop_thread.start()
+            loop = self._agent_loop
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+    
+    def _stop_agent_loop(self):
+        with self._agent_loop_lock:
+            loop, thread = self._agent_loop, self._agent_loop_thread
+            self._agent_loop = self._agent_loop_thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+    
+    def _shutdown_process_handlers(self):
+        for handler in self.process_handlers:
+            handler.shutdown()
+        self.process_handlers = []
+    
+    def _complete(self, message: MCPMessage, on_complete: Optional[Callable]):
+        if on_complete is None:
+            return
+        try:
+            on_complete(message)
+        except Exception as e:
+            self.logger.exception(f"Completion callback failed: {str(e)}")
+    
+    @staticmethod
+    def _parse_agent_workers(spec: str) -> Dict[str, int]:
+        workers = {}
+        for entry in filter(None, (part.strip() for part in spec.split(","))):
+            agent_id, _, count = entry.partition("=")
+            workers[agent_id.strip().lower()] = int(count)
+        return workers
@@ -1,7 +1,15 @@
 # agents/core/__init__.py
 """Core components for the AAHB agent system"""
-from .agent import BaseAgent
-from .orchestrator import AgentOrchestrator
+from .agent import BaseAgent, MCPStream
+from .orchestrator import AgentOrchestrator, AgentQueueFull
 from .mcp_protocol import MCPHeader, MCPMessage
+from .context_store import ContextStore
+from .async_orchestrator import AsyncAgentOrchestrator
+from .broker_consumer import BrokerConsumer
+from .transport_consumer import TransportConsumer
+from .process_pool import ProcessAgentHandler
+from .sharding import ShardedOrchestrator, ProcessShard
+from .circuit_breaker import CircuitBreaker
+from .trace import TraceRecorder, TraceReplayer
 
-__all__ = ["BaseAgent", "AgentOrchestrator", "MCPHeader", "MCPMessage"]
\ No newline at end of file
+__all__ = ["BaseAgent", "MCPStream", "AgentOrchestrator", "AsyncAgentOrchestrator", "AgentQueueFull", "MCPHeader", "MCPMessage", "ContextStore", "BrokerConsumer", "TransportConsumer", "ProcessAgentHandler", "ShardedOrchestrator", "ProcessShard", "CircuitBreaker", "TraceRecorder", "TraceReplayer"]
\ No newline at end of file
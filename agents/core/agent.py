@@ -1,10 +1,36 @@
 # agents/core/agent.py
 import logging
+import asyncio
+import inspect
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List, Optional
 from common.config import settings
 from common.logger import get_logger
-from .mcp_protocol import MCPMessage
+from .mcp_protocol import MCPHeader, MCPMessage, STREAM_CHUNK, STREAM_END
+
+class MCPStream:
+    """Partial output for one request, emitted as stream_chunk messages.
+    
+    Chunks go out through the agent's emitter as soon as `send` is called;
+    `end` builds the stream_end reply that the agent returns in place of a
+    response. Without an emitter (e.g. in a process-pool worker) chunks are
+    dropped and the caller only sees the final result.
+    """
+    
+    def __init__(self, agent: "BaseAgent", request: MCPMessage):
+        self.agent = agent
+        self.request = request
+        self.index = 0
+    
+    def send(self, delta: str):
+        if not delta:
+            return
+        chunk = self.agent._reply(self.request, STREAM_CHUNK, {"delta": delta, "index": self.index})
+        self.index += 1
+        self.agent.emit(chunk)
+    
+    def end(self, response: Dict[str, Any]) -> MCPMessage:
+        return self.agent._reply(self.request, STREAM_END, dict(response, chunks=self.index))
 
 class BaseAgent(ABC):
     def __init__(self, agent_name: str):
@@ -12,7 +38,9 @@ class BaseAgent(ABC):
         self.logger = get_logger(f"agent.{agent_name}")
         self.context = None
         self.initialized = False
-        
+        # Sends messages outside the request/response cycle; set by whoever runs the agent
+        self.emitter: Optional[Callable[[MCPMessage], Any]] = None
+    
     def initialize(self):
         """Initialize agent resources"""
         self.logger.info(f"Initializing {self.name} agent")
@@ -27,20 +55,61 @@ class BaseAgent(ABC):
     
     @abstractmethod
     def process(self, message: MCPMessage) -> Dict[str, Any]:
-        """Main processing method for agents"""
+        """Main processing method for agents.
+        
+        Subclasses may implement this as `async def` for I/O-bound work; the
+        async orchestrator then runs it on its event loop instead of a thread.
+        """
         pass
     
+    def process_batch(self, messages: List[MCPMessage]) -> List[Any]:
+        """Process several messages at once, returning one response per message.
+        
+        The default just calls process for each message; for async agents it
+        returns a coroutine that runs those calls concurrently. Agents whose
+        models run faster on batches (CLIP, YOLO, embedders) override this;
+        the orchestrator only batches agents registered with a batch_handler.
+        """
+        if self.is_async:
+            return self._aprocess_batch(messages)
+        return [self.process(message) for message in messages]
+    
+    async def _aprocess_batch(self, messages: List[MCPMessage]) -> List[Any]:
+        return list(await asyncio.gather(*(self.process(message) for message in messages)))
+    
+    @property
+    def is_async(self) -> bool:
+        """Whether process is a coroutine function"""
+        return inspect.iscoroutinefunction(self.process)
+    
     def send_response(self, original_message: MCPMessage, response: Dict[str, Any]):
         """Send response using MCP protocol"""
-        response_msg = MCPMessage(
+        response_msg = self._reply(original_message, "response", response)
+        self.logger.debug(f"Sending response to {original_message.header.source}")
+        # This would connect to RabbitMQ in production
+        return response_msg
+    
+    def wants_stream(self, message: MCPMessage) -> bool:
+        """Whether the sender asked for partial output"""
+        return bool(message.payload.get("stream"))
+    
+    def open_stream(self, message: MCPMessage) -> MCPStream:
+        return MCPStream(self, message)
+    
+    def emit(self, message: MCPMessage) -> bool:
+        if self.emitter is None:
+            return False
+        self.emitter(message)
+        return True
+    
+    def _reply(self, original_message: MCPMessage, message_type: str, payload: Dict[str, Any]) -> MCPMessage:
+        return MCPMessage(
             header=MCPHeader(
                 source=self.name,
                 destination=original_message.header.source,
                 context_id=original_message.header.context_id,
-                message_type="response"
+                correlation_id=original_message.header.message_id,
+                message_type=message_type
             ),
-            payload=response
-        )
-        self.logger.debug(f"Sending response to {original_message.header.source}")
-        # This would connect to RabbitMQ in production
-        return response_msg
\ No newline at end of file
+            payload=payload
+        )
\ No newline at end of file
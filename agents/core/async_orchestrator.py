@@ -0,0 +1,364 @@
+# agents/core/async_orchestrator.py
+import asyncio
+import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set
+from common.config import settings
+from .mcp_protocol import MCPMessage
+from .orchestrator import AgentOrchestrator, AgentQueueFull, _stop_item
+from .circuit_breaker import CircuitBreaker
+
+class AsyncAgentPool:
+    """Bounded asyncio queue plus consumer tasks for a single agent"""
+    
+    def __init__(
+        self,
+        agent_id: str,
+        handler: Callable,
+        workers: int,
+        queue_size: int,
+        batch_handler: Optional[Callable] = None,
+        max_batch_size: int = 1,
+        max_batch_wait: float = 0.0
+    ):
+        self.agent_id = agent_id
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.is_async = inspect.iscoroutinefunction(handler)
+        self.batch_handler = batch_handler
+        self.batch_is_async = inspect.iscoroutinefunction(batch_handler)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_wait = max_batch_wait
+        self.breaker = CircuitBreaker(agent_id) if settings.breaker_enabled else None
+        self.queue: Optional[asyncio.PriorityQueue] = None
+        self.tasks: List[asyncio.Task] = []
+    
+    def start(self, target: Callable):
+        # Created here so the queue belongs to the orchestrator's running loop
+        self.queue = asyncio.PriorityQueue(maxsize=self.queue_size)
+        self.tasks = [
+            asyncio.create_task(target(self), name=f"{self.agent_id}-task-{i}")
+            for i in range(self.workers)
+        ]
+    
+    async def stop(self, sequence):
+        for _ in self.tasks:
+            await self.queue.put(_stop_item(sequence))
+        await asyncio.gather(*self.tasks)
+        self.tasks = []
+    
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue else 0
+
+class AsyncAgentOrchestrator(AgentOrchestrator):
+    """Orchestrator that runs every agent on one asyncio event loop.
+    
+    Agents whose process method is `async def` run directly on the loop, so
+    many in-flight LLM and Neo4j calls share a single thread. Blocking
+    handlers are offloaded to a thread pool executor. The loop either runs
+    on a background thread (start/stop) or inside the caller's own loop
+    (start_async/stop_async).
+    """
+    
+    def __init__(self, executor_workers: Optional[int] = None):
+        super().__init__()
+        self.pools: Dict[str, AsyncAgentPool] = {}
+        self.executor = ThreadPoolExecutor(
+            max_workers=executor_workers or settings.orchestrator_executor_workers,
+            thread_name_prefix="agent-executor"
+        )
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        # Enqueues started from the loop itself; kept so they are not garbage-collected
+        self._routing: Set[asyncio.Task] = set()
+        self.stats["route_failures"] = 0
+    
+    def register_agent(
+        self,
+        agent_id: str,
+        agent_handler: Callable,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        batch_handler: Optional[Callable] = None,
+        max_batch_size: Optional[int] = None,
+        max_batch_wait: Optional[float] = None
+    ):
+        agent_key = agent_id.lower()
+        is_async = inspect.iscoroutinefunction(agent_handler)
+        if workers is None:
+            default = settings.orchestrator_async_concurrency if is_async else settings.orchestrator_workers
+            workers = self._agent_workers.get(agent_key, default)
+        if queue_size is None:
+            queue_size = settings.orchestrator_queue_size
+        max_batch_size, max_batch_wait = self._batch_limits(max_batch_size, max_batch_wait)
+        
+        pool = AsyncAgentPool(
+            agent_key, agent_handler, workers, queue_size,
+            batch_handler, max_batch_size, max_batch_wait
+        )
+        self.agents[agent_key] = agent_handler
+        self.pools[agent_key] = pool
+        if self.running:
+            self.loop.call_soon_threadsafe(pool.start, self._consume)
+        mode = "async" if is_async else "executor"
+        batching = f", batch: {max_batch_size}" if batch_handler else ""
+        self.logger.info(
+            f"Registered agent: {agent_id} ({mode}, concurrency: {pool.workers}, queue size: {queue_size}{batching})"
+        )
+    
+    def route_message(
+        self,
+        message: MCPMessage,
+        overflow: Optional[str] = None,
+        timeout: Optional[float] = None,
+        on_complete: Optional[Callable[[MCPMessage], None]] = None
+    ) -> bool:
+        """Thread-safe entry point; blocks the calling thread for backpressure"""
+        if not self.running:
+            raise RuntimeError("Async orchestrator is not running")
+        coroutine = self.aroute_message(message, overflow, timeout, on_complete)
+        if self._on_loop():
+            # Cannot wait on our own loop; enqueue in the background instead
+            task = self.loop.create_task(coroutine, name=f"route-{message.header.destination.lower()}")
+            self._routing.add(task)
+            task.add_done_callback(self._routed)
+            return True
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+    
+    async def aroute_message(
+        self,
+        message: MCPMessage,
+        overflow: Optional[str] = None,
+        timeout: Optional[float] = None,
+        on_complete: Optional[Callable[[MCPMessage], None]] = None
+    ) -> bool:
+        self._trace(message)
+        target_agent = message.header.destination.lower()
+        pool = self.pools.get(target_agent)
+        if pool is None or pool.queue is None:
+            return self._egress(message)
+        
+        refusal = self._refusal(pool, message)
+        if refusal is not None:
+            await self._aforward(refusal)
+            self._complete(message, on_complete)
+            return True
+        
+        overflow, timeout = self._overflow_policy(overflow, timeout)
+        item = self._queue_item(message, on_complete)
+        try:
+            if overflow == "block":
+                await pool.queue.put(item)
+            elif overflow == "timeout":
+                await asyncio.wait_for(pool.queue.put(item), timeout)
+            else:
+                pool.queue.put_nowait(item)
+        except (asyncio.QueueFull, asyncio.TimeoutError):
+            self.logger.warning(f"Queue for {target_agent} is full ({pool.depth()} messages), message rejected")
+            raise AgentQueueFull(f"Queue for agent {target_agent} is full")
+        return True
+    
+    async def arequest(self, message: MCPMessage, timeout: Optional[float] = None) -> MCPMessage:
+        """Route a message on the loop and await its correlated reply"""
+        pending = self.correlator.expect(message)
+        try:
+            routed = await self.aroute_message(message)
+        except Exception:
+            self.correlator.discard(message.header.message_id)
+            raise
+        if not routed:
+            self.correlator.discard(message.header.message_id)
+            raise ValueError(f"Agent {message.header.destination} not found")
+        return await pending.wait(timeout or settings.orchestrator_request_timeout)
+    
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        
+        def run_loop():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self.start_async())
+            started.set()
+            self.loop.run_forever()
+            self.loop.close()
+        
+        self.thread = threading.Thread(target=run_loop, name="orchestrator-loop", daemon=True)
+        self.thread.start()
+        started.wait()
+    
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.stop_async(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.executor.shutdown(wait=True)
+    
+    async def start_async(self):
+        self.loop = asyncio.get_running_loop()
+        self.running = True
+        for pool in self.pools.values():
+            pool.start(self._consume)
+        self.logger.info("Async agent orchestrator started")
+    
+    async def stop_async(self):
+        self.running = False
+        # Let background enqueues land while the consumers still drain
+        while self._routing:
+            await asyncio.gather(*list(self._routing), return_exceptions=True)
+        for pool in self.pools.values():
+            await pool.stop(self._sequence)
+        self._shutdown_process_handlers()
+        self.stop_capture()
+        self.logger.info("Async agent orchestrator stopped")
+    
+    async def _consume(self, pool: AsyncAgentPool):
+        while True:
+            item = await pool.queue.get()
+            if item[3] is None:
+                break
+            if pool.batch_handler is not None:
+                items, stopped = await self._acollect_batch(pool, item)
+                await self._ahandle_batch(pool, items)
+                if stopped:
+                    break
+                continue
+            _, _, _, message, on_complete = item
+            await self._ahandle_message(pool, message)
+            self._complete(message, on_complete)
+    
+    async def _acollect_batch(self, pool: AsyncAgentPool, first):
+        items = [first]
+        window_end = time.monotonic() + pool.max_batch_wait
+        while len(items) < pool.max_batch_size:
+            remaining = window_end - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = await asyncio.wait_for(pool.queue.get(), remaining)
+                else:
+                    item = pool.queue.get_nowait()
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if item[3] is None:
+                return items, True
+            items.append(item)
+        return items, False
+    
+    async def _ahandle_batch(self, pool: AsyncAgentPool, items):
+        live = []
+        for _, _, _, message, on_complete in items:
+            if await self._areject_expired(pool, message) or await self._areject_open_circuit(pool, message):
+                self._complete(message, on_complete)
+            else:
+                live.append((message, on_complete))
+        if not live:
+            return
+        
+        await self._arun_batch(pool, [message for message, _ in live])
+        
+        for message, on_complete in live:
+            self._complete(message, on_complete)
+    
+    async def _arun_batch(self, pool: AsyncAgentPool, messages: List[MCPMessage]):
+        self.logger.debug(f"Dispatching batch of {len(messages)} messages to {pool.agent_id}")
+        self.stats["batches"] += 1
+        self.stats["batched_messages"] += len(messages)
+        started = time.monotonic()
+        try:
+            try:
+                if pool.batch_is_async:
+                    responses = await pool.batch_handler(messages)
+                else:
+                    responses = await self.loop.run_in_executor(self.executor, pool.batch_handler, messages)
+                    if asyncio.iscoroutine(responses):
+                        # e.g. BaseAgent.process_batch of an async agent
+                        responses = await responses
+            finally:
+                for message in messages:
+                    self.context_store.record(message)
+            self._check_batch(pool, messages, responses)
+            self._record_call(pool, messages, responses, started)
+            
+            for response in responses:
+                if isinstance(response, MCPMessage):
+                    await self._aforward(response)
+        
+        except Exception as e:
+            self._record_call(pool, messages, None, started, failed=True)
+            self.logger.exception(f"Error processing batch: {str(e)}")
+            await self._afail_all(pool, messages, f"Error processing message: {str(e)}")
+    
+    async def _afail_all(self, pool: AsyncAgentPool, messages: List[MCPMessage], error: str):
+        for message in messages:
+            reply = self._error_reply(pool, message, error)
+            if reply is not None:
+                await self._aforward(reply)
+    
+    async def _areject_expired(self, pool: AsyncAgentPool, message: MCPMessage) -> bool:
+        if not self._is_expired(pool, message):
+            return False
+        await self._afail_all(pool, [message], "Deadline exceeded")
+        return True
+    
+    async def _areject_open_circuit(self, pool: AsyncAgentPool, message: MCPMessage) -> bool:
+        if self._breaker_allows(pool, message):
+            return False
+        await self._afail_all(pool, [message], f"Circuit open for {pool.agent_id}")
+        return True
+    
+    async def _ahandle_message(self, pool: AsyncAgentPool, message: MCPMessage):
+        context_id = message.header.context_id
+        
+        self.logger.debug(f"Dispatching message to {pool.agent_id} (Context: {context_id})")
+        
+        if await self._areject_expired(pool, message):
+            return
+        
+        if await self._areject_open_circuit(pool, message):
+            return
+        
+        started = time.monotonic()
+        try:
+            try:
+                # Dispatch to agent: coroutines on the loop, blocking calls on the executor
+                if pool.is_async:
+                    response = await pool.handler(message)
+                else:
+                    response = await self.loop.run_in_executor(self.executor, pool.handler, message)
+                    if asyncio.iscoroutine(response):
+                        # A sync wrapper around an async agent, e.g. a lambda or partial
+                        response = await response
+            finally:
+                # Update context state once the agent has parsed (or skipped) the payload
+                self.context_store.record(message)
+            self._record_call(pool, [message], [response], started)
+            
+            # If agent returns a response message, route it
+            if isinstance(response, MCPMessage):
+                await self._aforward(response)
+        
+        except Exception as e:
+            self._record_call(pool, [message], None, started, failed=True)
+            error_msg = f"Error processing message: {str(e)}"
+            self.logger.exception(error_msg)
+            await self._afail_all(pool, [message], error_msg)
+    
+    async def _aforward(self, message: MCPMessage):
+        try:
+            await self.aroute_message(message, overflow="timeout")
+        except AgentQueueFull:
+            self.logger.error(f"Dropped reply to {message.header.destination}: queue full")
+    
+    def _routed(self, task: asyncio.Task):
+        self._routing.discard(task)
+        if task.cancelled() or task.exception() is None:
+            return
+        self.stats["route_failures"] += 1
+        self.logger.error(f"Background {task.get_name()} failed: {str(task.exception())}")
+    
+    def _on_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
@@ -0,0 +1,272 @@
+# agents/core/broker_consumer.py
+import asyncio
+import functools
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set
+import aio_pika
+from common.config import settings
+from common.compression import compression_stats, decompress
+from common.mcp_codec import decode_message
+from common.logger import get_logger
+from common.publisher import MCPPublisher
+from common.topology import TopologyManager
+from .mcp_protocol import MCPMessage
+from .orchestrator import AgentOrchestrator, AgentQueueFull
+
+EXCHANGE_NAME = "aahb.mcp"
+
+class BrokerConsumer:
+    """Feeds MCP messages from the aahb.mcp exchange into an orchestrator.
+    
+    Each registered agent gets the queues laid out by TopologyManager: a
+    priority queue for interactive traffic and a bulk queue, both consumed
+    here, plus a dead-letter queue. In-flight deliveries are capped by the
+    channel prefetch, shared by all of them, and acknowledged in batches
+    with multiple=True once their handlers finish. Messages addressed to
+    anything that is not a local agent, replies included, leave through an
+    MCPPublisher, so they get publisher confirms, its in-flight cap and the
+    same shard and lane routing keys as requests from the gateway.
+    """
+    
+    def __init__(
+        self,
+        orchestrator: AgentOrchestrator,
+        connect: Optional[Callable[[], Awaitable]] = None,
+        exchange_name: str = EXCHANGE_NAME,
+        prefetch: Optional[int] = None,
+        ack_batch_size: Optional[int] = None,
+        ack_interval: Optional[float] = None,
+        requeue_delay: Optional[float] = None,
+        shard_id: Optional[str] = None,
+        topology: Optional[TopologyManager] = None,
+        publisher: Optional[MCPPublisher] = None
+    ):
+        self.orchestrator = orchestrator
+        self.connect = connect or self._connect
+        self.exchange_name = exchange_name
+        self.prefetch = prefetch or settings.broker_prefetch
+        self.ack_batch_size = ack_batch_size or settings.broker_ack_batch_size
+        self.ack_interval = ack_interval or settings.broker_ack_interval
+        self.requeue_delay = requeue_delay if requeue_delay is not None else settings.broker_requeue_delay
+        # Node shards consume '<agent>.<shard>' keys so each context lands on one node
+        self.shard_id = shard_id if shard_id is not None else settings.shard_id
+        self.topology = topology or TopologyManager(exchange_name)
+        # Our own publisher unless one is shared with the rest of the process
+        self._owns_publisher = publisher is None
+        self.publisher = publisher or MCPPublisher(connect=self.connect, exchange_name=exchange_name)
+        self.logger = get_logger("broker_consumer")
+        self.connection = None
+        self.channel = None
+        self.exchange = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # Delivered but not yet acked, and the subset whose handlers are done
+        self._pending: Dict[int, aio_pika.abc.AbstractIncomingMessage] = {}
+        self._done: Set[int] = set()
+        self._ack_lock = asyncio.Lock()
+        self._ack_task: Optional[asyncio.Task] = None
+        self._stats_task: Optional[asyncio.Task] = None
+        # Time the prefetch window was full, i.e. the broker could not deliver to us
+        self._started_at: Optional[float] = None
+        self._full_since: Optional[float] = None
+        self._full_seconds = 0.0
+        self.stats = {"received": 0, "acked": 0, "ack_frames": 0, "requeued": 0, "rejected": 0, "replies": 0}
+    
+    async def _connect(self):
+        return await aio_pika.connect_robust(
+            host=settings.rabbitmq_host,
+            login=settings.rabbitmq_user,
+            password=settings.rabbitmq_password
+        )
+    
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.connection = await self.connect()
+        self.channel = await self.connection.channel()
+        # One window for all agent queues on the channel, not one per consumer
+        await self.channel.set_qos(prefetch_count=self.prefetch, global_=True)
+        
+        self.exchange = await self.channel.declare_exchange(
+            self.exchange_name,
+            aio_pika.ExchangeType.DIRECT,
+            durable=True
+        )
+        for agent_id in self.orchestrator.agents:
+            routing_key = f"{agent_id}.{self.shard_id}" if self.shard_id else agent_id
+            queues = await self.topology.declare_agent(self.channel, self.exchange, routing_key.lower())
+            for queue in queues.consumable:
+                await queue.consume(self._on_message)
+                self.logger.info(f"Consuming {agent_id} messages from {queue.name}")
+        
+        await self.publisher.start()
+        self.orchestrator.egress = self.publish_reply
+        self._started_at = time.monotonic()
+        self._ack_task = asyncio.create_task(self._flush_periodically())
+        if settings.broker_stats_interval > 0:
+            self._stats_task = asyncio.create_task(self._report_periodically())
+        self.logger.info(f"Broker consumer started (prefetch: {self.prefetch}, ack batch: {self.ack_batch_size})")
+    
+    async def stop(self):
+        for task in (self._ack_task, self._stats_task):
+            if task:
+                task.cancel()
+        self._ack_task = self._stats_task = None
+        await self._flush_acks(force=True)
+        self.orchestrator.egress = None
+        if self._owns_publisher:
+            await self.publisher.close()
+        else:
+            await self.publisher.flush()
+        if self.connection:
+            await self.connection.close()
+        self.logger.info(f"Broker consumer stopped (compression: {compression_stats()})")
+    
+    async def run(self):
+        """Consume until cancelled"""
+        await self.start()
+        try:
+            await asyncio.Future()
+        finally:
+            await self.stop()
+    
+    def publish_reply(self, message: MCPMessage):
+        """Orchestrator egress hook; safe to call from worker threads"""
+        future = asyncio.run_coroutine_threadsafe(self._publish(message), self.loop)
+        future.add_done_callback(self._log_publish_failure)
+    
+    async def _publish(self, message: MCPMessage):
+        # Waits only for a slot in the publisher's window; the confirm is tracked there
+        await self.publisher.publish(message)
+        self.stats["replies"] += 1
+    
+    def _log_publish_failure(self, future):
+        if not future.cancelled() and future.exception():
+            self.logger.error(f"Failed to publish reply: {str(future.exception())}")
+    
+    async def _on_message(self, incoming):
+        self._pending[incoming.delivery_tag] = incoming
+        self._track_window()
+        self.stats["received"] += 1
+        
+        try:
+            message = decode_message(decompress(incoming.body, incoming.content_encoding), incoming.content_type)
+        except Exception as e:
+            self.logger.error(f"Rejecting malformed MCP message: {str(e)}")
+            await self._settle(incoming, requeue=False)
+            return
+        
+        on_complete = functools.partial(self._handled, incoming.delivery_tag)
+        try:
+            routed = await self._route(message, on_complete)
+        except AgentQueueFull:
+            # Hold it before handing it back: requeued at once, it would be
+            # redelivered and refused again in a tight loop. While held it
+            # fills the prefetch window, which pauses delivery.
+            await asyncio.sleep(self.requeue_delay)
+            await self._settle(incoming, requeue=True)
+            return
+        if not routed:
+            await self._settle(incoming, requeue=False)
+    
+    async def _route(self, message: MCPMessage, on_complete: Callable) -> bool:
+        # Never block the consumer loop: a full agent queue is reported, not waited on
+        if getattr(self.orchestrator, "loop", None) is self.loop:
+            return await self.orchestrator.aroute_message(message, overflow="reject", on_complete=on_complete)
+        return self.orchestrator.route_message(message, overflow="reject", on_complete=on_complete)
+    
+    def _handled(self, delivery_tag: int, message: MCPMessage):
+        # Runs on an orchestrator worker; hop back onto the consumer loop
+        self.loop.call_soon_threadsafe(self._mark_done, delivery_tag)
+    
+    def _mark_done(self, delivery_tag: int):
+        self._done.add(delivery_tag)
+        if len(self._done) >= self.ack_batch_size:
+            asyncio.ensure_future(self._flush_acks())
+    
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.ack_interval)
+            await self._flush_acks(force=True)
+    
+    async def _flush_acks(self, force: bool = False):
+        """Ack the longest run of finished deliveries with one multiple-ack.
+        
+        Deliveries finished behind a still-running one cannot be covered by
+        a multiple-ack; on a forced (timer) flush they are acked one by one
+        so a slow handler does not hold the whole prefetch window.
+        """
+        async with self._ack_lock:
+            if not self._done:
+                return
+            watermark = None
+            for tag in sorted(self._pending):
+                if tag not in self._done:
+                    break
+                watermark = tag
+            
+            if watermark is not None:
+                acked = [tag for tag in self._pending if tag <= watermark]
+                await self._pending[watermark].ack(multiple=True)
+                self.stats["ack_frames"] += 1
+                self.stats["acked"] += len(acked)
+                for tag in acked:
+                    self._pending.pop(tag, None)
+                    self._done.discard(tag)
+                self._track_window()
+            
+            if force:
+                for tag in sorted(self._done):
+                    self._done.discard(tag)
+                    incoming = self._pending.pop(tag, None)
+                    if incoming is None:
+                        continue
+                    await incoming.ack()
+                    self.stats["ack_frames"] += 1
+                    self.stats["acked"] += 1
+                self._track_window()
+    
+    async def _settle(self, incoming, requeue: bool):
+        # Drop the tag first so a concurrent multiple-ack cannot cover it
+        self._pending.pop(incoming.delivery_tag, None)
+        self._done.discard(incoming.delivery_tag)
+        self._track_window()
+        if requeue:
+            await incoming.nack(requeue=True)
+            self.stats["requeued"] += 1
+        else:
+            await incoming.reject(requeue=False)
+            self.stats["rejected"] += 1
+    
+    def _track_window(self):
+        full = len(self._pending) >= self.prefetch
+        if full and self._full_since is None:
+            self._full_since = time.monotonic()
+        elif not full and self._full_since is not None:
+            self._full_seconds += time.monotonic() - self._full_since
+            self._full_since = None
+    
+    def utilization(self) -> Optional[float]:
+        """Share of time since start the broker could deliver to this consumer right away.
+        
+        Like RabbitMQ's consumer utilisation: low values mean the prefetch
+        window sat full, so the agents, not the broker, are the bottleneck.
+        """
+        if self._started_at is None:
+            return None
+        now = time.monotonic()
+        elapsed = now - self._started_at
+        if elapsed <= 0:
+            return 1.0
+        full = self._full_seconds + (now - self._full_since if self._full_since is not None else 0)
+        return round(max(1 - full / elapsed, 0.0), 4)
+    
+    async def topology_stats(self) -> Dict:
+        """Depth and consumers per agent queue, plus this consumer's utilization"""
+        return {"queues": await self.topology.queue_stats(self.channel), "utilization": self.utilization()}
+    
+    async def _report_periodically(self):
+        while True:
+            await asyncio.sleep(settings.broker_stats_interval)
+            try:
+                self.logger.info(f"Broker queues: {await self.topology_stats()}")
+            except Exception as e:
+                self.logger.warning(f"Could not read queue stats: {str(e)}")
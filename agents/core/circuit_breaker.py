@@ -0,0 +1,120 @@
+# agents/core/circuit_breaker.py
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+from common.config import settings
+from common.logger import get_logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+logger = get_logger("circuit_breaker")
+
+class CircuitBreaker:
+    """Per-agent breaker driven by error rate and latency.
+    
+    Failed calls and calls slower than `slow_call` seconds both count as
+    failures. Once at least `min_calls` of the last `window` calls were
+    recorded and the failure share reaches `failure_rate`, the breaker
+    opens and calls fail fast. After `reset_timeout` seconds it lets
+    `half_open_calls` trial calls through: if all succeed it closes,
+    any failure opens it again.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        window: Optional[int] = None,
+        min_calls: Optional[int] = None,
+        failure_rate: Optional[float] = None,
+        slow_call: Optional[float] = None,
+        reset_timeout: Optional[float] = None,
+        half_open_calls: Optional[int] = None
+    ):
+        self.name = name
+        self.window = window or settings.breaker_window
+        self.min_calls = min_calls or settings.breaker_min_calls
+        self.failure_rate = failure_rate or settings.breaker_failure_rate
+        self.slow_call = slow_call or settings.breaker_slow_call
+        self.reset_timeout = reset_timeout if reset_timeout is not None else settings.breaker_reset_timeout
+        self.half_open_calls = half_open_calls or settings.breaker_half_open_calls
+        self._state = CLOSED
+        self._calls = deque(maxlen=self.window)
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "rejected": 0, "failures": 0, "slow": 0}
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+    
+    def is_open(self) -> bool:
+        """True while calls should fail fast; does not use up a trial call"""
+        return self.state == OPEN
+    
+    def allow(self) -> bool:
+        """Whether a call may run now; in half-open state this takes a trial slot"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._trials < self.half_open_calls:
+                self._trials += 1
+                return True
+            self.stats["rejected"] += 1
+            return False
+    
+    def record(self, success: bool, latency: float):
+        slow = latency > self.slow_call
+        failed = not success or slow
+        with self._lock:
+            if not success:
+                self.stats["failures"] += 1
+            if slow:
+                self.stats["slow"] += 1
+            state = self._current_state(time.monotonic())
+            if state == HALF_OPEN:
+                if failed:
+                    self._open(f"trial call failed ({latency:.2f}s)")
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_calls:
+                        self._close()
+                return
+            if state == OPEN:
+                # A call admitted before the breaker tripped; it changes nothing
+                return
+            self._calls.append(failed)
+            if len(self._calls) >= self.min_calls:
+                rate = sum(self._calls) / len(self._calls)
+                if rate >= self.failure_rate:
+                    self._open(f"{rate:.0%} of the last {len(self._calls)} calls failed or were slow")
+    
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return dict(self.stats, state=self._current_state(time.monotonic()))
+    
+    def _current_state(self, now: float) -> str:
+        # Caller holds the lock
+        if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trials = 0
+            self._trial_successes = 0
+        return self._state
+    
+    def _open(self, reason: str):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        self.stats["opened"] += 1
+        logger.warning(f"Circuit for {self.name} opened: {reason}")
+    
+    def _close(self):
+        self._state = CLOSED
+        self._calls.clear()
+        logger.info(f"Circuit for {self.name} closed")
@@ -0,0 +1,178 @@
+# agents/core/context_store.py
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+from common.config import settings
+from common.logger import get_logger
+from .mcp_protocol import MCPMessage
+
+logger = get_logger("context_store")
+
+# Lists longer than this are summarised instead of copied into history
+_MAX_LIST_ITEMS = 32
+
+class ContextStore:
+    """Bounded per-context state and history.
+    
+    Contexts are kept in LRU order and dropped when they exceed the TTL or
+    when the store is full. History keeps only compact records of each
+    message: header fields plus payload values, with large strings and all
+    binary data replaced by a size marker. Payloads still encoded on the
+    wire (see MCPMessage.lazy) are marked as unparsed instead of decoded.
+    """
+    
+    def __init__(
+        self,
+        max_contexts: Optional[int] = None,
+        ttl: Optional[float] = None,
+        history_limit: Optional[int] = None,
+        payload_limit: Optional[int] = None
+    ):
+        self.max_contexts = max_contexts if max_contexts is not None else settings.context_max_entries
+        self.ttl = ttl if ttl is not None else settings.context_ttl
+        self.history_limit = history_limit if history_limit is not None else settings.context_history_limit
+        self.payload_limit = payload_limit if payload_limit is not None else settings.context_payload_limit
+        self._contexts: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+    
+    def record(self, message: MCPMessage) -> Dict[str, Any]:
+        """Append a compact record of the message to its context's history"""
+        context_id = message.header.context_id
+        record = self.compact(message)
+        now = time.time()
+        
+        with self._lock:
+            self._expire(now)
+            entry = self._lookup(context_id, now)
+            if entry is None:
+                entry = {
+                    "state": "ACTIVE",
+                    "history": deque(maxlen=self.history_limit),
+                    "created": now,
+                    "last_access": now
+                }
+                self._contexts[context_id] = entry
+                self._evict()
+            entry["history"].append(record)
+        return record
+    
+    def get(self, context_id: str) -> Optional[Dict[str, Any]]:
+        """Return a snapshot of the context, or None if unknown or expired"""
+        with self._lock:
+            entry = self._lookup(context_id, time.time())
+            if entry is None:
+                return None
+            return {
+                "state": entry["state"],
+                "history": list(entry["history"]),
+                "created": entry["created"],
+                "last_access": entry["last_access"]
+            }
+    
+    def history(self, context_id: str) -> List[Dict[str, Any]]:
+        context = self.get(context_id)
+        return context["history"] if context else []
+    
+    def set_state(self, context_id: str, state: str) -> bool:
+        with self._lock:
+            entry = self._lookup(context_id, time.time())
+            if entry is None:
+                return False
+            entry["state"] = state
+            return True
+    
+    def restore(self, context_id: str, snapshot: Dict[str, Any]):
+        """Install a context taken with get(), e.g. when it moves to another shard"""
+        now = time.time()
+        with self._lock:
+            self._contexts[context_id] = {
+                "state": snapshot["state"],
+                "history": deque(snapshot["history"], maxlen=self.history_limit),
+                "created": snapshot["created"],
+                "last_access": now
+            }
+            self._contexts.move_to_end(context_id)
+            self._evict()
+    
+    def remove(self, context_id: str) -> bool:
+        with self._lock:
+            return self._contexts.pop(context_id, None) is not None
+    
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._expire(time.time())
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, size=len(self._contexts))
+    
+    def __len__(self) -> int:
+        return len(self._contexts)
+    
+    def __contains__(self, context_id: str) -> bool:
+        return self.get(context_id) is not None
+    
+    def compact(self, message: MCPMessage) -> Dict[str, Any]:
+        header = message.header
+        return {
+            "message_id": header.message_id,
+            "source": header.source,
+            "destination": header.destination,
+            "message_type": header.message_type,
+            "timestamp": header.timestamp,
+            # Never parse a payload the agent left encoded just to summarise it
+            "payload": self._compact_value(message.payload) if message.payload_loaded else {"omitted": "unparsed"}
+        }
+    
+    def _compact_value(self, value: Any) -> Any:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return {"omitted": "bytes", "size": len(value)}
+        if isinstance(value, str):
+            if len(value) > self.payload_limit:
+                return {"omitted": "str", "size": len(value)}
+            return value
+        if isinstance(value, dict):
+            return {key: self._compact_value(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            if len(value) > _MAX_LIST_ITEMS:
+                return {"omitted": "list", "size": len(value)}
+            return [self._compact_value(item) for item in value]
+        if value is None or isinstance(value, (int, float, bool)):
+            return value
+        return {"omitted": type(value).__name__}
+    
+    def _lookup(self, context_id: str, now: float) -> Optional[Dict[str, Any]]:
+        # Caller holds the lock
+        entry = self._contexts.get(context_id)
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        if self.ttl and now - entry["last_access"] > self.ttl:
+            del self._contexts[context_id]
+            self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            return None
+        entry["last_access"] = now
+        self._contexts.move_to_end(context_id)
+        self._stats["hits"] += 1
+        return entry
+    
+    def _expire(self, now: float) -> int:
+        # LRU order is also last-access order, so expired entries sit at the front
+        expired = 0
+        while self.ttl and self._contexts:
+            context_id, entry = next(iter(self._contexts.items()))
+            if now - entry["last_access"] <= self.ttl:
+                break
+            del self._contexts[context_id]
+            expired += 1
+        self._stats["expirations"] += expired
+        return expired
+    
+    def _evict(self):
+        while self.max_contexts and len(self._contexts) > self.max_contexts:
+            context_id, _ = self._contexts.popitem(last=False)
+            self._stats["evictions"] += 1
+            logger.debug(f"Evicted context {context_id}")
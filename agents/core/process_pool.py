@@ -0,0 +1,86 @@
+# agents/core/process_pool.py
+import asyncio
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, List, Optional
+from common.config import settings
+from common.logger import get_logger
+from .agent import BaseAgent
+from .mcp_protocol import MCPMessage
+
+logger = get_logger("process_pool")
+
+# The agent owned by this worker process, built once by the pool initializer
+_worker_agent: Optional[BaseAgent] = None
+# Async agents run every call on this loop, so clients bound to it stay usable
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _picklable(value: Any) -> Any:
+    # Blob store fields resolve to memoryviews, which pickle refuses
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    if isinstance(value, dict):
+        return {key: _picklable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_picklable(item) for item in value]
+    return value
+
+def encode_message(message: MCPMessage) -> bytes:
+    """Pack a message as plain dicts; raw bytes payload fields are not re-encoded"""
+    return pickle.dumps((message.header.dict(), _picklable(message.payload)), protocol=pickle.HIGHEST_PROTOCOL)
+
+def decode_message(frame: bytes) -> MCPMessage:
+    header, payload = pickle.loads(frame)
+    # Trusted hop between our own processes: skip validation
+    return MCPMessage.construct(header, payload)
+
+def _init_worker(agent_factory: Callable[[], BaseAgent]):
+    global _worker_agent, _worker_loop
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    _worker_agent = agent_factory()
+    _worker_agent.initialize()
+
+def _run_in_worker(frame: bytes) -> Optional[bytes]:
+    response = _worker_agent.process(decode_message(frame))
+    if asyncio.iscoroutine(response):
+        response = _worker_loop.run_until_complete(response)
+    return encode_message(response) if isinstance(response, MCPMessage) else None
+
+def _run_batch_in_worker(frames: List[bytes]) -> List[Optional[bytes]]:
+    responses = _worker_agent.process_batch([decode_message(frame) for frame in frames])
+    if asyncio.iscoroutine(responses):
+        responses = _worker_loop.run_until_complete(responses)
+    return [encode_message(r) if isinstance(r, MCPMessage) else None for r in responses]
+
+class ProcessAgentHandler:
+    """Orchestrator handler that runs an agent in a pool of worker processes.
+    
+    Each worker builds its own agent from `agent_factory` and loads its
+    models once, when the process starts. The factory must be picklable
+    (an agent class is enough). Calls block the orchestrator worker thread
+    until a process returns, so the pool's worker count should match the
+    number of processes.
+    """
+    
+    def __init__(self, agent_factory: Callable[[], BaseAgent], processes: int, start_method: Optional[str] = None):
+        self.processes = max(1, processes)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context(start_method or settings.process_start_method),
+            initializer=_init_worker,
+            initargs=(agent_factory,)
+        )
+    
+    def __call__(self, message: MCPMessage) -> Optional[MCPMessage]:
+        frame = self.executor.submit(_run_in_worker, encode_message(message)).result()
+        return decode_message(frame) if frame is not None else None
+    
+    def process_batch(self, messages: List[MCPMessage]) -> List[Optional[MCPMessage]]:
+        """Run a whole batch in one worker process, in one round trip"""
+        frames = self.executor.submit(_run_batch_in_worker, [encode_message(m) for m in messages]).result()
+        return [decode_message(frame) if frame is not None else None for frame in frames]
+    
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
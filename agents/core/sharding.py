@@ -0,0 +1,334 @@
+# agents/core/sharding.py
+import functools
+import itertools
+import multiprocessing
+import threading
+from collections import Counter, OrderedDict, deque
+from typing import Callable, Deque, Dict, Optional
+from common.config import settings
+from common.correlation import ResponseCorrelator
+from common.logger import get_logger
+from common.sharding import HashRing
+from .mcp_protocol import MCPMessage
+from .orchestrator import AgentOrchestrator, AgentQueueFull
+from .process_pool import encode_message, decode_message
+
+def _run_shard(agent_factories: Dict[str, Callable], inbox, outbox):
+    """Child process body: an ordinary orchestrator fed from the inbox queue"""
+    orchestrator = AgentOrchestrator()
+    for agent_id, agent_factory in agent_factories.items():
+        agent = agent_factory()
+        agent.initialize()
+        agent.emitter = orchestrator.route_message
+        orchestrator.register_agent(agent_id, agent.process)
+    orchestrator.egress = lambda message: outbox.put(("egress", encode_message(message)))
+    orchestrator.start()
+    
+    while True:
+        item = inbox.get()
+        if item is None:
+            break
+        sequence, frame = item
+        orchestrator.route_message(
+            decode_message(frame),
+            on_complete=lambda message, sequence=sequence: outbox.put(("done", sequence))
+        )
+    orchestrator.stop()
+
+class ProcessShard:
+    """An orchestrator shard running in its own process.
+    
+    Every agent is built from its factory inside the child, so the factories
+    must be picklable (agent classes are). Messages for agents outside the
+    shard come back through `egress`, like AgentOrchestrator.egress.
+    """
+    
+    def __init__(self, agent_factories: Dict[str, Callable], start_method: Optional[str] = None):
+        self.agents = {agent_id.lower(): factory for agent_id, factory in agent_factories.items()}
+        context = multiprocessing.get_context(start_method or settings.process_start_method)
+        self.inbox = context.Queue()
+        self.outbox = context.Queue()
+        self.process = context.Process(
+            target=_run_shard,
+            args=(self.agents, self.inbox, self.outbox),
+            daemon=True
+        )
+        self.egress: Optional[Callable[[MCPMessage], None]] = None
+        self.logger = get_logger("process_shard")
+        self._callbacks: Dict[int, tuple] = {}
+        self._sequence = itertools.count()
+        self._reader: Optional[threading.Thread] = None
+    
+    def route_message(
+        self,
+        message: MCPMessage,
+        overflow: Optional[str] = None,
+        timeout: Optional[float] = None,
+        on_complete: Optional[Callable[[MCPMessage], None]] = None
+    ) -> bool:
+        # Backpressure is applied by the child orchestrator's own queues
+        sequence = next(self._sequence)
+        self._callbacks[sequence] = (message, on_complete)
+        self.inbox.put((sequence, encode_message(message)))
+        return True
+    
+    def start(self):
+        self.process.start()
+        self._reader = threading.Thread(target=self._read, name="shard-reader", daemon=True)
+        self._reader.start()
+    
+    def stop(self):
+        self.inbox.put(None)
+        self.process.join()
+        self.outbox.put(None)
+        self._reader.join()
+    
+    def _read(self):
+        while True:
+            item = self.outbox.get()
+            if item is None:
+                break
+            kind, value = item
+            try:
+                if kind == "done":
+                    message, on_complete = self._callbacks.pop(value)
+                    if on_complete is not None:
+                        on_complete(message)
+                elif self.egress is not None:
+                    self.egress(decode_message(value))
+            except Exception as e:
+                self.logger.exception(f"Shard callback failed: {str(e)}")
+
+class ShardedOrchestrator:
+    """Spreads contexts over several orchestrator shards by context_id.
+    
+    A consistent hash ring maps each context to one shard. At most one
+    message per context is in flight; later ones wait here and are sent
+    to the context's current owner when it completes, so per-context order
+    holds even while shards join or leave. Messages a shard cannot deliver
+    locally (replies between agents, replies to callers) come back here and
+    are routed to the owning shard or resolved like AgentOrchestrator.
+    Each context holds at most `queue_size` waiting messages; beyond that
+    the overflow policy applies as it does to an agent queue.
+    
+    Shards are AgentOrchestrator instances (in-process) or ProcessShards,
+    and every shard must run the same set of agents.
+    """
+    
+    # Same policies and defaults as an agent queue
+    _overflow_policy = AgentOrchestrator._overflow_policy
+    
+    def __init__(self, replicas: Optional[int] = None, queue_size: Optional[int] = None):
+        self.ring = HashRing(replicas=replicas)
+        self.queue_size = queue_size or settings.orchestrator_queue_size
+        self.shards: Dict[str, object] = {}
+        self.agents: Dict[str, object] = {}
+        self.correlator = ResponseCorrelator()
+        self.egress: Optional[Callable[[MCPMessage], None]] = None
+        self.logger = get_logger("sharded_orchestrator")
+        self.running = False
+        self.stats = {"routed": 0, "deferred": 0, "moved": 0, "dropped": 0}
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+        # Signalled whenever a context's waiting messages shrink
+        self._room = threading.Condition(self._lock)
+        # context_id -> messages; the head is in flight on _owners[context_id]
+        self._contexts: Dict[str, Deque[tuple]] = {}
+        # Last shard per context, kept in LRU order as long as the context store would keep it
+        self._owners: "OrderedDict[str, str]" = OrderedDict()
+        self._in_flight: Counter = Counter()
+    
+    def add_shard(self, shard_id: str, shard):
+        shard.egress = self._from_shard
+        self.shards[shard_id] = shard
+        for agent_id, handler in shard.agents.items():
+            self.agents.setdefault(agent_id, handler)
+        if self.running:
+            shard.start()
+        # Contexts move at their next dispatch, never while a message is in flight
+        self.ring.add(shard_id)
+        self.logger.info(f"Added shard {shard_id} ({len(self.ring)} shards)")
+    
+    def remove_shard(self, shard_id: str, timeout: Optional[float] = None):
+        """Stop sending new work to a shard, wait for its in-flight messages, then stop it"""
+        self.ring.remove(shard_id)
+        timeout = timeout if timeout is not None else settings.shard_drain_timeout
+        with self._drained:
+            if not self._drained.wait_for(lambda: self._in_flight[shard_id] == 0, timeout):
+                self.logger.warning(f"Shard {shard_id} still has {self._in_flight[shard_id]} messages in flight")
+            idle = [context_id for context_id, owner in self._owners.items() if owner == shard_id]
+        # Hand idle contexts' history to their new owners while the shard is still here
+        for context_id in idle:
+            target = self.ring.get(context_id)
+            if target is not None:
+                self._move_context(context_id, shard_id, target)
+                with self._lock:
+                    self._owners[context_id] = target
+        shard = self.shards.pop(shard_id)
+        if self.running:
+            shard.stop()
+        self.logger.info(f"Removed shard {shard_id} ({len(self.ring)} shards)")
+    
+    def route_message(
+        self,
+        message: MCPMessage,
+        overflow: Optional[str] = None,
+        timeout: Optional[float] = None,
+        on_complete: Optional[Callable[[MCPMessage], None]] = None
+    ) -> bool:
+        if message.header.destination.lower() not in self.agents:
+            return self._egress(message)
+        
+        context_id = message.header.context_id
+        overflow, timeout = self._overflow_policy(overflow, timeout)
+        with self._lock:
+            if not self._wait_for_room(context_id, overflow, timeout):
+                self.logger.warning(f"Context {context_id} has {self.queue_size} waiting messages, message rejected")
+                raise AgentQueueFull(f"Too many waiting messages for context {context_id}")
+            waiting = self._contexts.setdefault(context_id, deque())
+            waiting.append((message, overflow, timeout, on_complete))
+            if len(waiting) > 1:
+                # Runs once the context's in-flight message completes
+                self.stats["deferred"] += 1
+                return True
+        
+        try:
+            self._dispatch(context_id, message, overflow, timeout, on_complete)
+        except AgentQueueFull:
+            self._advance(context_id)
+            raise
+        return True
+    
+    def request(self, message: MCPMessage, timeout: Optional[float] = None) -> MCPMessage:
+        """Route a message and block until its correlated reply arrives"""
+        pending = self.correlator.expect(message)
+        try:
+            routed = self.route_message(message)
+        except Exception:
+            self.correlator.discard(message.header.message_id)
+            raise
+        if not routed:
+            self.correlator.discard(message.header.message_id)
+            raise ValueError(f"Agent {message.header.destination} not found")
+        return pending.result(timeout or settings.orchestrator_request_timeout)
+    
+    def shard_for(self, context_id: str) -> Optional[str]:
+        """Shard currently running the context, else the one the ring assigns"""
+        with self._lock:
+            owner = self._owners.get(context_id)
+        return owner or self.ring.get(context_id)
+    
+    def start(self):
+        self.running = True
+        for shard in self.shards.values():
+            shard.start()
+        self.logger.info(f"Sharded orchestrator started ({len(self.shards)} shards)")
+    
+    def stop(self):
+        self.running = False
+        for shard in self.shards.values():
+            shard.stop()
+        self.logger.info("Sharded orchestrator stopped")
+    
+    def _wait_for_room(self, context_id: str, overflow: str, timeout: float) -> bool:
+        # Caller holds the lock; the in-flight head does not count
+        wait = {"block": None, "timeout": timeout, "reject": 0}[overflow]
+        return self._room.wait_for(lambda: len(self._contexts.get(context_id, ())) <= self.queue_size, wait)
+    
+    def _dispatch(self, context_id: str, message: MCPMessage, overflow, timeout, on_complete):
+        shard_id = self.ring.get(context_id)
+        if shard_id is None:
+            raise AgentQueueFull("No shards available")
+        with self._lock:
+            previous = self._owners.get(context_id)
+            self._owners[context_id] = shard_id
+            self._owners.move_to_end(context_id)
+            while len(self._owners) > settings.context_max_entries:
+                self._owners.popitem(last=False)
+            self._in_flight[shard_id] += 1
+            self.stats["routed"] += 1
+        if previous is not None and previous != shard_id:
+            self._move_context(context_id, previous, shard_id)
+        
+        done = functools.partial(self._done, context_id, shard_id, on_complete)
+        try:
+            self.shards[shard_id].route_message(message, overflow, timeout, on_complete=done)
+        except Exception:
+            self._release(shard_id)
+            raise
+    
+    def _done(self, context_id: str, shard_id: str, on_complete: Optional[Callable], message: MCPMessage):
+        self._release(shard_id)
+        self._complete(message, on_complete)
+        self._advance(context_id)
+    
+    def _complete(self, message: MCPMessage, on_complete: Optional[Callable]):
+        if on_complete is None:
+            return
+        try:
+            on_complete(message)
+        except Exception as e:
+            self.logger.exception(f"Completion callback failed: {str(e)}")
+    
+    def _advance(self, context_id: str):
+        """Drop the finished head of a context and dispatch the next message, if any.
+        
+        A deferred message that no longer fits its shard's queue is dropped
+        and completed, so whoever is tracking it is not left waiting.
+        """
+        while True:
+            with self._lock:
+                waiting = self._contexts[context_id]
+                waiting.popleft()
+                self._room.notify_all()
+                if not waiting:
+                    del self._contexts[context_id]
+                    return
+                message, overflow, timeout, on_complete = waiting[0]
+            try:
+                # Called from shard workers, so never wait indefinitely on a full queue
+                self._dispatch(context_id, message, "reject" if overflow == "reject" else "timeout", timeout, on_complete)
+                return
+            except AgentQueueFull:
+                self.stats["dropped"] += 1
+                self.logger.error(f"Dropped message for {message.header.destination} in context {context_id}: queue full")
+                # The caller can no longer be told; settle its delivery (e.g. the broker ack) instead
+                self._complete(message, on_complete)
+    
+    def _release(self, shard_id: str):
+        with self._drained:
+            self._in_flight[shard_id] -= 1
+            if self._in_flight[shard_id] <= 0:
+                del self._in_flight[shard_id]
+                self._drained.notify_all()
+    
+    def _move_context(self, context_id: str, source: str, target: str):
+        self.stats["moved"] += 1
+        old = getattr(self.shards.get(source), "context_store", None)
+        new = getattr(self.shards.get(target), "context_store", None)
+        if old is None or new is None:
+            # Process shards keep their history in the child; the new owner starts fresh
+            return
+        snapshot = old.get(context_id)
+        if snapshot is not None:
+            new.restore(context_id, snapshot)
+            old.remove(context_id)
+    
+    def _from_shard(self, message: MCPMessage):
+        """Egress hook for every shard"""
+        if message.header.destination.lower() not in self.agents:
+            self._egress(message)
+            return
+        try:
+            self.route_message(message, overflow="timeout")
+        except AgentQueueFull:
+            self.logger.error(f"Dropped reply to {message.header.destination}: queue full")
+    
+    def _egress(self, message: MCPMessage) -> bool:
+        if message.header.message_type != "request" and self.correlator.resolve(message):
+            return True
+        if self.egress is None:
+            self.logger.error(f"Agent {message.header.destination.lower()} not found")
+            return False
+        self.egress(message)
+        return True
@@ -0,0 +1,299 @@
+# agents/core/trace.py
+import base64
+import gzip
+import json
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from common.config import settings
+from common.logger import get_logger
+from .mcp_protocol import MCPHeader, MCPMessage
+
+logger = get_logger("trace")
+
+TRACE_VERSION = 1
+
+def _payload_shape(payload: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Type and size of each payload field, enough to rebuild a same-sized stand-in"""
+    shape = {}
+    for key, value in payload.items():
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            shape[key] = {"type": "bytes", "size": len(value)}
+        elif isinstance(value, str):
+            shape[key] = {"type": "str", "size": len(value)}
+        else:
+            shape[key] = {"type": "json", "size": len(json.dumps(value, default=str))}
+    return shape
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"__bytes__": base64.b64encode(bytes(value)).decode()}
+    if isinstance(value, dict):
+        return {key: _encode_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(item) for item in value]
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if set(value) == {"__bytes__"}:
+            return base64.b64decode(value["__bytes__"])
+        return {key: _decode_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode_value(item) for item in value]
+    return value
+
+def _stand_in(shape: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    payload = {}
+    # No shape: the payload was never parsed while the message was captured
+    for key, field in (shape or {}).items():
+        if field["type"] == "bytes":
+            payload[key] = bytes(field["size"])
+        else:
+            payload[key] = "x" * field["size"]
+    return payload
+
+class TraceRecorder:
+    """Writes MCP traffic seen by an orchestrator to a gzip JSON-lines file.
+    
+    Every routed message is stored as its header, the offset from the start
+    of the capture and the size of each payload field; payloads themselves
+    only with `include_payloads`. Handler run times are stored too, so a
+    replay against stub agents can reproduce the recorded service times.
+    
+    Capture never parses a payload: one that is still lazily encoded when
+    its entry is written gets no shape (and no payload), and replays as an
+    empty payload. Entries are serialized and written on a writer thread;
+    at most `max_pending` wait for it, and further ones are dropped and
+    counted in `dropped`.
+    """
+    
+    def __init__(self, path: str, include_payloads: bool = False, max_pending: Optional[int] = None):
+        self.path = path
+        self.include_payloads = include_payloads
+        self.started = time.monotonic()
+        self.count = 0
+        self.dropped = 0
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._closed = False
+        self._pending: "queue.Queue" = queue.Queue(max_pending or settings.trace_capture_queue)
+        self._writer = threading.Thread(target=self._drain, name="trace-writer", daemon=True)
+        self._writer.start()
+        self._pending.put({"trace": TRACE_VERSION, "started": time.time(), "payloads": include_payloads})
+    
+    def record(self, message: MCPMessage, internal: bool = False):
+        """Record a message; internal ones were sent by a local agent.
+        
+        Only the arrival time is taken here; the entry is built on the writer.
+        """
+        if self._closed:
+            return
+        if self._offer((round(time.monotonic() - self.started, 6), message, internal)):
+            self.count += 1
+    
+    def record_service(self, messages: List[MCPMessage], elapsed: float):
+        if self._closed:
+            return
+        # A batch call is split evenly between its messages
+        share = round(elapsed / max(len(messages), 1), 6)
+        for message in messages:
+            self._offer({"service": share, "message_id": message.header.message_id})
+    
+    def _offer(self, item) -> bool:
+        # Never wait for the writer: a capture must not slow routing down
+        try:
+            self._pending.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+    
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._pending.put(None)
+        self._writer.join()
+        self._file.close()
+        logger.info(f"Captured {self.count} messages to {self.path} ({self.dropped} entries dropped)")
+    
+    def _entry(self, offset: float, message: MCPMessage, internal: bool) -> Dict[str, Any]:
+        # Reading a lazy payload here would decode it (and fetch its blobs) for
+        # the capture alone, racing the agent that may be parsing it too
+        loaded = message.payload_loaded
+        entry = {
+            "t": offset,
+            "header": message.header.dict(),
+            "shape": _payload_shape(message.payload) if loaded else None,
+            "internal": internal
+        }
+        if self.include_payloads and loaded:
+            entry["payload"] = _encode_value(message.payload)
+        return entry
+    
+    def _drain(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            try:
+                entry = self._entry(*item) if isinstance(item, tuple) else item
+                self._file.write(json.dumps(entry, separators=(",", ":"), default=str) + "\n")
+            except Exception as e:
+                logger.error(f"Could not write trace entry: {str(e)}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+def load_trace(path: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Dict[str, float]]:
+    """Read a capture: (metadata, message records in order, service time per message id)"""
+    records = []
+    service = {}
+    with gzip.open(path, "rt", encoding="utf-8") as trace:
+        meta = json.loads(trace.readline())
+        if meta.get("trace") != TRACE_VERSION:
+            raise ValueError(f"Unsupported trace version: {meta.get('trace')}")
+        for line in trace:
+            entry = json.loads(line)
+            if "service" in entry:
+                service[entry["message_id"]] = entry["service"]
+            else:
+                records.append(entry)
+    return meta, records, service
+
+def _percentile(values: List[float], percent: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 6)
+
+def latency_summary(latencies: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "p50": _percentile(latencies, 50),
+        "p90": _percentile(latencies, 90),
+        "p99": _percentile(latencies, 99),
+        "max": round(max(latencies), 6) if latencies else None
+    }
+
+class TraceReplayer:
+    """Feeds a capture back into an orchestrator and measures it.
+    
+    Messages keep their recorded order, context ids and inter-arrival gaps
+    (divided by `speed`); message ids and timestamps are fresh and deadlines
+    keep their recorded budget. Messages that local agents sent during the
+    capture are skipped, since the agents produce them again. Latency is
+    measured from routing to completion of each replayed message.
+    """
+    
+    def __init__(self, orchestrator, path: str, speed: float = 1.0, include_internal: bool = False):
+        self.orchestrator = orchestrator
+        self.speed = speed
+        self.meta, records, self.recorded_service = load_trace(path)
+        self.records = [r for r in records if include_internal or not r.get("internal")]
+        # Replayed message id -> recorded message id, for stub service times
+        self.origins: Dict[str, str] = {}
+    
+    def service_time(self, message: MCPMessage, default: float = 0.0) -> float:
+        """Recorded handler time for a replayed message"""
+        origin = self.origins.get(message.header.message_id)
+        return self.recorded_service.get(origin, default)
+    
+    def stub_agent(self, agent_id: str, default: float = 0.0) -> Callable[[MCPMessage], MCPMessage]:
+        """Handler that sleeps for the recorded service time and answers requests"""
+        def handler(message: MCPMessage):
+            time.sleep(self.service_time(message, default))
+            if message.header.message_type != "request":
+                return None
+            return MCPMessage(
+                header=MCPHeader(
+                    source=agent_id,
+                    destination=message.header.source,
+                    context_id=message.header.context_id,
+                    correlation_id=message.header.message_id,
+                    message_type="response"
+                ),
+                payload={}
+            )
+        return handler
+    
+    def build_messages(self) -> List[Tuple[float, MCPMessage]]:
+        messages = []
+        for record in self.records:
+            header = dict(record["header"])
+            original_id = header.pop("message_id")
+            recorded_at = header.pop("timestamp")
+            header.pop("correlation_id", None)
+            deadline = header.pop("deadline", None)
+            message = MCPMessage(
+                header=MCPHeader(**header),
+                payload=_decode_value(record["payload"]) if "payload" in record else _stand_in(record["shape"])
+            )
+            if deadline is not None:
+                # Re-anchored when sent; the budget is what matters
+                message.header.deadline = deadline - recorded_at
+            self.origins[message.header.message_id] = original_id
+            messages.append((record["t"], message))
+        return messages
+    
+    def run(self, drain_timeout: float = 30.0) -> Dict[str, Any]:
+        messages = self.build_messages()
+        lock = threading.Lock()
+        all_done = threading.Event()
+        sent: Dict[str, float] = {}
+        latencies: Dict[str, List[float]] = {}
+        lag = 0.0
+        remaining = [len(messages)]
+        
+        def completed(message: MCPMessage):
+            finished = time.monotonic()
+            with lock:
+                start = sent.pop(message.header.message_id, None)
+                if start is not None:
+                    latencies.setdefault(message.header.destination.lower(), []).append(finished - start)
+                remaining[0] -= 1
+                if remaining[0] <= 0:
+                    all_done.set()
+        
+        if not messages:
+            all_done.set()
+        origin = messages[0][0] if messages else 0.0
+        started = time.monotonic()
+        for offset, message in messages:
+            due = started + (offset - origin) / self.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                lag = max(lag, -delay)
+            now = time.time()
+            message.header.timestamp = now
+            if message.header.deadline is not None:
+                message.header.deadline += now
+            with lock:
+                sent[message.header.message_id] = time.monotonic()
+            if not self.orchestrator.route_message(message, on_complete=completed):
+                completed(message)
+        all_done.wait(drain_timeout)
+        duration = time.monotonic() - started
+        
+        every = [latency for values in latencies.values() for latency in values]
+        return {
+            "messages": len(messages),
+            "completed": len(every),
+            "speed": self.speed,
+            "duration": round(duration, 6),
+            "throughput": round(len(every) / duration, 3) if duration > 0 else None,
+            "max_send_lag": round(lag, 6),
+            "latency": latency_summary(every),
+            "agents": {
+                agent_id: dict(latency_summary(values), count=len(values))
+                for agent_id, values in sorted(latencies.items())
+            }
+        }
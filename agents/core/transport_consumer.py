@@ -0,0 +1,68 @@
+# agents/core/transport_consumer.py
+import asyncio
+from typing import Optional
+from common.logger import get_logger
+from common.transport import Transport, get_transport, close_transport
+from .mcp_protocol import MCPMessage
+from .orchestrator import AgentOrchestrator
+
+class TransportConsumer:
+    """Feeds MCP messages from a non-RabbitMQ transport into an orchestrator.
+    
+    Subscribes every registered agent's routing key and sends replies for
+    anything that is not a local agent back through the transport. These
+    transports have no redelivery, so a full agent queue is waited on with
+    the orchestrator's overflow policy instead of handed back.
+    """
+    
+    def __init__(self, orchestrator: AgentOrchestrator, transport: Optional[Transport] = None):
+        self.orchestrator = orchestrator
+        self.transport = transport
+        self._shared = transport is None
+        self.logger = get_logger("transport_consumer")
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"received": 0, "dropped": 0, "replies": 0}
+    
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        if self.transport is None:
+            # The agent process serves the Unix socket the gateway connects to
+            self.transport = await get_transport(server=True)
+        for agent_id in self.orchestrator.agents:
+            await self.transport.subscribe(agent_id, self._on_message)
+            self.logger.info(f"Consuming {agent_id} messages from the {type(self.transport).__name__}")
+        self.orchestrator.egress = self.publish_reply
+    
+    async def stop(self):
+        self.orchestrator.egress = None
+        if self._shared:
+            await close_transport()
+        self.logger.info(f"Transport consumer stopped ({self.stats})")
+    
+    async def run(self):
+        """Consume until cancelled"""
+        await self.start()
+        try:
+            await asyncio.Future()
+        finally:
+            await self.stop()
+    
+    def publish_reply(self, message: MCPMessage):
+        """Orchestrator egress hook; safe to call from worker threads"""
+        future = asyncio.run_coroutine_threadsafe(self.transport.send(message), self.loop)
+        future.add_done_callback(self._log_publish_failure)
+        self.stats["replies"] += 1
+    
+    def _log_publish_failure(self, future):
+        if not future.cancelled() and future.exception():
+            self.logger.error(f"Failed to send reply: {str(future.exception())}")
+    
+    async def _on_message(self, message: MCPMessage):
+        self.stats["received"] += 1
+        if getattr(self.orchestrator, "loop", None) is self.loop:
+            routed = await self.orchestrator.aroute_message(message)
+        else:
+            # A blocking enqueue must not stall the transport's loop
+            routed = await self.loop.run_in_executor(None, self.orchestrator.route_message, message)
+        if not routed:
+            self.stats["dropped"] += 1
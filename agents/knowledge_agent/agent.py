@@ -1,7 +1,8 @@
 # agents/knowledge_agent/agent.py
 import time
+from typing import Optional
 from core.agent import BaseAgent
-from core.mcp_protocol import MCPMessage
+from core.mcp_protocol import MCPHeader, MCPMessage, BACKEND_ERROR
 from .rag_system import KnowledgeRAGSystem
 from common.config import settings
 from common.logger import get_logger
@@ -15,7 +16,7 @@ class KnowledgeAgent(BaseAgent):
         self.rag_system = KnowledgeRAGSystem()
         self.logger.info("Knowledge RAG system initialized")
         
-    def process(self, message: MCPMessage):
+    async def process(self, message: MCPMessage):
         if not self.initialized:
             self.initialize()
             
@@ -29,7 +30,12 @@ class KnowledgeAgent(BaseAgent):
             
         try:
             start_time = time.time()
-            response = self.rag_system.query(query, context)
+            stream = self.open_stream(message) if self.wants_stream(message) else None
+            if stream:
+                # Tokens reach the caller as they are generated
+                response = await self.rag_system.astream_query(query, context, stream.send)
+            else:
+                response = await self.rag_system.aquery(query, context)
             processing_time = time.time() - start_time
             
             result = {
@@ -38,18 +44,21 @@ class KnowledgeAgent(BaseAgent):
                 "processing_time": processing_time
             }
             
+            if stream:
+                return stream.end(result)
             return self.send_response(message, result)
             
         except Exception as e:
-            return self._create_error_response(message, f"Knowledge query failed: {str(e)}")
+            return self._create_error_response(message, f"Knowledge query failed: {str(e)}", BACKEND_ERROR)
             
-    def _create_error_response(self, original_message: MCPMessage, error: str):
+    def _create_error_response(self, original_message: MCPMessage, error: str, error_type: Optional[str] = None):
         return MCPMessage(
             header=MCPHeader(
                 source=self.name,
                 destination=original_message.header.source,
                 context_id=original_message.header.context_id,
+                correlation_id=original_message.header.message_id,
                 message_type="error"
             ),
-            payload={"error": error}
+            payload={"error": error, "error_type": error_type}
         )
\ No newline at end of file
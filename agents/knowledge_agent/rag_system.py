@@ -3,6 +3,7 @@ from langchain.chains import RetrievalQA
 from langchain_community.vectorstores import Neo4jVector
 from langchain_community.llms import OpenAI
 from langchain.embeddings.openai import OpenAIEmbeddings
+from typing import Callable
 from common.config import settings
 from common.logger import get_logger
 
@@ -77,6 +78,48 @@ class KnowledgeRAGSystem:
             "context_used": context
         }
     
+    async def aquery(self, query: str, context: dict = None) -> dict:
+        """Non-blocking variant of query for the async orchestrator"""
+        logger.info(f"Processing query: {query}")
+        
+        enhanced_query = self._enhance_query(query, context)
+        result = await self.qa_chain.acall({"query": enhanced_query})
+        sources = [doc.metadata["source"] for doc in result["source_documents"]]
+        
+        return {
+            "answer": result["result"],
+            "sources": sources,
+            "context_used": context
+        }
+    
+    async def astream_query(self, query: str, context: dict = None, on_token: Callable[[str], None] = None) -> dict:
+        """Like aquery, but passes each generated token to on_token as it arrives"""
+        logger.info(f"Streaming query: {query}")
+        
+        enhanced_query = self._enhance_query(query, context)
+        documents = await self.qa_chain.retriever.aget_relevant_documents(enhanced_query)
+        
+        # Same "stuff" prompt the QA chain would use, streamed straight from the LLM
+        stuff_chain = self.qa_chain.combine_documents_chain
+        prompt = stuff_chain.llm_chain.prompt.format(**{
+            stuff_chain.document_variable_name: "\n\n".join(doc.page_content for doc in documents),
+            "question": enhanced_query
+        })
+        tokens = []
+        async for chunk in self.llm.astream(prompt):
+            # Completion models stream strings, chat models message chunks
+            token = getattr(chunk, "content", chunk)
+            if token:
+                tokens.append(token)
+                if on_token:
+                    on_token(token)
+        
+        return {
+            "answer": "".join(tokens).strip(),
+            "sources": [doc.metadata["source"] for doc in documents],
+            "context_used": context
+        }
+    
     def _enhance_query(self, query: str, context: dict) -> str:
         """Enhance query with contextual information"""
         if not context:
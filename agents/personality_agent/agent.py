@@ -1,21 +1,24 @@
 # agents/personality_agent/agent.py
 from core.agent import BaseAgent
-from core.mcp_protocol import MCPMessage
+from core.mcp_protocol import MCPHeader, MCPMessage, BACKEND_ERROR
 from common.config import settings
 from common.logger import get_logger
 import openai
+from typing import Callable, Optional
 
 class PersonalityAgent(BaseAgent):
     def __init__(self):
         super().__init__("PERSONALITY_AGENT")
         self.persona = "helpful, witty, and slightly sarcastic AI assistant"
         self.openai_api_key = settings.openai_api_key
+        self.client = None
         
     def _load_models(self):
         # Personality agent doesn't need heavy models
+        self.client = openai.AsyncOpenAI(api_key=self.openai_api_key)
         self.logger.info("Personality agent initialized")
         
-    def process(self, message: MCPMessage):
+    async def process(self, message: MCPMessage):
         if not self.initialized:
             self.initialize()
             
@@ -29,7 +32,8 @@ class PersonalityAgent(BaseAgent):
             
         try:
             # Add personality to the raw response
-            personalized = self._apply_personality(raw_response, context)
+            stream = self.open_stream(message) if self.wants_stream(message) else None
+            personalized = await self._apply_personality(raw_response, context, stream.send if stream else None)
             
             # Format response
             response = {
@@ -37,13 +41,15 @@ class PersonalityAgent(BaseAgent):
                 "persona": self.persona
             }
             
+            if stream:
+                return stream.end(response)
             return self.send_response(message, response)
             
         except Exception as e:
-            return self._create_error_response(message, f"Personality application failed: {str(e)}")
+            return self._create_error_response(message, f"Personality application failed: {str(e)}", BACKEND_ERROR)
             
-    def _apply_personality(self, content: str, context: dict) -> str:
-        """Apply personality traits to the raw response"""
+    async def _apply_personality(self, content: str, context: dict, on_token: Callable[[str], None] = None) -> str:
+        """Apply personality traits to the raw response; tokens go to on_token as they arrive"""
         # Use LLM to rewrite with personality
         prompt = f"""
         Rewrite the following response in the style of a {self.persona}. 
@@ -57,23 +63,38 @@ class PersonalityAgent(BaseAgent):
         Rewritten response:
         """
         
-        response = openai.Completion.create(
-            engine="text-davinci-003",
+        if on_token is None:
+            response = await self.client.completions.create(
+                model="text-davinci-003",
+                prompt=prompt,
+                max_tokens=500,
+                temperature=0.7
+            )
+            return response.choices[0].text.strip()
+        
+        stream = await self.client.completions.create(
+            model="text-davinci-003",
             prompt=prompt,
             max_tokens=500,
             temperature=0.7,
-            api_key=self.openai_api_key
+            stream=True
         )
-        
-        return response.choices[0].text.strip()
+        tokens = []
+        async for chunk in stream:
+            token = chunk.choices[0].text if chunk.choices else ""
+            if token:
+                tokens.append(token)
+                on_token(token)
+        return "".join(tokens).strip()
     
-    def _create_error_response(self, original_message: MCPMessage, error: str):
+    def _create_error_response(self, original_message: MCPMessage, error: str, error_type: Optional[str] = None):
         return MCPMessage(
             header=MCPHeader(
                 source=self.name,
                 destination=original_message.header.source,
                 context_id=original_message.header.context_id,
+                correlation_id=original_message.header.message_id,
                 message_type="error"
             ),
-            payload={"error": error}
+            payload={"error": error, "error_type": error_type}
         )
\ No newline at end of file
@@ -1,9 +1,10 @@
 # agents/planning_agent/agent.py
 from core.agent import BaseAgent
-from core.mcp_protocol import MCPMessage
+from core.mcp_protocol import MCPHeader, MCPMessage
 from common.config import settings
 from common.logger import get_logger
 import json
+from typing import Optional
 
 class PlanningAgent(BaseAgent):
     def __init__(self):
@@ -40,6 +41,8 @@ class PlanningAgent(BaseAgent):
             return self.send_response(message, response)
             
         except Exception as e:
+            # Planning is simulated, so a failure here is a bug in this agent, not a
+            # backend outage; tag BACKEND_ERROR once a real planner is called
             return self._create_error_response(message, f"Planning failed: {str(e)}")
             
     def _generate_plan(self, goal: str, constraints: dict) -> list:
@@ -55,13 +58,14 @@ class PlanningAgent(BaseAgent):
             {"step": 5, "action": "Report completion", "duration": 5}
         ]
     
-    def _create_error_response(self, original_message: MCPMessage, error: str):
+    def _create_error_response(self, original_message: MCPMessage, error: str, error_type: Optional[str] = None):
         return MCPMessage(
             header=MCPHeader(
                 source=self.name,
                 destination=original_message.header.source,
                 context_id=original_message.header.context_id,
+                correlation_id=original_message.header.message_id,
                 message_type="error"
             ),
-            payload={"error": error}
+            payload={"error": error, "error_type": error_type}
         )
\ No newline at end of file
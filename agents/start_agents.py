@@ -1,9 +1,14 @@
 # agents/start_agents.py
 #!/usr/bin/env python3
 import time
+import asyncio
 from common.config import settings
 from common.logger import get_logger
 from .core.orchestrator import AgentOrchestrator
+from .core.async_orchestrator import AsyncAgentOrchestrator
+from .core.broker_consumer import BrokerConsumer
+from .core.transport_consumer import TransportConsumer
+from .core.sharding import ShardedOrchestrator, ProcessShard
 from .vision_agent import VisionAgent
 from .knowledge_agent import KnowledgeAgent
 from .planning_agent import PlanningAgent
@@ -11,11 +16,35 @@ from .personality_agent import PersonalityAgent
 
 logger = get_logger("agent_system")
 
+AGENT_FACTORIES = {
+    "VISION_AGENT": VisionAgent,
+    "KNOWLEDGE_AGENT": KnowledgeAgent,
+    "PLANNING_AGENT": PlanningAgent,
+    "PERSONALITY_AGENT": PersonalityAgent
+}
+
+def create_sharded_orchestrator() -> ShardedOrchestrator:
+    """One orchestrator process per shard, each running every agent"""
+    orchestrator = ShardedOrchestrator()
+    for i in range(settings.shard_processes):
+        orchestrator.add_shard(f"shard-{i}", ProcessShard(AGENT_FACTORIES))
+    return orchestrator
+
 def main():
     logger.info("Starting AAHB Agent System")
     
+    if settings.shard_processes > 0:
+        # Contexts are hashed across shard processes; agents load inside each shard
+        orchestrator = create_sharded_orchestrator()
+        orchestrator.start()
+        run(orchestrator)
+        return
+    
     # Create orchestrator
-    orchestrator = AgentOrchestrator()
+    if settings.orchestrator_mode == "async":
+        orchestrator = AsyncAgentOrchestrator()
+    else:
+        orchestrator = AgentOrchestrator()
     
     # Create and register agents
     vision_agent = VisionAgent()
@@ -23,26 +52,60 @@ def main():
     planning_agent = PlanningAgent()
     personality_agent = PersonalityAgent()
     
-    orchestrator.register_agent("VISION_AGENT", vision_agent.process)
+    if settings.vision_agent_processes > 0:
+        # CPU-bound inference gets its own processes, each loading the models once
+        orchestrator.register_process_agent(
+            "VISION_AGENT",
+            VisionAgent,
+            processes=settings.vision_agent_processes,
+            max_batch_size=settings.vision_agent_batch_size
+        )
+    elif settings.vision_agent_batch_size > 1:
+        # CLIP and YOLO run one forward pass per batch of queued images
+        orchestrator.register_agent(
+            "VISION_AGENT",
+            vision_agent.process,
+            batch_handler=vision_agent.process_batch,
+            max_batch_size=settings.vision_agent_batch_size
+        )
+    else:
+        orchestrator.register_agent("VISION_AGENT", vision_agent.process)
     orchestrator.register_agent("KNOWLEDGE_AGENT", knowledge_agent.process)
     orchestrator.register_agent("PLANNING_AGENT", planning_agent.process)
     orchestrator.register_agent("PERSONALITY_AGENT", personality_agent.process)
     
+    # Partial output (stream chunks) goes out through the orchestrator
+    for agent in (vision_agent, knowledge_agent, planning_agent, personality_agent):
+        agent.emitter = orchestrator.route_message
+    
     # Initialize agents
-    vision_agent.initialize()
+    if settings.vision_agent_processes == 0:
+        vision_agent.initialize()
     knowledge_agent.initialize()
     planning_agent.initialize()
     personality_agent.initialize()
     
+    if settings.trace_capture_path:
+        orchestrator.start_capture(settings.trace_capture_path, settings.trace_capture_payloads)
+    
     # Start orchestrator
     orchestrator.start()
-    
+    run(orchestrator)
+
+def run(orchestrator):
     logger.info("Agent system is running. Press Ctrl+C to exit.")
     
     try:
-        # Keep the main thread alive
-        while True:
-            time.sleep(1)
+        if settings.mcp_transport == "unix":
+            # Single-host deployments skip the broker and serve a Unix socket
+            asyncio.run(TransportConsumer(orchestrator).run())
+        elif settings.broker_consumer_enabled:
+            # Feed gateway traffic from RabbitMQ into the orchestrator
+            asyncio.run(BrokerConsumer(orchestrator).run())
+        else:
+            # Keep the main thread alive
+            while True:
+                time.sleep(1)
     except KeyboardInterrupt:
         logger.info("Shutting down agent system")
         orchestrator.stop()
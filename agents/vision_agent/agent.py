@@ -1,10 +1,12 @@
 # agents/vision_agent/agent.py
 import base64
+import time
 import numpy as np
 from io import BytesIO
+from typing import List, Optional
 from PIL import Image
 from core.agent import BaseAgent
-from core.mcp_protocol import MCPMessage
+from core.mcp_protocol import MCPHeader, MCPMessage, BACKEND_ERROR
 from .models.clip_processor import CLIPProcessor
 from .models.object_detector import ObjectDetector
 
@@ -13,27 +15,31 @@ class VisionAgent(BaseAgent):
         super().__init__("VISION_AGENT")
         self.clip_processor = None
         self.object_detector = None
-        
+    
     def _load_models(self):
         self.clip_processor = CLIPProcessor()
         self.object_detector = ObjectDetector()
         self.logger.info("Vision models loaded")
-        
+    
     def process(self, message: MCPMessage):
         if not self.initialized:
             self.initialize()
-            
+        
         self.logger.info("Processing vision request")
         
         # Extract image data from payload
         image_data = message.payload.get("image_data")
         if not image_data:
             return self._create_error_response(message, "No image data provided")
-            
+        
         try:
             # Decode base64 image
             image = self._decode_image(image_data)
-            
+        except Exception as e:
+            # An undecodable image is the caller's fault, not the models'
+            return self._create_error_response(message, f"Vision processing failed: {str(e)}")
+        
+        try:
             # Process with models
             clip_description = self.clip_processor.describe_image(image)
             objects = self.object_detector.detect_objects(image)
@@ -46,28 +52,73 @@ class VisionAgent(BaseAgent):
             }
             
             return self.send_response(message, response)
-            
+        
         except Exception as e:
-            return self._create_error_response(message, f"Vision processing failed: {str(e)}")
-            
-    def _decode_image(self, image_data: str) -> Image.Image:
-        if isinstance(image_data, str) and image_data.startswith("data:image"):
+            return self._create_error_response(message, f"Vision processing failed: {str(e)}", BACKEND_ERROR)
+    
+    def process_batch(self, messages: List[MCPMessage]):
+        """Run CLIP and YOLO once over every decodable image in the batch"""
+        if not self.initialized:
+            self.initialize()
+        
+        self.logger.info(f"Processing batch of {len(messages)} vision requests")
+        
+        responses = [None] * len(messages)
+        images = []
+        indices = []
+        for i, message in enumerate(messages):
+            image_data = message.payload.get("image_data")
+            if not image_data:
+                responses[i] = self._create_error_response(message, "No image data provided")
+                continue
+            try:
+                images.append(self._decode_image(image_data).convert("RGB"))
+                indices.append(i)
+            except Exception as e:
+                responses[i] = self._create_error_response(message, f"Vision processing failed: {str(e)}")
+        
+        if not images:
+            return responses
+        
+        try:
+            descriptions = self.clip_processor.describe_images(images)
+            detections = self.object_detector.detect_objects_batch(images)
+        except Exception as e:
+            for i in indices:
+                responses[i] = self._create_error_response(messages[i], f"Vision processing failed: {str(e)}", BACKEND_ERROR)
+            return responses
+        
+        for i, description, objects in zip(indices, descriptions, detections):
+            message = messages[i]
+            responses[i] = self.send_response(message, {
+                "image_description": description,
+                "detected_objects": objects,
+                "analysis_time": time.time() - message.header.timestamp
+            })
+        return responses
+    
+    def _decode_image(self, image_data) -> Image.Image:
+        if isinstance(image_data, (bytes, bytearray, memoryview)):
+            # Raw bytes from a binary MCP frame; no base64 step
+            image_bytes = image_data
+        elif isinstance(image_data, str) and image_data.startswith("data:image"):
             # Data URI format: data:image/jpeg;base64,...
             header, encoded = image_data.split(",", 1)
             image_bytes = base64.b64decode(encoded)
         else:
-            # Assume raw bytes
+            # Plain base64 string
             image_bytes = base64.b64decode(image_data)
-            
+        
         return Image.open(BytesIO(image_bytes))
     
-    def _create_error_response(self, original_message: MCPMessage, error: str):
+    def _create_error_response(self, original_message: MCPMessage, error: str, error_type: Optional[str] = None):
         return MCPMessage(
             header=MCPHeader(
                 source=self.name,
                 destination=original_message.header.source,
                 context_id=original_message.header.context_id,
+                correlation_id=original_message.header.message_id,
                 message_type="error"
             ),
-            payload={"error": error}
+            payload={"error": error, "error_type": error_type}
         )
\ No newline at end of file
@@ -1,6 +1,7 @@
 # agents/vision_agent/models/clip_processor.py
 import torch
 import numpy as np
+from typing import List
 from PIL import Image
 from transformers import CLIPProcessor, CLIPModel
 from common.config import settings
@@ -15,7 +16,7 @@ class CLIPProcessor:
         self.model = CLIPModel.from_pretrained(model_name).to(self.device)
         self.processor = CLIPProcessor.from_pretrained(model_name)
         logger.info("CLIP model loaded")
-        
+    
     def describe_image(self, image: Image.Image) -> str:
         inputs = self.processor(
             text=["a photo of"], 
@@ -34,7 +35,22 @@ class CLIPProcessor:
         # For simplicity, return top 3 descriptions
         # In a real system, we'd use more sophisticated captioning
         return f"An image with visual features matching probabilities: {probs[0]}"
+    
+    def describe_images(self, images: List[Image.Image]) -> List[str]:
+        """Batched describe_image: one forward pass for the whole list"""
+        inputs = self.processor(
+            text=["a photo of"],
+            images=images,
+            return_tensors="pt",
+            padding=True
+        ).to(self.device)
+        
+        with torch.no_grad():
+            outputs = self.model(**inputs)
         
+        probs = outputs.logits_per_image.softmax(dim=1).cpu().numpy()
+        return [f"An image with visual features matching probabilities: {p}" for p in probs]
+    
     def image_to_vector(self, image: Image.Image) -> np.ndarray:
         inputs = self.processor(images=image, return_tensors="pt").to(self.device)
         with torch.no_grad():
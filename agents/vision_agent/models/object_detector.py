@@ -1,6 +1,7 @@
 # agents/vision_agent/models/object_detector.py
 import cv2
 import numpy as np
+from typing import List
 from PIL import Image
 from common.logger import get_logger
 from ultralytics import YOLO
@@ -12,7 +13,7 @@ class ObjectDetector:
         logger.info(f"Loading object detection model: {model_name}")
         self.model = YOLO(model_name)
         logger.info("Object detection model loaded")
-        
+    
     def detect_objects(self, image: Image.Image) -> list:
         # Convert PIL image to OpenCV format
         cv_image = np.array(image)
@@ -24,12 +25,23 @@ class ObjectDetector:
         # Parse results
         detections = []
         for result in results:
-            for box in result.boxes:
-                obj = {
-                    "class": result.names[box.cls[0].item()],
-                    "confidence": box.conf[0].item(),
-                    "bbox": box.xyxy[0].tolist()
-                }
-                detections.append(obj)
-                
+            detections.extend(self._parse_result(result))
+        
+        return detections
+    
+    def detect_objects_batch(self, images: List[Image.Image]) -> List[list]:
+        """Run detection on several images in one model call; one result list per image"""
+        cv_images = [cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR) for image in images]
+        results = self.model(cv_images)
+        return [self._parse_result(result) for result in results]
+    
+    def _parse_result(self, result) -> list:
+        detections = []
+        for box in result.boxes:
+            obj = {
+                "class": result.names[box.cls[0].item()],
+                "confidence": box.conf[0].item(),
+                "bbox": box.xyxy[0].tolist()
+            }
+            detections.append(obj)
         return detections
\ No newline at end of file
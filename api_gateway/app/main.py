@@ -1,8 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import multimodal, health
+from .routers import multimodal, health, speech
+from .services.executor import shutdown_executor
+from .services.transcription import close_transcription_service
+from .services.ocr import close_ocr_service
 from .utils.logging import setup_logging
 from common.config import settings
+from common.correlation import close_reply_listener
+from common.publisher import close_publisher
+from common.transport import close_transport
 
 # Setup logging
 logger = setup_logging()
@@ -24,6 +30,7 @@ app.add_middleware(
 
 # Include routers
 app.include_router(multimodal.router, prefix="/api/v1")
+app.include_router(speech.router, prefix="/api/v1")
 app.include_router(health.router, prefix="/health")
 
 @app.on_event("startup")
@@ -35,4 +42,10 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    logger.info("Shutting down AAHB API Gateway")
\ No newline at end of file
+    logger.info("Shutting down AAHB API Gateway")
+    await close_reply_listener()
+    await close_transport()
+    await close_publisher()
+    close_transcription_service()
+    close_ocr_service()
+    shutdown_executor()
\ No newline at end of file
@@ -1,6 +1,9 @@
 from fastapi import APIRouter, Depends
 from common.logger import get_logger
 from common.config import settings
+from common.compression import compression_stats
+from app.services.transcription import transcription_metrics
+from app.services.ocr import ocr_metrics
 
 router = APIRouter()
 logger = get_logger()
@@ -12,4 +15,19 @@ def health_check():
         "service": "aahb-api-gateway",
         "version": settings.VERSION,
         "environment": settings.ENV
-    }
\ No newline at end of file
+    }
+
+@router.get("/transport")
+def transport_stats():
+    """MCP body compression counters for this gateway process"""
+    return {"compression": compression_stats()}
+
+@router.get("/transcription")
+def transcription_stats():
+    """Whisper batching: queue depth, batch sizes, timeouts"""
+    return transcription_metrics()
+
+@router.get("/ocr")
+def ocr_stats():
+    """OCR pool: images skipped as text-free, regions read, timeouts"""
+    return ocr_metrics()
\ No newline at end of file
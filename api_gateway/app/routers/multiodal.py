@@ -1,56 +1,93 @@
+import asyncio
+import json
 import logging
+import time
 from fastapi import APIRouter, UploadFile, Form, HTTPException, status
+from fastapi.responses import StreamingResponse
 from app.services import audio_processor, image_processor, text_processor
+from app.services.executor import run_blocking
+from app.services.agent_request import build_agent_request
 from app.utils.validation import validate_inputs
 from common.schemas import MultiModalInput, ProcessedOutput
-from common.mcp_protocol import MCPMessage, MCPHeader
+from common.mcp_protocol import STREAM_CHUNK
 from common.utils import send_mcp_message
+from common.correlation import get_reply_listener
 from common.config import settings
 from common.logger import get_logger
 
 router = APIRouter()
 logger = get_logger()
 
+async def _process_inputs(audio: UploadFile, image: UploadFile, text: str):
+    """Run the per-modality processors concurrently; returns (processed, context_id)"""
+    jobs = {}
+    if audio:
+        jobs["audio"] = audio_processor.process_audio(audio)
+    if image:
+        jobs["image"] = image_processor.process_image(image)
+    if text:
+        jobs["text"] = run_blocking(text_processor.process_text, text)
+    
+    # Whisper and OCR run in the executor, so one upload no longer stalls the loop
+    results = await asyncio.gather(*jobs.values())
+    processed = dict(zip(jobs, results))
+    
+    # The context comes from audio, then image, then text
+    context_id = None
+    for modality in ("audio", "image", "text"):
+        if modality in processed:
+            context_id = context_id or processed[modality].context_id
+    
+    return processed, context_id
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
 @router.post("/process", response_model=ProcessedOutput)
 async def process_input(
     audio: UploadFile = None,
     image: UploadFile = None,
-    text: str = Form(None)
+    text: str = Form(None),
+    wait: bool = Form(False),
+    timeout: float = Form(None)
 ):
     try:
         # Validate inputs
         validate_inputs(audio, image, text)
         
         # Process inputs
-        processed = {}
-        context_id = None
-        
-        if audio:
-            audio_result = await audio_processor.process_audio(audio)
-            processed["audio"] = audio_result
-            context_id = audio_result.get("context_id")
-        
-        if image:
-            image_result = await image_processor.process_image(image)
-            processed["image"] = image_result
-            context_id = context_id or image_result.get("context_id")
-        
-        if text:
-            text_result = text_processor.process_text(text)
-            processed["text"] = text_result
-            context_id = context_id or text_result.get("context_id")
+        processed, context_id = await _process_inputs(audio, image, text)
         
-        # Create MCP message
-        mcp_message = MCPMessage(
-            header=MCPHeader(
-                source="API_GATEWAY",
-                destination="ORCHESTRATOR",
-                context_id=context_id,
-                message_type="request"
-            ),
-            payload=processed
+        # Create MCP message; in synchronous mode the result is useless after the timeout
+        timeout = timeout or settings.gateway_reply_timeout
+        mcp_message = build_agent_request(
+            processed,
+            context_id,
+            deadline=time.time() + timeout if wait else None
         )
         
+        if wait:
+            # Synchronous mode: hold the request open until the agent replies
+            listener = await get_reply_listener(mcp_message.header.source)
+            try:
+                reply = await listener.request(
+                    mcp_message,
+                    lambda message: send_mcp_message(message, settings.rabbitmq_host),
+                    timeout
+                )
+            except TimeoutError:
+                logger.warning(f"No agent reply for context {context_id}")
+                raise HTTPException(
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                    detail="Timed out waiting for agent response"
+                )
+            return {
+                "status": "success" if reply.header.message_type != "error" else "error",
+                "context_id": context_id,
+                "message": "Input processed by orchestrator",
+                "result": reply.payload
+            }
+        
         # Send to RabbitMQ
         await send_mcp_message(mcp_message, settings.rabbitmq_host)
         
@@ -67,4 +104,47 @@ async def process_input(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error during processing"
-        )
\ No newline at end of file
+        )
+
+@router.post("/process/stream")
+async def process_input_stream(
+    audio: UploadFile = None,
+    image: UploadFile = None,
+    text: str = Form(None),
+    timeout: float = Form(None)
+):
+    """Server-sent events: one `chunk` per partial output, then `end` with the full result"""
+    validate_inputs(audio, image, text)
+    processed, context_id = await _process_inputs(audio, image, text)
+    mcp_message = build_agent_request(processed, context_id, stream=True)
+    # Bounds the gap between events, not the whole generation
+    timeout = timeout or settings.gateway_reply_timeout
+    listener = await get_reply_listener(mcp_message.header.source)
+    
+    async def events():
+        try:
+            async for reply in listener.stream(
+                mcp_message,
+                lambda message: send_mcp_message(message, settings.rabbitmq_host),
+                timeout
+            ):
+                if reply.header.message_type == STREAM_CHUNK:
+                    yield _sse("chunk", reply.payload)
+                else:
+                    yield _sse("end", {
+                        "status": "success" if reply.header.message_type != "error" else "error",
+                        "context_id": context_id,
+                        "result": reply.payload
+                    })
+        except TimeoutError:
+            logger.warning(f"Stream for context {context_id} timed out")
+            yield _sse("error", {"context_id": context_id, "detail": "Timed out waiting for agent response"})
+        except Exception as e:
+            logger.exception(f"Stream error: {str(e)}")
+            yield _sse("error", {"context_id": context_id, "detail": "Internal server error during processing"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import uuid
+from typing import Any, Dict, Set
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from app.services.streaming_stt import SpeechStream
+from app.services.agent_request import build_agent_request
+from common.schemas import AudioProcessingResult
+from common.mcp_protocol import MCPMessage
+from common.utilis import send_mcp_message
+from common.correlation import get_reply_listener
+from common.config import settings
+from common.logger import get_logger
+
+router = APIRouter()
+logger = get_logger()
+
+@router.websocket("/speech/stream")
+async def speech_stream(websocket: WebSocket, reply: bool = False):
+    """Streaming speech-to-text for the AR client.
+    
+    The client sends binary frames of 16 kHz mono s16le PCM as it captures
+    them, and optionally {"event": "end"} to close the current utterance.
+    The server sends JSON events: `partial` while the user speaks, `final`
+    when they stop (the transcript goes to the gateway agent as its query
+    at that moment, under the session's context_id), `reply` with the
+    agent result when connected with ?reply=true, and `error`.
+    """
+    await websocket.accept()
+    context_id = f"ctx-{uuid.uuid4()}"
+    send_lock = asyncio.Lock()
+    replies: Set[asyncio.Task] = set()
+    
+    async def send(event: Dict[str, Any]):
+        # Events come from several transcription tasks at once
+        async with send_lock:
+            await websocket.send_json(event)
+    
+    async def relay_reply(message: MCPMessage, utterance: int):
+        listener = await get_reply_listener(message.header.source)
+        try:
+            result = await listener.request(
+                message,
+                lambda outgoing: send_mcp_message(outgoing, settings.rabbitmq_host),
+                settings.gateway_reply_timeout
+            )
+            await send({
+                "type": "reply",
+                "utterance": utterance,
+                "context_id": context_id,
+                "status": "success" if result.header.message_type != "error" else "error",
+                "result": result.payload
+            })
+        except TimeoutError:
+            logger.warning(f"No agent reply for context {context_id}")
+            await send({"type": "error", "utterance": utterance, "detail": "Timed out waiting for agent response"})
+        except Exception as e:
+            logger.error(f"Could not forward utterance for context {context_id}: {str(e)}")
+            await send({"type": "error", "utterance": utterance, "detail": "Could not reach the agent"})
+    
+    async def on_transcript(event: Dict[str, Any]):
+        failure = None
+        if event["type"] == "final" and event["text"]:
+            # Hand the utterance to the gateway agent as soon as the user stops speaking
+            message = build_agent_request(
+                {"audio": AudioProcessingResult(
+                    text=event["text"],
+                    language=event["language"],
+                    duration=event["duration"],
+                    context_id=context_id
+                )},
+                context_id
+            )
+            event["context_id"] = context_id
+            if reply:
+                task = asyncio.create_task(relay_reply(message, event["utterance"]))
+                replies.add(task)
+                task.add_done_callback(replies.discard)
+            else:
+                try:
+                    await send_mcp_message(message, settings.rabbitmq_host)
+                except Exception as e:
+                    # Raised here it would be lost in the transcription task
+                    logger.error(f"Could not forward utterance for context {context_id}: {str(e)}")
+                    failure = {"type": "error", "utterance": event["utterance"], "detail": "Could not reach the agent"}
+        await send(event)
+        if failure is not None:
+            await send(failure)
+    
+    stream = SpeechStream(on_transcript)
+    try:
+        while True:
+            data = await websocket.receive()
+            if data["type"] == "websocket.disconnect":
+                break
+            if data.get("bytes"):
+                stream.feed(data["bytes"])
+            elif data.get("text"):
+                try:
+                    control = json.loads(data["text"])
+                except ValueError:
+                    await send({"type": "error", "detail": "Expected PCM frames or a JSON control message"})
+                    continue
+                if control.get("event") == "end":
+                    await stream.flush()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.exception(f"Speech stream error: {str(e)}")
+    finally:
+        await stream.close()
+        for task in list(replies):
+            task.cancel()
+        logger.info(f"Speech stream for context {context_id} closed")
@@ -0,0 +1,50 @@
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+from common.config import settings
+from common.mcp_protocol import MCPMessage, MCPHeader
+
+def _fields(result) -> Dict[str, Any]:
+    if result is None:
+        return {}
+    return result.dict() if isinstance(result, BaseModel) else result
+
+def build_agent_request(
+    processed: Dict[str, Any],
+    context_id: str,
+    deadline: Optional[float] = None,
+    stream: bool = False,
+    source: str = "API_GATEWAY"
+) -> MCPMessage:
+    """Turn processed modalities into a request the answering agent understands.
+    
+    Typed text and the spoken transcript form the query; text read off the
+    image is passed as context, and becomes the query when nothing else was
+    said. The request goes to GATEWAY_AGENT (the knowledge agent by default);
+    with `stream` it asks for partial output as stream chunks.
+    """
+    text, audio, image = (_fields(processed.get(modality)) for modality in ("text", "audio", "image"))
+    typed = (text.get("text") or "").strip()
+    spoken = (audio.get("text") or "").strip()
+    image_text = (image.get("text") or "").strip()
+    
+    query = " ".join(part for part in (typed, spoken) if part) or image_text
+    context: Dict[str, Any] = {"modalities": sorted(processed)}
+    if image_text and query != image_text:
+        context["image_text"] = image_text
+    if audio.get("language"):
+        context["language"] = audio["language"]
+    
+    payload: Dict[str, Any] = {"query": query, "context": context}
+    if stream:
+        payload["stream"] = True
+    
+    return MCPMessage(
+        header=MCPHeader(
+            source=source,
+            destination=settings.gateway_agent,
+            context_id=context_id,
+            message_type="request",
+            deadline=deadline
+        ),
+        payload=payload
+    )
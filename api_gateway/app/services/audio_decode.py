@@ -0,0 +1,180 @@
+"""Audio uploads to 16 kHz mono float32, inside the gateway process.
+
+WAV is parsed here: the samples are viewed in place (np.frombuffer over
+the data chunk) and converted to float32 once. OGG (Vorbis/Opus) and MP3
+are decoded by libsndfile through the soundfile package; libsndfile 1.1
+or later reads MP3. Raw PCM is taken as s16le at 16 kHz mono unless the
+content type says otherwise, e.g. "audio/pcm;rate=48000;channels=2".
+
+Resampling uses scipy's polyphase filter when scipy is installed and a
+windowed-sinc filter in numpy otherwise; both are vectorized.
+"""
+import io
+import struct
+from math import gcd
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+# Optional decoders and resampler
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+try:
+    from scipy.signal import resample_poly
+except ImportError:
+    resample_poly = None
+
+TARGET_RATE = 16000
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Half-width of the numpy resampling filter, in input samples at the lower rate
+_SINC_ZEROS = 16
+_RESAMPLE_BLOCK = 1 << 16
+
+class AudioDecodeError(ValueError):
+    """Raised for audio the gateway cannot decode"""
+    pass
+
+def sniff_format(data: bytes, filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
+    """'wav', 'ogg', 'mp3' or 'pcm', from the magic bytes first and the name second"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return "wav"
+    if data[:4] == b"OggS":
+        return "ogg"
+    # ID3 tag, or an MPEG audio frame sync
+    if data[:3] == b"ID3" or (len(data) > 1 and data[0] == 0xFF and data[1] & 0xE0 == 0xE0):
+        return "mp3"
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in ("audio/mpeg", "audio/mp3") or (filename or "").lower().endswith(".mp3"):
+        return "mp3"
+    return "pcm"
+
+def decode_audio(
+    data: bytes,
+    filename: Optional[str] = None,
+    content_type: Optional[str] = None,
+    target_rate: int = TARGET_RATE
+) -> np.ndarray:
+    """Decode an upload to mono float32 at target_rate, ready for Whisper"""
+    format = sniff_format(data, filename, content_type)
+    if format == "wav":
+        samples, rate = _read_wav(data)
+    elif format == "pcm":
+        samples, rate = _read_pcm(data, content_type)
+    else:
+        samples, rate = _read_soundfile(data, format)
+    return resample(to_mono(samples), rate, target_rate)
+
+def to_mono(samples: np.ndarray) -> np.ndarray:
+    """(frames, channels) float32 to (frames,) by averaging the channels"""
+    if samples.ndim == 1:
+        return samples
+    if samples.shape[1] == 1:
+        return samples[:, 0]
+    return samples.mean(axis=1, dtype=np.float32)
+
+def resample(samples: np.ndarray, rate: int, target_rate: int = TARGET_RATE) -> np.ndarray:
+    if rate == target_rate or len(samples) == 0:
+        return samples
+    divisor = gcd(rate, target_rate)
+    up, down = target_rate // divisor, rate // divisor
+    if resample_poly is not None:
+        return resample_poly(samples, up, down).astype(np.float32, copy=False)
+    return _resample_sinc(samples, rate, target_rate)
+
+def _resample_sinc(samples: np.ndarray, rate: int, target_rate: int) -> np.ndarray:
+    """Windowed-sinc interpolation; the cutoff follows the lower of the two rates"""
+    ratio = target_rate / rate
+    cutoff = min(1.0, ratio)
+    half_width = int(np.ceil(_SINC_ZEROS / cutoff))
+    taps = np.arange(-half_width + 1, half_width + 1)
+    padded = np.pad(samples, (half_width, half_width + 1))
+    output = np.empty(int(len(samples) * ratio), dtype=np.float32)
+    # Blocks bound the (outputs x taps) matrices for long recordings
+    for start in range(0, len(output), _RESAMPLE_BLOCK):
+        positions = np.arange(start, min(start + _RESAMPLE_BLOCK, len(output))) / ratio
+        base = np.floor(positions).astype(np.int64)
+        offsets = (positions - base)[:, None] - taps[None, :]
+        weights = cutoff * np.sinc(cutoff * offsets) * np.hanning(2 * half_width + 1)[half_width + taps][None, :]
+        window = padded[(base + half_width)[:, None] + taps[None, :]]
+        output[start:start + len(positions)] = np.einsum("ij,ij->i", window, weights)
+    return output
+
+def _read_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    view = memoryview(data)
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id, size = struct.unpack_from("<4sI", data, offset)
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack_from("<HHIIHH", data, body)
+            if fmt[0] == _WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                # The real format code leads the subformat GUID
+                fmt = (struct.unpack_from("<H", data, body + 24)[0],) + fmt[1:]
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioDecodeError("WAV data chunk before its fmt chunk")
+            # Streams written on the fly often carry a placeholder size
+            end = min(body + size, len(data))
+            return _wav_samples(view[body:end], fmt), fmt[2]
+        offset = body + size + (size & 1)
+    raise AudioDecodeError("WAV file without a data chunk")
+
+def _wav_samples(raw: memoryview, fmt: Tuple[int, ...]) -> np.ndarray:
+    format_code, channels, _, _, block_align, bits = fmt
+    usable = len(raw) - len(raw) % block_align
+    raw = raw[:usable]
+    if format_code == _WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        samples = np.frombuffer(raw, dtype=np.float32 if bits == 32 else np.float64)
+        samples = samples.astype(np.float32, copy=False)
+    elif format_code == _WAVE_FORMAT_PCM and bits == 8:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif format_code == _WAVE_FORMAT_PCM and bits == 16:
+        samples = _scale(np.frombuffer(raw, dtype="<i2"), 15)
+    elif format_code == _WAVE_FORMAT_PCM and bits == 24:
+        triples = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        # Place the three bytes in the top of an int32 to keep the sign
+        widened = (triples[:, 0].astype(np.int32) << 8) | (triples[:, 1].astype(np.int32) << 16) | (triples[:, 2].astype(np.int32) << 24)
+        samples = _scale(widened, 31)
+    elif format_code == _WAVE_FORMAT_PCM and bits == 32:
+        samples = _scale(np.frombuffer(raw, dtype="<i4"), 31)
+    else:
+        raise AudioDecodeError(f"Unsupported WAV encoding: format {format_code:#06x}, {bits} bits")
+    return samples.reshape(-1, channels)
+
+def _scale(samples: np.ndarray, bits: int) -> np.ndarray:
+    # One pass from integers to float32, no intermediate float64 array
+    return np.multiply(samples, np.float32(1 / (1 << bits)), dtype=np.float32)
+
+def _read_pcm(data: bytes, content_type: Optional[str]) -> Tuple[np.ndarray, int]:
+    params = _content_type_params(content_type)
+    rate = int(params.get("rate", TARGET_RATE))
+    channels = int(params.get("channels", 1))
+    # audio/L16 is big-endian by definition (RFC 2586); other raw PCM is little-endian
+    big_endian = (content_type or "").lower().startswith("audio/l16")
+    frame_bytes = 2 * channels
+    usable = len(data) - len(data) % frame_bytes
+    samples = np.frombuffer(memoryview(data)[:usable], dtype=">i2" if big_endian else "<i2")
+    return _scale(samples, 15).reshape(-1, channels), rate
+
+def _content_type_params(content_type: Optional[str]) -> Dict[str, str]:
+    params = {}
+    for part in (content_type or "").split(";")[1:]:
+        key, _, value = part.partition("=")
+        params[key.strip().lower()] = value.strip()
+    return params
+
+def _read_soundfile(data: bytes, format: str) -> Tuple[np.ndarray, int]:
+    if soundfile is None:
+        raise AudioDecodeError(f"Decoding {format} needs the soundfile package")
+    try:
+        samples, rate = soundfile.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    except Exception as e:
+        raise AudioDecodeError(f"Could not decode {format} audio: {str(e)}")
+    return samples, rate
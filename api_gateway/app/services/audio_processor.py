@@ -1,55 +1,22 @@
 import logging
-import whisper
-import numpy as np
-import time
 import uuid
-from io import BytesIO
-from pydub import AudioSegment
 from fastapi import UploadFile, HTTPException, status
 from common.logger import get_logger
-from common.config import settings
 from common.schemas import AudioProcessingResult
+from .audio_decode import AudioDecodeError, decode_audio
+from .executor import run_blocking
+from .transcription import get_transcription_service
 
 logger = get_logger()
 
-# Load model at startup
-model = None
-
-def load_model():
-    global model
-    if model is None:
-        logger.info(f"Loading Whisper model: {settings.whisper_model}")
-        start_time = time.time()
-        model = whisper.load_model(settings.whisper_model)
-        load_time = time.time() - start_time
-        logger.info(f"Whisper model loaded in {load_time:.2f} seconds")
-
 async def process_audio(audio_file: UploadFile) -> AudioProcessingResult:
     try:
-        # Ensure model is loaded
-        if model is None:
-            load_model()
-        
         # Read audio file
         contents = await audio_file.read()
-        audio_buffer = BytesIO(contents)
-        
-        # Convert to WAV if needed
-        if audio_file.filename.endswith('.mp3'):
-            audio = AudioSegment.from_mp3(audio_buffer)
-            audio = audio.set_frame_rate(16000)
-            audio = audio.set_channels(1)
-            buffer_wav = BytesIO()
-            audio.export(buffer_wav, format="wav")
-            audio_data = buffer_wav.getvalue()
-        else:
-            audio_data = contents
-        
-        # Convert to numpy array
-        audio_np = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
-        
-        # Transcribe
-        result = model.transcribe(audio_np, fp16=False)  # fp16=False for CPU compatibility
+        # Decoding is CPU-bound; keep it off the event loop
+        audio_np = await run_blocking(decode_audio, contents, audio_file.filename, audio_file.content_type)
+        # Whisper runs batched with other requests' audio
+        result = await get_transcription_service().transcribe(audio_np)
         
         # Generate context ID
         context_id = f"ctx-{uuid.uuid4()}"
@@ -61,9 +28,21 @@ async def process_audio(audio_file: UploadFile) -> AudioProcessingResult:
             context_id=context_id
         )
     
+    except AudioDecodeError as e:
+        logger.error(f"Audio decoding failed: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=str(e)
+        )
+    except TimeoutError as e:
+        logger.error(f"Audio processing timed out: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Audio transcription timed out"
+        )
     except Exception as e:
         logger.error(f"Audio processing failed: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Audio processing error"
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,43 @@
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from common.logger import get_logger
+from common.config import settings
+
+logger = get_logger()
+
+# Whisper and Tesseract run here, never on the event loop
+_executor: Optional[Executor] = None
+
+def get_executor() -> Executor:
+    """Pool for CPU-bound input processing; GATEWAY_EXECUTOR picks threads or processes"""
+    global _executor
+    if _executor is None:
+        if settings.gateway_executor == "process":
+            # Each process loads its own models on first use
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.gateway_executor_workers,
+                mp_context=multiprocessing.get_context(settings.process_start_method)
+            )
+        elif settings.gateway_executor == "thread":
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.gateway_executor_workers,
+                thread_name_prefix="gateway-cpu"
+            )
+        else:
+            raise ValueError(f"Unknown gateway executor: {settings.gateway_executor}")
+        logger.info(f"Gateway {settings.gateway_executor} executor with {settings.gateway_executor_workers} workers")
+    return _executor
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run func in the executor; with processes, func and its arguments must be picklable"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -1,11 +1,10 @@
 import logging
-import pytesseract
 import uuid
-from PIL import Image
-from io import BytesIO
 from fastapi import UploadFile, HTTPException, status
 from common.logger import get_logger
 from common.schemas import ImageProcessingResult
+from .executor import run_blocking
+from .ocr import get_ocr_service, prepare_image
 
 logger = get_logger()
 
@@ -13,29 +12,31 @@ async def process_image(image_file: UploadFile) -> ImageProcessingResult:
     try:
         # Read image file
         contents = await image_file.read()
-        image = Image.open(BytesIO(contents))
-        
-        # Perform OCR
-        text = pytesseract.image_to_string(image)
-        
-        # Get image metadata
-        width, height = image.size
-        format = image.format
+        # Decoding and text detection are CPU-bound; keep them off the event loop
+        prepared = await run_blocking(prepare_image, contents)
+        # Only the detected text regions are OCR'd; text-free frames skip Tesseract
+        text = await get_ocr_service().recognize(prepared.regions)
         
         # Generate context ID
         context_id = f"ctx-{uuid.uuid4()}"
         
         return ImageProcessingResult(
-            text=text.strip(),
-            width=width,
-            height=height,
-            format=format,
+            text=text,
+            width=prepared.width,
+            height=prepared.height,
+            format=prepared.format,
             context_id=context_id
         )
     
+    except TimeoutError as e:
+        logger.error(f"Image processing timed out: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Image OCR timed out"
+        )
     except Exception as e:
         logger.error(f"Image processing failed: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Image processing error"
-        )
\ No newline at end of file
+        )
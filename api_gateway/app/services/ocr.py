@@ -0,0 +1,261 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image, ImageOps
+from common.logger import get_logger
+from common.config import settings
+
+# Only needed to read text
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+# Keeps a Tesseract engine loaded per worker instead of a subprocess per call
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+logger = get_logger()
+
+ANALYSIS_SIDE = 640  # longer side of the copy the text detector looks at
+CELL = 16  # detector grid, in analysis pixels
+EDGE_STEP = 40  # grey-level jump that counts as a stroke edge
+
+Box = Tuple[int, int, int, int]  # left, top, right, bottom
+Engine = Callable[[Image.Image], str]
+
+class PreparedImage:
+    """An upload reduced to what OCR needs: binarized crops of its text regions"""
+    
+    def __init__(self, width: int, height: int, format: Optional[str], regions: List[Image.Image], boxes: List[Box]):
+        self.width = width
+        self.height = height
+        self.format = format
+        self.regions = regions
+        self.boxes = boxes
+
+def prepare_image(contents: bytes, max_side: Optional[int] = None, edge_density: Optional[float] = None) -> PreparedImage:
+    """Decode, downscale, detect text and binarize; runs in the gateway executor"""
+    max_side = max_side or settings.ocr_max_side
+    image = Image.open(BytesIO(contents))
+    width, height = image.size
+    format = image.format
+    # JPEG decodes straight to greyscale at 1/2, 1/4 or 1/8 scale
+    image.draft("L", (max_side, max_side))
+    gray = ImageOps.exif_transpose(image).convert("L")
+    if max(gray.size) > max_side:
+        gray.thumbnail((max_side, max_side), Image.BILINEAR)
+    
+    boxes = find_text_regions(gray, edge_density)
+    regions = [binarize(gray.crop(box)) for box in boxes]
+    return PreparedImage(width, height, format, regions, boxes)
+
+def find_text_regions(gray: Image.Image, edge_density: Optional[float] = None) -> List[Box]:
+    """Boxes (in gray's coordinates) around clusters of text-like strokes.
+    
+    The image is scaled to ANALYSIS_SIDE and cut into CELL-sized cells. A
+    cell looks like text when enough of its pixels sit on sharp horizontal
+    and vertical grey-level steps, and it has a text-like neighbour on the
+    same row, since text runs in lines. Neighbouring cells are merged into
+    boxes. Smooth photos, skies and walls yield no boxes at all.
+    """
+    edge_density = edge_density if edge_density is not None else settings.ocr_edge_density
+    scale = min(1.0, ANALYSIS_SIDE / max(gray.size))
+    small = gray.resize((max(1, round(gray.width * scale)), max(1, round(gray.height * scale))), Image.BILINEAR) if scale < 1 else gray
+    pixels = np.asarray(small, dtype=np.int16)
+    rows, cols = pixels.shape[0] // CELL, pixels.shape[1] // CELL
+    if rows == 0 or cols == 0:
+        return []
+    # One extra row and column so the differences cover every cell
+    pixels = np.pad(pixels[:rows * CELL, :cols * CELL], ((0, 1), (0, 1)), mode="edge")
+    
+    # Stroke edges in each direction, averaged per cell
+    across = np.abs(np.diff(pixels, axis=1))[:-1] > EDGE_STEP
+    down = np.abs(np.diff(pixels, axis=0))[:, :-1] > EDGE_STEP
+    across = across.reshape(rows, CELL, cols, CELL).mean(axis=(1, 3))
+    down = down.reshape(rows, CELL, cols, CELL).mean(axis=(1, 3))
+    # Very dense edges are foliage or noise rather than glyphs
+    text = (across >= edge_density) & (down >= edge_density / 2) & (across <= 0.6)
+    
+    in_line = np.zeros_like(text)
+    in_line[:, 1:] |= text[:, :-1]
+    in_line[:, :-1] |= text[:, 1:]
+    text &= in_line
+    if not text.any():
+        return []
+    
+    # Bridge the gap between words before grouping cells
+    joined = text.copy()
+    joined[:, 1:] |= text[:, :-1]
+    joined[:, :-1] |= text[:, 1:]
+    
+    to_gray = 1 / scale
+    boxes = []
+    for top, left, bottom, right in _components(joined):
+        # Half a cell of margin so strokes at the edge are not clipped
+        boxes.append((
+            max(0, int((left * CELL - CELL / 2) * to_gray)),
+            max(0, int((top * CELL - CELL / 2) * to_gray)),
+            min(gray.width, int(((right + 1) * CELL + CELL / 2) * to_gray)),
+            min(gray.height, int(((bottom + 1) * CELL + CELL / 2) * to_gray))
+        ))
+    # Reading order
+    return sorted(boxes, key=lambda box: (box[1], box[0]))
+
+def _components(mask: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """Bounding cells (top, left, bottom, right) of each 4-connected group in a small grid"""
+    seen = np.zeros_like(mask)
+    components = []
+    for start in zip(*np.nonzero(mask)):
+        if seen[start]:
+            continue
+        seen[start] = True
+        queue: Deque[Tuple[int, int]] = deque([start])
+        top, left = bottom, right = start
+        while queue:
+            row, col = queue.popleft()
+            top, bottom = min(top, row), max(bottom, row)
+            left, right = min(left, col), max(right, col)
+            for neighbour in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+                if 0 <= neighbour[0] < mask.shape[0] and 0 <= neighbour[1] < mask.shape[1] and mask[neighbour] and not seen[neighbour]:
+                    seen[neighbour] = True
+                    queue.append(neighbour)
+        components.append((top, left, bottom, right))
+    return components
+
+def binarize(region: Image.Image) -> Image.Image:
+    """Otsu threshold per region, as dark text on a light background"""
+    pixels = np.asarray(region, dtype=np.uint8)
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    below = np.cumsum(histogram)
+    below_sum = np.cumsum(histogram * levels)
+    above = below[-1] - below
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (below_sum[-1] * below - below_sum * below[-1]) ** 2 / (below * above)
+    # A flat region has no valid split; any threshold will do
+    threshold = int(np.argmax(np.nan_to_num(between[:-1])))
+    binary = pixels > threshold
+    # Light text on a dark sign: most of a text box is background
+    if binary.mean() < 0.5:
+        binary = ~binary
+    return Image.fromarray(binary.astype(np.uint8) * 255)
+
+class TesseractEngine:
+    """One worker's OCR engine; tesserocr when installed, pytesseract otherwise"""
+    
+    def __init__(self):
+        self._api = None
+        if tesserocr is not None:
+            self._api = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.SINGLE_BLOCK)
+        elif pytesseract is None:
+            raise RuntimeError("OCR needs the tesserocr or pytesseract package")
+    
+    def __call__(self, region: Image.Image) -> str:
+        if self._api is not None:
+            self._api.SetImage(region)
+            return self._api.GetUTF8Text()
+        return pytesseract.image_to_string(region, config="--psm 6")
+    
+    def close(self):
+        if self._api is not None:
+            self._api.End()
+            self._api = None
+
+class OCRService:
+    """Runs OCR on text regions in a pool of workers that keep their engines.
+    
+    Each worker thread creates its engine on first use and reuses it for
+    every later region. Regions of one image are read in parallel, and
+    images without text regions never reach the pool.
+    """
+    
+    def __init__(
+        self,
+        engine_factory: Optional[Callable[[], Engine]] = None,
+        workers: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
+        self.engine_factory = engine_factory or TesseractEngine
+        self.workers = max(1, workers or settings.ocr_workers)
+        self.timeout = timeout or settings.ocr_timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+        self._local = threading.local()
+        self._engines: List[Engine] = []
+        self._engines_lock = threading.Lock()
+        self.stats = {
+            "images": 0,
+            "text_free": 0,
+            "regions": 0,
+            "timeouts": 0,
+            "ocr_seconds": 0.0
+        }
+    
+    async def recognize(self, regions: List[Image.Image], timeout: Optional[float] = None) -> str:
+        """Text of the regions in order; raises TimeoutError after `timeout` seconds"""
+        self.stats["images"] += 1
+        if not regions:
+            self.stats["text_free"] += 1
+            return ""
+        self.stats["regions"] += len(regions)
+        loop = asyncio.get_running_loop()
+        reads = [loop.run_in_executor(self._executor, self._read, region) for region in regions]
+        try:
+            texts = await asyncio.wait_for(asyncio.gather(*reads), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise TimeoutError(f"OCR did not finish within {timeout or self.timeout}s")
+        return "\n".join(text.strip() for text in texts if text.strip())
+    
+    def metrics(self) -> Dict[str, Any]:
+        metrics = dict(self.stats)
+        metrics["workers"] = self.workers
+        metrics["engines"] = len(self._engines)
+        metrics["text_free_ratio"] = round(self.stats["text_free"] / self.stats["images"], 2) if self.stats["images"] else None
+        return metrics
+    
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._engines_lock:
+            for engine in self._engines:
+                if hasattr(engine, "close"):
+                    engine.close()
+            self._engines.clear()
+    
+    def _read(self, region: Image.Image) -> str:
+        engine = getattr(self._local, "engine", None)
+        if engine is None:
+            engine = self._local.engine = self.engine_factory()
+            with self._engines_lock:
+                self._engines.append(engine)
+        started = time.perf_counter()
+        try:
+            return engine(region)
+        finally:
+            self.stats["ocr_seconds"] += time.perf_counter() - started
+
+# One pool per gateway process, started on first use
+_service: Optional[OCRService] = None
+
+def get_ocr_service() -> OCRService:
+    global _service
+    if _service is None:
+        _service = OCRService()
+        logger.info(f"OCR pool with {_service.workers} workers, tesserocr {'on' if tesserocr else 'off'}")
+    return _service
+
+def ocr_metrics() -> Dict[str, Any]:
+    return _service.metrics() if _service is not None else {}
+
+def close_ocr_service():
+    global _service
+    if _service is not None:
+        _service.close()
+        _service = None
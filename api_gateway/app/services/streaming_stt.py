@@ -0,0 +1,193 @@
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set
+import numpy as np
+from common.logger import get_logger
+from common.config import settings
+from .transcription import SAMPLE_RATE, TranscriptionService, get_transcription_service
+
+# Optional, more robust voice activity detection
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+logger = get_logger()
+
+FRAME_MS = 30
+BYTES_PER_SAMPLE = 2  # signed 16-bit little-endian PCM
+
+Emit = Callable[[Dict[str, Any]], Awaitable[None]]
+
+class VoiceActivityDetector:
+    """Classifies 30 ms PCM frames as speech or silence.
+    
+    Uses webrtcvad when it is installed. Otherwise a frame is speech when
+    its RMS level is above both STT_ENERGY_THRESHOLD and three times the
+    noise floor, which tracks the level of recent non-speech frames.
+    """
+    
+    def __init__(self, aggressiveness: Optional[int] = None, energy_threshold: Optional[float] = None):
+        self.frame_bytes = SAMPLE_RATE * FRAME_MS // 1000 * BYTES_PER_SAMPLE
+        self.energy_threshold = energy_threshold if energy_threshold is not None else settings.stt_energy_threshold
+        self.noise_floor = self.energy_threshold / 3
+        self._vad = None
+        if webrtcvad is not None:
+            self._vad = webrtcvad.Vad(aggressiveness if aggressiveness is not None else settings.stt_vad_aggressiveness)
+    
+    def is_speech(self, frame: bytes) -> bool:
+        if self._vad is not None:
+            return self._vad.is_speech(frame, SAMPLE_RATE)
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32) / 32768.0
+        level = float(np.sqrt(np.mean(samples ** 2)))
+        speech = level >= max(self.energy_threshold, self.noise_floor * 3)
+        if not speech:
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * level
+        return speech
+
+def pcm_to_float(pcm: bytes) -> np.ndarray:
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+class SpeechStream:
+    """Turns captured PCM into partial and final transcripts as it arrives.
+    
+    Feed 16 kHz mono s16le audio in any chunk size. Speech starts at the
+    first voiced frame (with STT_PREROLL_MS of audio before it) and ends
+    after STT_SILENCE_MS of silence or STT_MAX_UTTERANCE seconds. While
+    the user speaks, a `partial` transcript of the utterance so far is
+    emitted about every STT_PARTIAL_INTERVAL seconds of audio; when speech
+    ends, one `final` transcript is emitted. Finals come out in order and
+    after every partial of their utterance.
+    """
+    
+    def __init__(
+        self,
+        emit: Emit,
+        service: Optional[TranscriptionService] = None,
+        vad: Optional[VoiceActivityDetector] = None,
+        silence_ms: Optional[int] = None,
+        min_speech_ms: Optional[int] = None,
+        partial_interval: Optional[float] = None,
+        max_utterance: Optional[float] = None,
+        preroll_ms: Optional[int] = None
+    ):
+        self.emit = emit
+        self.service = service or get_transcription_service()
+        self.vad = vad or VoiceActivityDetector()
+        self.silence_frames = (silence_ms or settings.stt_silence_ms) // FRAME_MS
+        self.min_speech_frames = (min_speech_ms if min_speech_ms is not None else settings.stt_min_speech_ms) // FRAME_MS
+        self.partial_bytes = int((partial_interval or settings.stt_partial_interval) * SAMPLE_RATE) * BYTES_PER_SAMPLE
+        self.max_utterance_bytes = int((max_utterance or settings.stt_max_utterance) * SAMPLE_RATE) * BYTES_PER_SAMPLE
+        self._preroll: Deque[bytes] = deque(maxlen=(preroll_ms if preroll_ms is not None else settings.stt_preroll_ms) // FRAME_MS)
+        self._pending = bytearray()
+        self._utterance = bytearray()
+        self._utterance_index = 0
+        self._speech_frames = 0
+        self._silent_frames = 0
+        self._since_partial = 0
+        self._partial_task: Optional[asyncio.Task] = None
+        self._final_task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+    
+    @property
+    def in_speech(self) -> bool:
+        return bool(self._utterance)
+    
+    def feed(self, pcm: bytes):
+        """Add captured audio; transcripts are emitted from background tasks"""
+        frame_bytes = self.vad.frame_bytes
+        self._pending += pcm
+        while len(self._pending) >= frame_bytes:
+            frame = bytes(self._pending[:frame_bytes])
+            del self._pending[:frame_bytes]
+            self._on_frame(frame)
+    
+    async def flush(self):
+        """End of input: finish the current utterance and wait for every transcript"""
+        if self.in_speech:
+            self._finish()
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+    
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        self._tasks.clear()
+    
+    def _on_frame(self, frame: bytes):
+        speech = self.vad.is_speech(frame)
+        if not self.in_speech:
+            if not speech:
+                self._preroll.append(frame)
+                return
+            # Keep a little audio from before the first voiced frame
+            for earlier in self._preroll:
+                self._utterance += earlier
+            self._preroll.clear()
+        
+        self._utterance += frame
+        self._since_partial += len(frame)
+        if speech:
+            self._speech_frames += 1
+            self._silent_frames = 0
+        else:
+            self._silent_frames += 1
+        
+        if self._silent_frames >= self.silence_frames or len(self._utterance) >= self.max_utterance_bytes:
+            self._finish()
+        elif self._since_partial >= self.partial_bytes:
+            self._start_partial()
+    
+    def _start_partial(self):
+        # Partials are best effort: skip one rather than queue behind a running one
+        if self._partial_task is not None and not self._partial_task.done():
+            return
+        self._since_partial = 0
+        self._partial_task = self._spawn(self._partial(self._utterance_index, bytes(self._utterance)))
+    
+    def _finish(self):
+        audio = bytes(self._utterance)
+        speech_frames = self._speech_frames
+        index = self._utterance_index
+        self._utterance = bytearray()
+        self._utterance_index += 1
+        self._speech_frames = self._silent_frames = self._since_partial = 0
+        if speech_frames < self.min_speech_frames:
+            # A click or a cough, not an utterance
+            return
+        self._final_task = self._spawn(self._final(index, audio, self._final_task))
+    
+    def _spawn(self, coroutine) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+    
+    async def _partial(self, index: int, audio: bytes):
+        try:
+            result = await self.service.transcribe(pcm_to_float(audio))
+        except Exception as e:
+            logger.debug(f"Partial transcript failed: {str(e)}")
+            return
+        # The utterance may have ended while this partial was transcribed
+        if index == self._utterance_index:
+            await self.emit({"type": "partial", "utterance": index, "text": result["text"].strip()})
+    
+    async def _final(self, index: int, audio: bytes, previous: Optional[asyncio.Task]):
+        transcription = asyncio.ensure_future(self.service.transcribe(pcm_to_float(audio)))
+        if previous is not None:
+            # Transcribe right away, but report after the previous utterance
+            await asyncio.gather(previous, return_exceptions=True)
+        try:
+            result = await transcription
+        except Exception as e:
+            logger.error(f"Final transcript failed: {str(e)}")
+            await self.emit({"type": "error", "utterance": index, "detail": "Transcription failed"})
+            return
+        await self.emit({
+            "type": "final",
+            "utterance": index,
+            "text": result["text"].strip(),
+            "language": result.get("language", "en"),
+            "duration": result.get("duration", len(audio) / BYTES_PER_SAMPLE / SAMPLE_RATE)
+        })
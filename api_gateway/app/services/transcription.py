@@ -0,0 +1,227 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional
+import numpy as np
+from common.logger import get_logger
+from common.config import settings
+
+# Only needed for the real model
+try:
+    import torch
+    import whisper
+except ImportError:
+    torch = None
+    whisper = None
+
+logger = get_logger()
+
+SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30
+
+BatchTranscriber = Callable[[List[np.ndarray]], List[Dict[str, Any]]]
+
+class WhisperBatch:
+    """Transcribes a batch of clips with one encoder and one decoder pass.
+    
+    Clips up to Whisper's 30 second window are padded and decoded together;
+    longer clips need Whisper's sliding window and are transcribed one by one.
+    """
+    
+    def __init__(self, model_name: Optional[str] = None):
+        self.model_name = model_name or settings.whisper_model
+        self.model = None
+        self._lock = threading.Lock()
+    
+    def load(self):
+        with self._lock:
+            if self.model is None:
+                if whisper is None:
+                    raise RuntimeError("Transcription needs the openai-whisper package")
+                logger.info(f"Loading Whisper model: {self.model_name}")
+                start_time = time.time()
+                self.model = whisper.load_model(self.model_name)
+                logger.info(f"Whisper model loaded in {time.time() - start_time:.2f} seconds")
+        return self.model
+    
+    def __call__(self, clips: List[np.ndarray]) -> List[Dict[str, Any]]:
+        model = self.load()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(clips)
+        
+        short = [i for i, clip in enumerate(clips) if len(clip) <= SAMPLE_RATE * WINDOW_SECONDS]
+        if short:
+            mels = torch.stack([
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(clips[i]), n_mels=model.dims.n_mels)
+                for i in short
+            ]).to(model.device)
+            # fp16=False for CPU compatibility
+            decoded = whisper.decode(model, mels, whisper.DecodingOptions(fp16=False))
+            for i, result in zip(short, decoded):
+                results[i] = {"text": result.text, "language": result.language}
+        
+        for i, clip in enumerate(clips):
+            if results[i] is None:
+                result = model.transcribe(clip, fp16=False)
+                results[i] = {"text": result["text"], "language": result.get("language", "en")}
+            results[i]["duration"] = len(clip) / SAMPLE_RATE
+        return results
+
+class _Request:
+    __slots__ = ("audio", "future")
+    
+    def __init__(self, audio: np.ndarray, future: asyncio.Future):
+        self.audio = audio
+        self.future = future
+
+class TranscriptionService:
+    """Queues audio clips and transcribes them in batches on dedicated workers.
+    
+    A batch closes when it reaches `max_batch_size` or `max_wait` seconds
+    after its first clip arrived. A new batch is only formed when a worker
+    is free, so under load clips keep queueing and batches grow, while a
+    lone request waits at most `max_wait`. Requests that time out while
+    queued are dropped before their batch runs.
+    """
+    
+    def __init__(
+        self,
+        transcribe_batch: Optional[BatchTranscriber] = None,
+        max_batch_size: Optional[int] = None,
+        max_wait: Optional[float] = None,
+        workers: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
+        self.transcribe_batch = transcribe_batch or WhisperBatch()
+        self.max_batch_size = max(1, max_batch_size or settings.whisper_batch_size)
+        self.max_wait = max_wait if max_wait is not None else settings.whisper_batch_wait
+        self.workers = max(1, workers or settings.whisper_workers)
+        self.timeout = timeout or settings.whisper_timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="whisper")
+        self._pending: Deque[_Request] = deque()
+        self._arrived: Optional[asyncio.Event] = None
+        self._free_workers: Optional[asyncio.Semaphore] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self.stats = {
+            "requests": 0,
+            "batches": 0,
+            "batched": 0,
+            "largest_batch": 0,
+            "timeouts": 0,
+            "failed": 0,
+            "batch_seconds": 0.0
+        }
+    
+    async def transcribe(self, audio: np.ndarray, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Transcribe 16 kHz mono float32 audio; raises TimeoutError after `timeout` seconds"""
+        self._ensure_started()
+        request = _Request(audio, asyncio.get_running_loop().create_future())
+        self._pending.append(request)
+        self._arrived.set()
+        self.stats["requests"] += 1
+        try:
+            # Cancels the request's future on timeout, so the batcher skips it
+            return await asyncio.wait_for(request.future, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise TimeoutError(f"Transcription did not finish within {timeout or self.timeout}s")
+    
+    def metrics(self) -> Dict[str, Any]:
+        metrics = dict(self.stats)
+        metrics["queue_depth"] = len(self._pending)
+        metrics["busy_workers"] = self.workers - self._free_workers._value if self._free_workers else 0
+        metrics["mean_batch_size"] = round(self.stats["batched"] / self.stats["batches"], 2) if self.stats["batches"] else None
+        return metrics
+    
+    def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        while self._pending:
+            request = self._pending.popleft()
+            if not request.future.done():
+                request.future.set_exception(RuntimeError("Transcription service closed"))
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _ensure_started(self):
+        if self._batcher is None:
+            self._arrived = asyncio.Event()
+            self._free_workers = asyncio.Semaphore(self.workers)
+            self._batcher = asyncio.get_running_loop().create_task(self._run())
+            logger.info(
+                f"Transcription batching up to {self.max_batch_size} clips, "
+                f"{self.max_wait * 1000:.0f} ms window, {self.workers} workers"
+            )
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._free_workers.acquire()
+            while not self._pending:
+                self._arrived.clear()
+                await self._arrived.wait()
+            
+            deadline = loop.time() + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._arrived.clear()
+                try:
+                    await asyncio.wait_for(self._arrived.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            
+            batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch_size))]
+            loop.create_task(self._execute(batch))
+    
+    async def _execute(self, batch: List[_Request]):
+        try:
+            batch = [request for request in batch if not request.future.done()]
+            if not batch:
+                return
+            self.stats["batches"] += 1
+            self.stats["batched"] += len(batch)
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            
+            started = time.perf_counter()
+            try:
+                results = await asyncio.get_running_loop().run_in_executor(
+                    self._executor,
+                    self.transcribe_batch,
+                    [request.audio for request in batch]
+                )
+            except Exception as e:
+                self.stats["failed"] += len(batch)
+                logger.error(f"Transcription batch of {len(batch)} failed: {str(e)}")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                return
+            finally:
+                self.stats["batch_seconds"] += time.perf_counter() - started
+            
+            for request, result in zip(batch, results):
+                if not request.future.done():
+                    request.future.set_result(result)
+        finally:
+            self._free_workers.release()
+
+# One service per gateway process, started on first use
+_service: Optional[TranscriptionService] = None
+
+def get_transcription_service() -> TranscriptionService:
+    global _service
+    if _service is None:
+        _service = TranscriptionService()
+    return _service
+
+def transcription_metrics() -> Dict[str, Any]:
+    return _service.metrics() if _service is not None else {}
+
+def close_transcription_service():
+    global _service
+    if _service is not None:
+        _service.close()
+        _service = None
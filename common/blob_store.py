@@ -0,0 +1,224 @@
+"""Claim-check store for large MCP payload fields.
+
+Byte fields of at least BLOB_THRESHOLD bytes are written to the store once
+when a message is encoded for the broker, and the message carries only
+{"$ref": key, "size": n}. Receivers resolve references when the payload
+is first read; FileBlobStore hands out read-only memoryviews over an mmap,
+so the bytes are not copied into the process.
+
+FileBlobStore needs a directory every sender and receiver can see: /dev/shm
+on one host, a shared volume across containers. Other stores (object
+storage, Redis, ...) subclass BlobStore and are installed with
+set_blob_store().
+"""
+import mmap
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Union
+from .config import settings
+from .logger import get_logger
+
+logger = get_logger("blob_store")
+
+REF_KEY = "$ref"
+BlobData = Union[bytes, bytearray, memoryview]
+
+class BlobNotFound(KeyError):
+    """Raised for unknown or expired blob keys"""
+    pass
+
+class BlobStore:
+    """Interface for blob stores; keys are opaque strings chosen by the store"""
+    
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl or settings.blob_ttl
+        self.stats = {"stored": 0, "stored_bytes": 0, "resolved": 0, "expired": 0}
+    
+    def put(self, data: BlobData, ttl: Optional[float] = None) -> str:
+        raise NotImplementedError
+    
+    def get(self, key: str) -> BlobData:
+        raise NotImplementedError
+    
+    def delete(self, key: str):
+        raise NotImplementedError
+    
+    def sweep(self) -> int:
+        """Drop expired blobs; returns how many were removed"""
+        return 0
+    
+    @staticmethod
+    def _new_key(expires_at: float) -> str:
+        # The expiry is part of the key, so any reader can check it without a lookup
+        return f"{int(expires_at)}-{uuid.uuid4().hex}"
+    
+    @staticmethod
+    def _expires_at(key: str) -> float:
+        return float(key.split("-", 1)[0])
+
+class MemoryBlobStore(BlobStore):
+    """Blobs kept in this process; for tests and single-process setups"""
+    
+    def __init__(self, ttl: Optional[float] = None):
+        super().__init__(ttl)
+        self._blobs: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+    
+    def put(self, data: BlobData, ttl: Optional[float] = None) -> str:
+        key = self._new_key(time.time() + (ttl or self.ttl))
+        with self._lock:
+            self._blobs[key] = bytes(data)
+        self.stats["stored"] += 1
+        self.stats["stored_bytes"] += len(data)
+        return key
+    
+    def get(self, key: str) -> BlobData:
+        with self._lock:
+            data = self._blobs.get(key)
+        if data is None:
+            raise BlobNotFound(key)
+        if self._expires_at(key) < time.time():
+            self.delete(key)
+            self.stats["expired"] += 1
+            raise BlobNotFound(key)
+        self.stats["resolved"] += 1
+        return memoryview(data)
+    
+    def delete(self, key: str):
+        with self._lock:
+            self._blobs.pop(key, None)
+    
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [key for key in self._blobs if self._expires_at(key) < now]
+            for key in expired:
+                del self._blobs[key]
+        self.stats["expired"] += len(expired)
+        return len(expired)
+    
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+class FileBlobStore(BlobStore):
+    """One file per blob in a shared directory, read back through mmap"""
+    
+    _KEY = re.compile(r"^\d+-[0-9a-f]{32}$")
+    
+    def __init__(self, root: Optional[str] = None, ttl: Optional[float] = None, sweep_interval: Optional[float] = None):
+        super().__init__(ttl)
+        self.root = root or settings.blob_store_path
+        self.sweep_interval = sweep_interval or max(self.ttl / 4, 1.0)
+        self._last_sweep = time.monotonic()
+        os.makedirs(self.root, exist_ok=True)
+    
+    def put(self, data: BlobData, ttl: Optional[float] = None) -> str:
+        key = self._new_key(time.time() + (ttl or self.ttl))
+        path = self._path(key)
+        # Write then rename, so readers never map a half-written file
+        partial = f"{path}.part"
+        with open(partial, "wb") as blob:
+            blob.write(data)
+        os.replace(partial, path)
+        self.stats["stored"] += 1
+        self.stats["stored_bytes"] += len(data)
+        if time.monotonic() - self._last_sweep > self.sweep_interval:
+            self.sweep()
+        return key
+    
+    def get(self, key: str) -> BlobData:
+        path = self._path(key)
+        if self._expires_at(key) < time.time():
+            self.delete(key)
+            self.stats["expired"] += 1
+            raise BlobNotFound(key)
+        try:
+            with open(path, "rb") as blob:
+                size = os.fstat(blob.fileno()).st_size
+                if size == 0:
+                    return memoryview(b"")
+                # The mapping outlives the file handle and survives the file being swept
+                mapped = mmap.mmap(blob.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            raise BlobNotFound(key)
+        self.stats["resolved"] += 1
+        return memoryview(mapped)
+    
+    def delete(self, key: str):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+    
+    def sweep(self) -> int:
+        self._last_sweep = time.monotonic()
+        now = time.time()
+        removed = 0
+        for name in os.listdir(self.root):
+            if self._KEY.match(name) and self._expires_at(name) < now:
+                self.delete(name)
+                removed += 1
+        if removed:
+            self.stats["expired"] += removed
+            logger.debug(f"Swept {removed} expired blobs from {self.root}")
+        return removed
+    
+    def _path(self, key: str) -> str:
+        # Keys arrive in messages from other services; never let one escape the root
+        if not self._KEY.match(key):
+            raise BlobNotFound(key)
+        return os.path.join(self.root, key)
+
+_store: Optional[BlobStore] = None
+_store_lock = threading.Lock()
+
+def get_blob_store() -> Optional[BlobStore]:
+    """The configured store, or None when BLOB_STORE is empty"""
+    global _store
+    if _store is None and settings.blob_store:
+        with _store_lock:
+            if _store is None:
+                if settings.blob_store == "file":
+                    _store = FileBlobStore()
+                elif settings.blob_store == "memory":
+                    _store = MemoryBlobStore()
+                else:
+                    raise ValueError(f"Unknown blob store: {settings.blob_store}")
+    return _store
+
+def set_blob_store(store: Optional[BlobStore]):
+    """Install a store, e.g. a cross-host one; None goes back to BLOB_STORE"""
+    global _store
+    with _store_lock:
+        _store = store
+
+def is_ref(value: Any) -> bool:
+    return isinstance(value, dict) and len(value) == 2 and REF_KEY in value and "size" in value
+
+def offload(value: Any, store: BlobStore, threshold: Optional[int] = None) -> Any:
+    """Copy of value with byte fields of at least `threshold` bytes replaced by references"""
+    threshold = threshold if threshold is not None else settings.blob_threshold
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        if len(value) >= threshold:
+            return {REF_KEY: store.put(value), "size": len(value)}
+        return value
+    if isinstance(value, dict):
+        return {key: offload(item, store, threshold) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [offload(item, store, threshold) for item in value]
+    return value
+
+def resolve(value: Any, store: Optional[BlobStore]) -> Any:
+    """Copy of value with references replaced by the stored bytes"""
+    if isinstance(value, dict):
+        if is_ref(value):
+            if store is None:
+                raise BlobNotFound(f"{value[REF_KEY]} (no blob store configured)")
+            return store.get(value[REF_KEY])
+        return {key: resolve(item, store) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve(item, store) for item in value]
+    return value
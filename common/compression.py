@@ -0,0 +1,124 @@
+"""Body compression for the MCP transport.
+
+Bodies of at least MCP_COMPRESS_THRESHOLD bytes are compressed with
+MCP_COMPRESSION and the codec name goes in the AMQP content_encoding
+property; receivers decompress whatever the property names. A body that
+does not shrink by at least 10% (already-compressed images, say) is sent
+as it is. zlib is always available; lz4 and zstd need the lz4 and
+zstandard packages on both ends.
+"""
+import threading
+import time
+import zlib
+from typing import Dict, Optional, Tuple
+from .config import settings
+
+# Optional faster codecs
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Keep the original unless compression saves at least this share
+_MIN_SAVING = 0.1
+
+_lock = threading.Lock()
+_stats = {
+    "compressed": 0,
+    "skipped": 0,
+    "incompressible": 0,
+    "decompressed": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "compress_seconds": 0.0,
+    "decompress_seconds": 0.0
+}
+
+def _compressor(encoding: str, level: int):
+    if encoding == "zlib":
+        return lambda body: zlib.compress(body, level)
+    if encoding == "lz4":
+        if lz4_frame is None:
+            raise ValueError("lz4 compression needs the lz4 package")
+        return lambda body: lz4_frame.compress(body, compression_level=level)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        return zstandard.ZstdCompressor(level=level).compress
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+def _decompressor(encoding: str):
+    if encoding == "zlib":
+        return zlib.decompress
+    if encoding == "lz4":
+        if lz4_frame is None:
+            raise ValueError("lz4 encoded body but the lz4 package is not installed")
+        return lz4_frame.decompress
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd encoded body but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+def compress(
+    body: bytes,
+    encoding: Optional[str] = None,
+    threshold: Optional[int] = None,
+    level: Optional[int] = None
+) -> Tuple[bytes, Optional[str]]:
+    """Compress a body if it is worth it; returns (body, content_encoding or None)"""
+    encoding = settings.mcp_compression if encoding is None else encoding
+    threshold = settings.mcp_compress_threshold if threshold is None else threshold
+    if not encoding or len(body) < threshold:
+        with _lock:
+            _stats["skipped"] += 1
+        return body, None
+    
+    started = time.perf_counter()
+    compressed = _compressor(encoding, level if level is not None else settings.mcp_compression_level)(body)
+    elapsed = time.perf_counter() - started
+    
+    worth_it = len(compressed) <= len(body) * (1 - _MIN_SAVING)
+    with _lock:
+        _stats["compress_seconds"] += elapsed
+        if worth_it:
+            _stats["compressed"] += 1
+            _stats["bytes_in"] += len(body)
+            _stats["bytes_out"] += len(compressed)
+        else:
+            _stats["incompressible"] += 1
+    if not worth_it:
+        return body, None
+    return compressed, encoding
+
+def decompress(body: bytes, encoding: Optional[str]) -> bytes:
+    """Undo `compress`; bodies without a content_encoding pass through"""
+    if not encoding or encoding == "identity":
+        return body
+    decompressor = _decompressor(encoding)
+    started = time.perf_counter()
+    try:
+        plain = decompressor(body)
+    except Exception as e:
+        raise ValueError(f"Corrupt {encoding} body: {str(e)}")
+    with _lock:
+        _stats["decompressed"] += 1
+        _stats["decompress_seconds"] += time.perf_counter() - started
+    return plain
+
+def compression_stats() -> Dict[str, float]:
+    """Counters for this process; ratio is compressed/original size over compressed bodies"""
+    with _lock:
+        stats = dict(_stats)
+    stats["ratio"] = round(stats["bytes_out"] / stats["bytes_in"], 4) if stats["bytes_in"] else None
+    return stats
+
+def reset_stats():
+    with _lock:
+        for key in _stats:
+            _stats[key] = 0.0 if key.endswith("_seconds") else 0
@@ -12,9 +12,26 @@ class Settings(BaseSettings):
     # API Gateway settings
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
     API_PORT: int = int(os.getenv("API_PORT", "8000"))
+    gateway_reply_timeout: float = float(os.getenv("GATEWAY_REPLY_TIMEOUT", "10"))  # synchronous /process mode
+    gateway_agent: str = os.getenv("GATEWAY_AGENT", "KNOWLEDGE_AGENT")  # answers /process and speech requests
     
     # Model configurations
     whisper_model: str = os.getenv("WHISPER_MODEL", "base")
+    whisper_batch_size: int = int(os.getenv("WHISPER_BATCH_SIZE", "8"))  # clips per encoder/decoder pass
+    whisper_batch_wait: float = float(os.getenv("WHISPER_BATCH_WAIT", "0.05"))  # seconds a batch waits to fill
+    whisper_workers: int = int(os.getenv("WHISPER_WORKERS", "1"))  # batches transcribed at once
+    whisper_timeout: float = float(os.getenv("WHISPER_TIMEOUT", "60"))  # per request, queueing included
+    stt_silence_ms: int = int(os.getenv("STT_SILENCE_MS", "600"))  # silence that ends an utterance
+    stt_min_speech_ms: int = int(os.getenv("STT_MIN_SPEECH_MS", "240"))  # shorter voiced bursts are dropped as noise
+    stt_preroll_ms: int = int(os.getenv("STT_PREROLL_MS", "300"))  # audio kept from before speech starts
+    stt_partial_interval: float = float(os.getenv("STT_PARTIAL_INTERVAL", "1.0"))  # seconds of speech between partials
+    stt_max_utterance: float = float(os.getenv("STT_MAX_UTTERANCE", "30"))  # seconds; Whisper's window
+    stt_vad_aggressiveness: int = int(os.getenv("STT_VAD_AGGRESSIVENESS", "2"))  # webrtcvad 0-3
+    stt_energy_threshold: float = float(os.getenv("STT_ENERGY_THRESHOLD", "0.01"))  # RMS level without webrtcvad
+    ocr_workers: int = int(os.getenv("OCR_WORKERS", "2"))  # threads, each keeping a Tesseract engine
+    ocr_max_side: int = int(os.getenv("OCR_MAX_SIDE", "1600"))  # longer image side after downscaling
+    ocr_edge_density: float = float(os.getenv("OCR_EDGE_DENSITY", "0.08"))  # stroke edges per pixel that mark a text cell
+    ocr_timeout: float = float(os.getenv("OCR_TIMEOUT", "30"))  # per image
     
     # Storage configurations
     neo4j_uri: str = os.getenv("NEO4J_URI", "bolt://localhost:7687")
@@ -25,11 +42,80 @@ class Settings(BaseSettings):
     rabbitmq_host: str = os.getenv("RABBITMQ_HOST", "localhost")
     rabbitmq_user: str = os.getenv("RABBITMQ_USER", "guest")
     rabbitmq_password: str = os.getenv("RABBITMQ_PASSWORD", "guest")
+    mcp_transport: str = os.getenv("MCP_TRANSPORT", "rabbitmq")  # rabbitmq, unix (one host) or inprocess (one process)
+    mcp_transport_socket: str = os.getenv("MCP_TRANSPORT_SOCKET", "/tmp/aahb-mcp.sock")  # served by the agent process
+    broker_consumer_enabled: bool = os.getenv("BROKER_CONSUMER_ENABLED", "true").lower() == "true"
+    broker_prefetch: int = int(os.getenv("BROKER_PREFETCH", "32"))
+    broker_ack_batch_size: int = int(os.getenv("BROKER_ACK_BATCH_SIZE", "16"))
+    publisher_max_in_flight: int = int(os.getenv("PUBLISHER_MAX_IN_FLIGHT", "256"))  # unconfirmed publishes before callers wait
+    publisher_confirm_timeout: float = float(os.getenv("PUBLISHER_CONFIRM_TIMEOUT", "5"))  # seconds per broker confirm
+    publisher_retries: int = int(os.getenv("PUBLISHER_RETRIES", "2"))  # republish attempts after a failed confirm
+    broker_ack_interval: float = float(os.getenv("BROKER_ACK_INTERVAL", "0.05"))  # seconds between forced ack flushes
+    broker_requeue_delay: float = float(os.getenv("BROKER_REQUEUE_DELAY", "0.25"))  # seconds a message refused by a full agent queue is held before requeueing
+    broker_max_length: int = int(os.getenv("BROKER_MAX_LENGTH", "10000"))  # per interactive agent queue, 0 = unbounded
+    broker_bulk_priority: int = int(os.getenv("BROKER_BULK_PRIORITY", "2"))  # requests at or below this go to the bulk queue
+    broker_bulk_max_length: int = int(os.getenv("BROKER_BULK_MAX_LENGTH", "100000"))  # lazy bulk queues, 0 = unbounded
+    broker_dead_letter_max_length: int = int(os.getenv("BROKER_DEAD_LETTER_MAX_LENGTH", "10000"))
+    broker_stats_interval: float = float(os.getenv("BROKER_STATS_INTERVAL", "60"))  # seconds between queue stats logs, 0 = off
+    
+    # MCP encoding and compression
+    mcp_content_type: str = os.getenv("MCP_CONTENT_TYPE", "application/x-mcp")  # or application/json for debugging
+    mcp_compression: str = os.getenv("MCP_COMPRESSION", "zlib")  # zlib, lz4 or zstd; empty disables
+    mcp_compress_threshold: int = int(os.getenv("MCP_COMPRESS_THRESHOLD", "4096"))  # smaller bodies go uncompressed
+    mcp_compression_level: int = int(os.getenv("MCP_COMPRESSION_LEVEL", "1"))  # low levels favour speed
+    
+    # Blob store for large payload fields
+    blob_store: str = os.getenv("BLOB_STORE", "")  # "file" or "memory"; empty keeps large fields inline
+    blob_store_path: str = os.getenv("BLOB_STORE_PATH", "/dev/shm/aahb-blobs")  # must be shared by senders and receivers
+    blob_threshold: int = int(os.getenv("BLOB_THRESHOLD", "65536"))  # byte fields this large go to the blob store
+    blob_ttl: float = float(os.getenv("BLOB_TTL", "300"))  # seconds a stored blob stays readable
+    
+    # Gateway executor
+    gateway_executor: str = os.getenv("GATEWAY_EXECUTOR", "thread")  # 'thread' or 'process'; runs Whisper and OCR off the event loop
+    gateway_executor_workers: int = int(os.getenv("GATEWAY_EXECUTOR_WORKERS", "4"))
+    
+    # Orchestrator configuration
+    orchestrator_mode: str = os.getenv("ORCHESTRATOR_MODE", "thread")  # 'thread' or 'async'
+    orchestrator_executor_workers: int = int(os.getenv("ORCHESTRATOR_EXECUTOR_WORKERS", "8"))  # blocking agents in async mode
+    orchestrator_async_concurrency: int = int(os.getenv("ORCHESTRATOR_ASYNC_CONCURRENCY", "100"))  # in-flight calls per async agent
+    orchestrator_workers: int = int(os.getenv("ORCHESTRATOR_WORKERS", "1"))
+    orchestrator_agent_workers: str = os.getenv("ORCHESTRATOR_AGENT_WORKERS", "")  # e.g. "VISION_AGENT=2,KNOWLEDGE_AGENT=8"
+    orchestrator_queue_size: int = int(os.getenv("ORCHESTRATOR_QUEUE_SIZE", "1000"))
+    orchestrator_overflow_policy: str = os.getenv("ORCHESTRATOR_OVERFLOW_POLICY", "block")  # 'block', 'timeout' or 'reject'
+    orchestrator_enqueue_timeout: float = float(os.getenv("ORCHESTRATOR_ENQUEUE_TIMEOUT", "1.0"))
+    orchestrator_default_budget: float = float(os.getenv("ORCHESTRATOR_DEFAULT_BUDGET", "0"))  # implicit deadline in seconds, 0 = none
+    orchestrator_request_timeout: float = float(os.getenv("ORCHESTRATOR_REQUEST_TIMEOUT", "30"))  # seconds to wait for a correlated reply
+    orchestrator_max_batch_size: int = int(os.getenv("ORCHESTRATOR_MAX_BATCH_SIZE", "8"))  # messages per process_batch call
+    orchestrator_max_batch_wait: float = float(os.getenv("ORCHESTRATOR_MAX_BATCH_WAIT", "0.005"))  # seconds to wait for a batch to fill
+    orchestrator_shed_threshold: float = float(os.getenv("ORCHESTRATOR_SHED_THRESHOLD", "0.8"))  # queue fill at which low-priority requests are shed
+    trace_capture_path: str = os.getenv("TRACE_CAPTURE_PATH", "")  # e.g. /data/mcp-trace.jsonl.gz; empty = off
+    trace_capture_payloads: bool = os.getenv("TRACE_CAPTURE_PAYLOADS", "false").lower() == "true"
+    trace_capture_queue: int = int(os.getenv("TRACE_CAPTURE_QUEUE", "10000"))  # entries waiting for the writer; more are dropped
+    breaker_enabled: bool = os.getenv("BREAKER_ENABLED", "true").lower() == "true"
+    breaker_window: int = int(os.getenv("BREAKER_WINDOW", "20"))  # recent calls considered per agent
+    breaker_min_calls: int = int(os.getenv("BREAKER_MIN_CALLS", "10"))  # calls needed before the breaker can trip
+    breaker_failure_rate: float = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))  # failed or slow share that trips it
+    breaker_slow_call: float = float(os.getenv("BREAKER_SLOW_CALL", "10"))  # seconds; slower calls count as failures
+    breaker_reset_timeout: float = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))  # seconds open before a trial call
+    breaker_half_open_calls: int = int(os.getenv("BREAKER_HALF_OPEN_CALLS", "3"))  # successful trials needed to close
+    agent_processes: int = int(os.getenv("AGENT_PROCESSES", "2"))  # default size of process-pool agents
+    vision_agent_processes: int = int(os.getenv("VISION_AGENT_PROCESSES", "0"))  # 0 keeps vision in-process
+    shard_processes: int = int(os.getenv("SHARD_PROCESSES", "0"))  # orchestrator shards per node, 0 = unsharded
+    shard_virtual_nodes: int = int(os.getenv("SHARD_VIRTUAL_NODES", "64"))  # hash ring points per shard
+    shard_drain_timeout: float = float(os.getenv("SHARD_DRAIN_TIMEOUT", "10"))  # seconds to drain a removed shard
+    shard_nodes: str = os.getenv("SHARD_NODES", "")  # e.g. "node-a,node-b"; empty = one node
+    shard_id: str = os.getenv("SHARD_ID", "")  # this node's name in SHARD_NODES
+    vision_agent_batch_size: int = int(os.getenv("VISION_AGENT_BATCH_SIZE", "8"))  # 1 disables vision batching
+    process_start_method: str = os.getenv("PROCESS_START_METHOD", "spawn")
+    context_max_entries: int = int(os.getenv("CONTEXT_MAX_ENTRIES", "10000"))
+    context_ttl: float = float(os.getenv("CONTEXT_TTL", "3600"))  # seconds since last access
+    context_history_limit: int = int(os.getenv("CONTEXT_HISTORY_LIMIT", "50"))
+    context_payload_limit: int = int(os.getenv("CONTEXT_PAYLOAD_LIMIT", "1024"))  # max chars kept per payload string
     
     # Testing flags
     TEST_AUDIO_ENABLED: bool = os.getenv("TEST_AUDIO_ENABLED", "false").lower() == "true"
     TEST_IMAGE_ENABLED: bool = os.getenv("TEST_IMAGE_ENABLED", "false").lower() == "true"
-
+    
     # LLM configuration
     llm_provider: str = os.getenv("LLM_PROVIDER", "openai")  # 'openai' or 'gemini'
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
@@ -39,7 +125,7 @@ class Settings(BaseSettings):
     gemini_model: str = os.getenv("GEMINI_MODEL", "gemini-pro")
     enable_openai: bool = os.getenv("ENABLE_OPENAI", "true").lower() == "true"
     enable_gemini: bool = os.getenv("ENABLE_GEMINI", "false").lower() == "true"
-
+    
     class Config:
         env_file = ".env"
         extra = "ignore"
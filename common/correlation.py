@@ -0,0 +1,228 @@
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+from .config import settings
+from .logger import get_logger
+from .mcp_protocol import MCPMessage, STREAM_CHUNK
+from .sharding import node_ring
+from .transport import Transport, RabbitMQTransport, get_transport
+
+logger = get_logger("correlation")
+
+class PendingReply:
+    """Handle for one outstanding request; usable from threads and coroutines"""
+    
+    def __init__(
+        self,
+        correlator: "ResponseCorrelator",
+        message_id: str,
+        context_id: str,
+        on_chunk: Optional[Callable[[MCPMessage], None]] = None
+    ):
+        self.correlator = correlator
+        self.message_id = message_id
+        self.context_id = context_id
+        self.on_chunk = on_chunk
+        self.future: Future = Future()
+    
+    def result(self, timeout: Optional[float] = None):
+        try:
+            return self.future.result(timeout)
+        except FutureTimeoutError:
+            self.correlator.discard(self.message_id, timed_out=True)
+            raise TimeoutError(f"No reply to {self.message_id} within {timeout}s")
+    
+    async def wait(self, timeout: Optional[float] = None):
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self.future), timeout)
+        except asyncio.TimeoutError:
+            self.correlator.discard(self.message_id, timed_out=True)
+            raise TimeoutError(f"No reply to {self.message_id} within {timeout}s")
+
+class ResponseCorrelator:
+    """Matches replies to outstanding requests.
+    
+    Replies are matched on header.correlation_id (the request's message_id).
+    Replies from agents that do not set it fall back to the oldest pending
+    request with the same context_id. Stream chunks go to the request's
+    `on_chunk` and leave it pending; the stream_end (or any other reply)
+    completes it.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, PendingReply] = {}
+        self._by_context: Dict[str, Deque[str]] = {}
+        self.stats = {"expected": 0, "resolved": 0, "chunks": 0, "timeouts": 0, "unmatched": 0}
+    
+    def expect(self, message: MCPMessage, on_chunk: Optional[Callable[[MCPMessage], None]] = None) -> PendingReply:
+        """Register interest in the reply; call before sending the request"""
+        header = message.header
+        pending = PendingReply(self, header.message_id, header.context_id, on_chunk)
+        with self._lock:
+            self._pending[header.message_id] = pending
+            self._by_context.setdefault(header.context_id, deque()).append(header.message_id)
+            self.stats["expected"] += 1
+        return pending
+    
+    def resolve(self, reply: MCPMessage) -> bool:
+        """Complete the matching request; returns False if nobody is waiting"""
+        header = reply.header
+        with self._lock:
+            message_id = header.correlation_id
+            if message_id not in self._pending:
+                waiting = self._by_context.get(header.context_id)
+                message_id = waiting[0] if waiting else None
+            if message_id is None:
+                self.stats["unmatched"] += 1
+                return False
+            if header.message_type == STREAM_CHUNK:
+                pending = self._pending[message_id]
+                self.stats["chunks"] += 1
+            else:
+                pending = self._remove(message_id)
+                self.stats["resolved"] += 1
+        if header.message_type == STREAM_CHUNK:
+            if pending.on_chunk is not None:
+                pending.on_chunk(reply)
+            return True
+        if not pending.future.done():
+            pending.future.set_result(reply)
+        return True
+    
+    def discard(self, message_id: str, timed_out: bool = False):
+        with self._lock:
+            if self._remove(message_id) is not None and timed_out:
+                self.stats["timeouts"] += 1
+    
+    def __len__(self) -> int:
+        return len(self._pending)
+    
+    def _remove(self, message_id: str) -> Optional[PendingReply]:
+        # Caller holds the lock
+        pending = self._pending.pop(message_id, None)
+        if pending is None:
+            return None
+        waiting = self._by_context.get(pending.context_id)
+        if waiting is not None:
+            waiting.remove(message_id)
+            if not waiting:
+                del self._by_context[pending.context_id]
+        return pending
+
+class ReplyListener:
+    """Consumes replies sent to one routing key and resolves them.
+    
+    Over RabbitMQ each listener uses its own exclusive queue, so several
+    gateway replicas can bind the same routing key; replies a replica is
+    not waiting for are acked and ignored. With node sharding, agents
+    publish replies under '<key>.<node>', so those keys are bound as well.
+    Pass `transport` to listen on another transport; the listener then
+    leaves closing it to the owner.
+    """
+    
+    def __init__(
+        self,
+        routing_key: str,
+        correlator: Optional[ResponseCorrelator] = None,
+        connect: Optional[Callable[[], Awaitable]] = None,
+        exchange_name: str = "aahb.mcp",
+        transport: Optional[Transport] = None
+    ):
+        self.routing_key = routing_key.lower()
+        self.correlator = correlator or ResponseCorrelator()
+        self._owns_transport = transport is None
+        self.transport = transport or RabbitMQTransport(connect=connect, exchange_name=exchange_name)
+    
+    async def start(self):
+        ring = node_ring()
+        routing_keys = [self.routing_key] + [f"{self.routing_key}.{node}" for node in sorted(ring.nodes if ring else ())]
+        for routing_key in routing_keys:
+            await self.transport.subscribe(routing_key, self._on_reply)
+        logger.info(f"Listening for replies on {', '.join(routing_keys)}")
+    
+    async def stop(self):
+        if self._owns_transport:
+            await self.transport.close()
+    
+    async def request(
+        self,
+        message: MCPMessage,
+        send: Callable[[MCPMessage], Awaitable],
+        timeout: Optional[float] = None
+    ) -> MCPMessage:
+        """Send a message and wait for its correlated reply"""
+        pending = self.correlator.expect(message)
+        try:
+            await send(message)
+        except Exception:
+            self.correlator.discard(message.header.message_id)
+            raise
+        return await pending.wait(timeout)
+    
+    async def stream(
+        self,
+        message: MCPMessage,
+        send: Callable[[MCPMessage], Awaitable],
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[MCPMessage]:
+        """Send a message, then yield its stream chunks and finally its reply.
+        
+        `timeout` bounds the wait for each next message rather than the whole
+        stream, so a long generation stays open while tokens keep arriving.
+        """
+        loop = asyncio.get_running_loop()
+        arrivals: asyncio.Queue = asyncio.Queue()
+        pending = self.correlator.expect(
+            message,
+            on_chunk=lambda chunk: loop.call_soon_threadsafe(arrivals.put_nowait, chunk)
+        )
+        # None marks the final reply; it is queued behind any chunks before it
+        pending.future.add_done_callback(lambda future: loop.call_soon_threadsafe(arrivals.put_nowait, None))
+        try:
+            await send(message)
+        except Exception:
+            self.correlator.discard(message.header.message_id)
+            raise
+        
+        try:
+            while True:
+                try:
+                    arrival = await asyncio.wait_for(arrivals.get(), timeout)
+                except asyncio.TimeoutError:
+                    self.correlator.discard(message.header.message_id, timed_out=True)
+                    raise TimeoutError(f"Stream for {message.header.message_id} stalled for {timeout}s")
+                if arrival is None:
+                    yield pending.future.result()
+                    return
+                yield arrival
+        finally:
+            # The caller may stop reading early, e.g. when the client disconnects
+            self.correlator.discard(message.header.message_id)
+    
+    async def _on_reply(self, reply: MCPMessage):
+        if not self.correlator.resolve(reply):
+            logger.debug(f"Ignoring uncorrelated reply for context {reply.header.context_id}")
+
+# One listener per process, started on first use
+_reply_listener: Optional[ReplyListener] = None
+_reply_listener_lock = asyncio.Lock()
+
+async def get_reply_listener(routing_key: str = "API_GATEWAY") -> ReplyListener:
+    global _reply_listener
+    async with _reply_listener_lock:
+        if _reply_listener is None:
+            # Other transports are shared with send_mcp_message; RabbitMQ replies get their own queue
+            transport = await get_transport() if settings.mcp_transport != "rabbitmq" else None
+            listener = ReplyListener(routing_key, transport=transport)
+            await listener.start()
+            _reply_listener = listener
+    return _reply_listener
+
+async def close_reply_listener():
+    global _reply_listener
+    if _reply_listener is not None:
+        await _reply_listener.stop()
+        _reply_listener = None
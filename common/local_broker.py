@@ -0,0 +1,277 @@
+"""In-memory stand-in for the subset of aio_pika used by the MCP transport.
+
+Runs the broker consumer and publisher in tests and benchmarks without a
+RabbitMQ server. The AMQP behaviour that matters is kept: direct exchange
+routing, per-channel prefetch, increasing delivery tags, multiple acks,
+requeue on nack, priority queues (x-max-priority) and dead-lettering of
+rejected or overflowing messages (x-dead-letter-exchange). `drop_connections` simulates a broker restart: publishing
+on a channel of a dropped connection raises, as aio_pika does.
+"""
+import asyncio
+import itertools
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from .logger import get_logger
+
+logger = get_logger("local_broker")
+
+# Message attributes copied from aio_pika.Message on publish
+_MESSAGE_FIELDS = (
+    "content_type", "content_encoding", "headers", "delivery_mode",
+    "priority", "correlation_id", "reply_to", "message_id", "type"
+)
+
+class LocalIncomingMessage:
+    def __init__(self, channel: "LocalChannel", queue: "LocalQueue", delivery_tag: int,
+                 body: bytes, routing_key: str, properties: Dict[str, Any], redelivered: bool = False):
+        self.channel = channel
+        self.queue = queue
+        self.delivery_tag = delivery_tag
+        self.body = body
+        self.routing_key = routing_key
+        self.redelivered = redelivered
+        self.properties = properties
+        for field in _MESSAGE_FIELDS:
+            setattr(self, field, properties.get(field))
+    
+    async def ack(self, multiple: bool = False):
+        self.channel._settle(self.delivery_tag, multiple, "ack")
+    
+    async def nack(self, multiple: bool = False, requeue: bool = True):
+        self.channel._settle(self.delivery_tag, multiple, "nack", requeue)
+    
+    async def reject(self, requeue: bool = False):
+        self.channel._settle(self.delivery_tag, False, "reject", requeue)
+
+class LocalQueue:
+    def __init__(self, broker: "LocalBroker", name: str, durable: bool = False,
+                 arguments: Optional[Dict[str, Any]] = None):
+        self.broker = broker
+        self.name = name
+        self.durable = durable
+        self.arguments = arguments or {}
+        self.messages: deque = deque()
+        self.consumers: List[Tuple["LocalChannel", Callable[[LocalIncomingMessage], Awaitable[Any]]]] = []
+        self._next_consumer = 0
+    
+    def _bind(self, exchange, routing_key: Optional[str] = None):
+        name = exchange if isinstance(exchange, str) else exchange.name
+        bound = self.broker.exchanges[name].bindings.setdefault(routing_key or self.name, [])
+        if self not in bound:
+            bound.append(self)
+    
+    @property
+    def message_count(self) -> int:
+        return len(self.messages)
+    
+    def _enqueue(self, body: bytes, routing_key: str, properties: Dict[str, Any], redelivered: bool = False):
+        max_length = self.arguments.get("x-max-length")
+        if max_length is not None and len(self.messages) >= max_length:
+            # Default overflow behaviour in RabbitMQ: drop from the head
+            self._dead_letter(*self.messages.popleft()[:3])
+        entry = (body, routing_key, properties, redelivered)
+        if "x-max-priority" not in self.arguments:
+            self.messages.append(entry)
+        else:
+            # Higher priorities first, FIFO within a priority
+            priority = self._priority(entry)
+            index = len(self.messages)
+            while index > 0 and self._priority(self.messages[index - 1]) < priority:
+                index -= 1
+            self.messages.insert(index, entry)
+        self._dispatch()
+    
+    def _priority(self, entry) -> int:
+        return min(entry[2].get("priority") or 0, self.arguments["x-max-priority"])
+    
+    def _dead_letter(self, body: bytes, routing_key: str, properties: Dict[str, Any]):
+        exchange = self.broker.exchanges.get(self.arguments.get("x-dead-letter-exchange"))
+        if exchange is None:
+            return
+        routing_key = self.arguments.get("x-dead-letter-routing-key", routing_key)
+        for queue in exchange.bindings.get(routing_key, []):
+            queue._enqueue(body, routing_key, properties)
+    
+    def _dispatch(self):
+        while self.messages and self.consumers:
+            ready = [
+                (channel, callback) for channel, callback in self.consumers
+                if channel.prefetch_count == 0 or len(channel.unacked) < channel.prefetch_count
+            ]
+            if not ready:
+                return
+            channel, callback = ready[self._next_consumer % len(ready)]
+            self._next_consumer += 1
+            body, routing_key, properties, redelivered = self.messages.popleft()
+            incoming = channel._deliver(self, body, routing_key, properties, redelivered)
+            asyncio.get_running_loop().create_task(callback(incoming))
+
+class LocalExchange:
+    def __init__(self, broker: "LocalBroker", name: str, type: Any = "direct", durable: bool = False):
+        self.broker = broker
+        self.name = name
+        self.type = type
+        self.durable = durable
+        self.bindings: Dict[str, List[LocalQueue]] = {}
+    
+    async def publish(self, message, routing_key: str, **kwargs):
+        properties = {field: getattr(message, field, None) for field in _MESSAGE_FIELDS}
+        self.broker.published.append((self.name, routing_key, message))
+        queues = self.bindings.get(routing_key, [])
+        if not queues:
+            logger.debug(f"Unroutable message on {self.name} with key {routing_key}")
+        for queue in queues:
+            queue._enqueue(message.body, routing_key, properties)
+
+class LocalExchangeHandle:
+    """An exchange as seen from one channel; publishing needs the channel open"""
+    
+    def __init__(self, channel: "LocalChannel", exchange: LocalExchange):
+        self.channel = channel
+        self.exchange = exchange
+        self.name = exchange.name
+    
+    async def publish(self, message, routing_key: str, **kwargs):
+        if self.channel.is_closed:
+            raise ConnectionError(f"Channel closed, cannot publish to {self.name}")
+        self.channel.published += 1
+        await self.exchange.publish(message, routing_key, **kwargs)
+
+class LocalChannel:
+    def __init__(self, broker: "LocalBroker", publisher_confirms: bool = True):
+        self.broker = broker
+        self.publisher_confirms = publisher_confirms
+        self.prefetch_count = 0
+        self.unacked: Dict[int, LocalIncomingMessage] = {}
+        self.ack_frames: List[Tuple[str, int, bool]] = []
+        self.is_closed = False
+        self.published = 0
+        self._delivery_tags = itertools.count(1)
+    
+    async def set_qos(self, prefetch_count: int = 0, **kwargs):
+        self.prefetch_count = prefetch_count
+    
+    async def declare_exchange(self, name: str, type: Any = "direct", durable: bool = False, **kwargs) -> LocalExchangeHandle:
+        if name not in self.broker.exchanges:
+            self.broker.exchanges[name] = LocalExchange(self.broker, name, type, durable)
+        self.broker.declarations += 1
+        return LocalExchangeHandle(self, self.broker.exchanges[name])
+    
+    async def get_exchange(self, name: str, **kwargs) -> LocalExchangeHandle:
+        return LocalExchangeHandle(self, self.broker.exchanges[name])
+    
+    async def declare_queue(self, name: Optional[str] = None, *, durable: bool = False, passive: bool = False,
+                            arguments: Optional[Dict[str, Any]] = None, **kwargs) -> "LocalQueueHandle":
+        if passive and name not in self.broker.queues:
+            raise RuntimeError(f"NOT_FOUND - no queue '{name}'")
+        name = name or f"amq.gen-{len(self.broker.queues)}"
+        if name not in self.broker.queues:
+            self.broker.queues[name] = LocalQueue(self.broker, name, durable, arguments)
+        return LocalQueueHandle(self, self.broker.queues[name])
+    
+    async def close(self):
+        self.is_closed = True
+        for queue in self.broker.queues.values():
+            queue.consumers = [(channel, cb) for channel, cb in queue.consumers if channel is not self]
+        # Unacked deliveries go back to their queues, like a closed AMQP channel
+        unacked = sorted(self.unacked.values(), key=lambda m: m.delivery_tag)
+        self.unacked.clear()
+        for incoming in unacked:
+            incoming.queue._enqueue(incoming.body, incoming.routing_key, incoming.properties, redelivered=True)
+    
+    def _deliver(self, queue: LocalQueue, body: bytes, routing_key: str,
+                 properties: Dict[str, Any], redelivered: bool) -> LocalIncomingMessage:
+        tag = next(self._delivery_tags)
+        incoming = LocalIncomingMessage(self, queue, tag, body, routing_key, properties, redelivered)
+        self.unacked[tag] = incoming
+        return incoming
+    
+    def _settle(self, delivery_tag: int, multiple: bool, action: str, requeue: bool = False):
+        if delivery_tag not in self.unacked:
+            raise RuntimeError(f"PRECONDITION_FAILED - unknown delivery tag {delivery_tag}")
+        self.ack_frames.append((action, delivery_tag, multiple))
+        tags = [tag for tag in self.unacked if tag <= delivery_tag] if multiple else [delivery_tag]
+        queues = set()
+        for tag in sorted(tags):
+            incoming = self.unacked.pop(tag)
+            queues.add(incoming.queue)
+            if action != "ack" and requeue:
+                incoming.queue._enqueue(incoming.body, incoming.routing_key, incoming.properties, redelivered=True)
+            elif action != "ack":
+                incoming.queue._dead_letter(incoming.body, incoming.routing_key, incoming.properties)
+        # Freed prefetch slots may let more messages through
+        for queue in queues:
+            queue._dispatch()
+
+class LocalQueueHandle:
+    """A queue as seen from one channel, so consumers inherit that channel's prefetch"""
+    
+    def __init__(self, channel: LocalChannel, queue: LocalQueue):
+        self.channel = channel
+        self.queue = queue
+        self.name = queue.name
+    
+    async def bind(self, exchange, routing_key: Optional[str] = None, **kwargs):
+        self.queue._bind(exchange, routing_key)
+    
+    async def consume(self, callback: Callable[[LocalIncomingMessage], Awaitable[Any]], no_ack: bool = False, **kwargs) -> str:
+        self.queue.consumers.append((self.channel, callback))
+        self.queue._dispatch()
+        return f"ctag-{self.name}-{len(self.queue.consumers)}"
+    
+    @property
+    def message_count(self) -> int:
+        return self.queue.message_count
+    
+    @property
+    def declaration_result(self):
+        # Mirrors the Queue.DeclareOk frame aio_pika keeps after a declare
+        return SimpleNamespace(
+            queue=self.name,
+            message_count=self.queue.message_count,
+            consumer_count=len(self.queue.consumers)
+        )
+
+class LocalConnection:
+    def __init__(self, broker: "LocalBroker"):
+        self.broker = broker
+        self.channels: List[LocalChannel] = []
+        self.is_closed = False
+    
+    async def channel(self, publisher_confirms: bool = True, **kwargs) -> LocalChannel:
+        channel = LocalChannel(self.broker, publisher_confirms)
+        self.channels.append(channel)
+        return channel
+    
+    async def close(self):
+        for channel in self.channels:
+            await channel.close()
+        self.is_closed = True
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+class LocalBroker:
+    """A single in-memory broker; connect() mirrors aio_pika.connect_robust"""
+    
+    def __init__(self):
+        self.exchanges: Dict[str, LocalExchange] = {}
+        self.queues: Dict[str, LocalQueue] = {}
+        self.published: List[Tuple[str, str, Any]] = []
+        self.connections: List[LocalConnection] = []
+        self.declarations = 0
+    
+    async def connect(self, *args, **kwargs) -> LocalConnection:
+        connection = LocalConnection(self)
+        self.connections.append(connection)
+        return connection
+    
+    async def drop_connections(self):
+        """Close every open connection, like a broker restart"""
+        for connection in self.connections:
+            if not connection.is_closed:
+                await connection.close()
@@ -0,0 +1,173 @@
+"""Wire encodings for MCP messages.
+
+Two content types are understood everywhere a message is received:
+
+* application/json - the readable form, handy for debugging. Byte values
+  are carried as {"$base64": "..."}.
+* application/x-mcp - a binary frame that carries byte values raw:
+
+      b"MCP1"
+      uint32 length + header JSON
+      uint32 length + payload JSON, byte values replaced by {"$blob": index}
+      uint32 blob count, then per blob uint64 length + raw bytes
+
+Senders pick the type with MCP_CONTENT_TYPE; receivers go by the AMQP
+content_type and fall back to sniffing the frame magic. With BLOB_STORE set,
+large byte fields travel in either encoding as blob store references (see
+blob_store.py) and are resolved along with the payload; MCPMessage.json()
+never offloads, so serializing for a log has no side effects. Decoding validates
+the header and the frame layout only; the payload is parsed when it is
+first read, so a bad payload surfaces as MCPCodecError at that point.
+"""
+import base64
+import json
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+from .blob_store import get_blob_store, offload, resolve
+from .config import settings
+from .mcp_protocol import MCPHeader, MCPMessage
+
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_BINARY = "application/x-mcp"
+CONTENT_TYPES = (CONTENT_TYPE_JSON, CONTENT_TYPE_BINARY)
+
+MAGIC = b"MCP1"
+_U32 = struct.Struct("!I")
+_U64 = struct.Struct("!Q")
+
+class MCPCodecError(ValueError):
+    """Raised when a body cannot be decoded as an MCP message"""
+    pass
+
+def _extract_blobs(value: Any, blobs: List[bytes]) -> Any:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        blobs.append(value)
+        return {"$blob": len(blobs) - 1}
+    if isinstance(value, dict):
+        return {key: _extract_blobs(item, blobs) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_extract_blobs(item, blobs) for item in value]
+    return value
+
+def _restore_blobs(value: Any, blobs: List[bytes]) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1 and "$blob" in value:
+            return blobs[value["$blob"]]
+        return {key: _restore_blobs(item, blobs) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_restore_blobs(item, blobs) for item in value]
+    return value
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"$base64": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    return value
+
+def _from_json(value: Any) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1 and "$base64" in value:
+            return base64.b64decode(value["$base64"])
+        return {key: _from_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_from_json(item) for item in value]
+    return value
+
+def _default(value: Any) -> Any:
+    # Gateway payloads hold pydantic results; anything else falls back to str
+    if hasattr(value, "dict"):
+        return value.dict()
+    return str(value)
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":"), default=_default).encode()
+
+def _outgoing_payload(message: MCPMessage, use_blob_store: bool = True) -> Dict[str, Any]:
+    store = get_blob_store() if use_blob_store else None
+    return offload(message.payload, store) if store is not None else message.payload
+
+def encode_binary(message: MCPMessage) -> bytes:
+    blobs: List[bytes] = []
+    header = _dumps(message.header.dict())
+    payload = _dumps(_extract_blobs(_outgoing_payload(message), blobs))
+    parts = [MAGIC, _U32.pack(len(header)), header, _U32.pack(len(payload)), payload, _U32.pack(len(blobs))]
+    for blob in blobs:
+        parts.append(_U64.pack(len(blob)))
+        parts.append(blob)
+    return b"".join(parts)
+
+def _parse_header(header: Any) -> MCPHeader:
+    try:
+        return MCPHeader.parse_obj(header)
+    except ValueError as e:
+        raise MCPCodecError(f"Invalid MCP header: {str(e)}")
+
+def decode_binary(data: bytes) -> MCPMessage:
+    view = memoryview(data)
+    if bytes(view[:4]) != MAGIC:
+        raise MCPCodecError("Not an MCP binary frame")
+    try:
+        offset = 4
+        (size,) = _U32.unpack_from(view, offset)
+        header = json.loads(bytes(view[offset + 4:offset + 4 + size]))
+        offset += 4 + size
+        (size,) = _U32.unpack_from(view, offset)
+        payload_span = (offset + 4, offset + 4 + size)
+        offset += 4 + size
+        (count,) = _U32.unpack_from(view, offset)
+        offset += 4
+        # Only walk the blob table here; the bytes are copied out on first read
+        blob_spans = []
+        for _ in range(count):
+            (size,) = _U64.unpack_from(view, offset)
+            offset += 8
+            if offset + size > len(view):
+                raise MCPCodecError("Truncated MCP frame")
+            blob_spans.append((offset, offset + size))
+            offset += size
+    except (struct.error, ValueError) as e:
+        raise MCPCodecError(f"Malformed MCP frame: {str(e)}")
+    if payload_span[1] > len(view):
+        raise MCPCodecError("Truncated MCP frame")
+    
+    def load_payload() -> Dict[str, Any]:
+        try:
+            payload = json.loads(bytes(view[payload_span[0]:payload_span[1]]))
+        except ValueError as e:
+            raise MCPCodecError(f"Malformed MCP payload: {str(e)}")
+        payload = _restore_blobs(payload, [bytes(view[start:end]) for start, end in blob_spans])
+        return resolve(payload, get_blob_store())
+    
+    return MCPMessage.lazy(_parse_header(header), load_payload)
+
+def encode_json(message: MCPMessage, use_blob_store: bool = True) -> bytes:
+    """JSON body; without `use_blob_store` large byte fields stay inline as $base64"""
+    payload = _outgoing_payload(message, use_blob_store)
+    return _dumps({"header": message.header.dict(), "payload": _to_json(payload)})
+
+def decode_json(data: bytes) -> MCPMessage:
+    try:
+        raw = json.loads(data)
+        header, payload = raw["header"], raw["payload"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise MCPCodecError(f"Malformed MCP JSON: {str(e)}")
+    # The document is parsed already; only the base64 decoding is deferred
+    return MCPMessage.lazy(_parse_header(header), lambda: resolve(_from_json(payload), get_blob_store()))
+
+def encode_message(message: MCPMessage, content_type: Optional[str] = None) -> Tuple[bytes, str]:
+    """Encode with the given (or configured) content type; returns (body, content_type)"""
+    content_type = content_type or settings.mcp_content_type
+    if content_type == CONTENT_TYPE_BINARY:
+        return encode_binary(message), content_type
+    if content_type == CONTENT_TYPE_JSON:
+        return encode_json(message), content_type
+    raise MCPCodecError(f"Unsupported MCP content type: {content_type}")
+
+def decode_message(body: bytes, content_type: Optional[str] = None) -> MCPMessage:
+    """Decode a body in either encoding; the payload is parsed on first access"""
+    if content_type == CONTENT_TYPE_BINARY or (content_type != CONTENT_TYPE_JSON and body[:4] == MAGIC):
+        return decode_binary(body)
+    return decode_json(body)
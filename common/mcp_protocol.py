@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, Any, Callable, Optional, Union
 import time
 import uuid
 
@@ -8,10 +8,117 @@ class MCPHeader(BaseModel):
     source: str
     destination: str
     context_id: str
-    timestamp: float = time.time()
-    message_id: str = str(uuid.uuid4())
-    message_type: str = "request"  # request/response/error
+    # Per-message defaults; correlation relies on unique message ids
+    timestamp: float = Field(default_factory=time.time)
+    message_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    message_type: str = "request"  # request/response/error/stream_chunk/stream_end
+    correlation_id: Optional[str] = None  # message_id of the request this replies to
+    deadline: Optional[float] = None  # epoch seconds after which nobody wants the result
+    priority: int = Field(5, ge=0, le=9)  # 9 is most urgent; low priorities are shed first
 
-class MCPMessage(BaseModel):
-    header: MCPHeader
-    payload: Dict[str, Any]
\ No newline at end of file
+# Partial output: any number of chunks ({"delta", "index"}) correlated to the
+# request, then one stream_end carrying the full result in place of a response
+STREAM_CHUNK = "stream_chunk"
+STREAM_END = "stream_end"
+
+# payload["error_type"] of an error reply whose cause is the agent's backend
+# (model, LLM API, database) rather than the request; only these count
+# against the agent's circuit breaker
+BACKEND_ERROR = "backend"
+UNAVAILABLE_ERROR = "unavailable"
+
+PayloadLoader = Callable[[], Dict[str, Any]]
+
+class MCPMessage:
+    """A validated header plus a payload that is parsed on first use.
+    
+    Routing only ever reads the header, so a message decoded from the wire
+    keeps its payload encoded (see `lazy`) until an agent reads `payload`.
+    The payload is only checked to be a dict; agents validate the fields
+    they use. `construct` skips all checks for trusted internal hops.
+    """
+    
+    __slots__ = ("header", "_payload", "_loader")
+    
+    def __init__(self, header: Union[MCPHeader, Dict[str, Any]], payload: Dict[str, Any]):
+        if not isinstance(header, MCPHeader):
+            header = MCPHeader.parse_obj(header)
+        if not isinstance(payload, dict):
+            raise ValueError(f"MCP payload must be a dict, not {type(payload).__name__}")
+        self.header = header
+        self._payload = payload
+        self._loader: Optional[PayloadLoader] = None
+    
+    @classmethod
+    def construct(cls, header: Union[MCPHeader, Dict[str, Any]], payload: Dict[str, Any]) -> "MCPMessage":
+        """Build without validation, for messages from our own processes"""
+        message = cls.__new__(cls)
+        message.header = header if isinstance(header, MCPHeader) else MCPHeader.construct(**header)
+        message._payload = payload
+        message._loader = None
+        return message
+    
+    @classmethod
+    def lazy(cls, header: MCPHeader, loader: PayloadLoader) -> "MCPMessage":
+        """Message whose payload is produced by `loader` when first read"""
+        message = cls.__new__(cls)
+        message.header = header
+        message._payload = None
+        message._loader = loader
+        return message
+    
+    @property
+    def payload(self) -> Dict[str, Any]:
+        loader = self._loader
+        if loader is not None:
+            payload = loader()
+            if not isinstance(payload, dict):
+                raise ValueError(f"MCP payload must be a dict, not {type(payload).__name__}")
+            self._payload = payload
+            self._loader = None
+        return self._payload
+    
+    @payload.setter
+    def payload(self, value: Dict[str, Any]):
+        self._payload = value
+        self._loader = None
+    
+    @property
+    def payload_loaded(self) -> bool:
+        return self._loader is None
+    
+    def dict(self) -> Dict[str, Any]:
+        return {"header": self.header.dict(), "payload": self.payload}
+    
+    def json(self) -> str:
+        from .mcp_codec import encode_json
+        # For logs and debugging: byte fields stay inline, nothing goes to the blob store
+        return encode_json(self, use_blob_store=False).decode()
+    
+    @classmethod
+    def parse_obj(cls, obj: Dict[str, Any]) -> "MCPMessage":
+        try:
+            return cls(header=obj["header"], payload=obj["payload"])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Not an MCP message: {str(e)}")
+    
+    @classmethod
+    def parse_raw(cls, data: Union[str, bytes]) -> "MCPMessage":
+        from .mcp_codec import decode_json
+        return decode_json(data.encode() if isinstance(data, str) else data)
+    
+    def serialize(self) -> str:
+        return self.json()
+    
+    @classmethod
+    def deserialize(cls, data: Union[str, bytes]) -> "MCPMessage":
+        return cls.parse_raw(data)
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, MCPMessage):
+            return NotImplemented
+        return self.header == other.header and self.payload == other.payload
+    
+    def __repr__(self) -> str:
+        payload = self._payload if self._loader is None else "<not loaded>"
+        return f"MCPMessage(header={self.header!r}, payload={payload!r})"
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional, Set
+import aio_pika
+from .config import settings
+from .logger import get_logger
+from .mcp_protocol import MCPMessage
+from .mcp_codec import encode_message
+from .compression import compress
+from .sharding import shard_routing_key
+from .topology import lane_routing_key
+
+logger = get_logger("publisher")
+
+class MCPPublisher:
+    """Long-lived RabbitMQ publisher shared by everything in the process.
+    
+    The connection, channel and exchange are set up once. A publish writes
+    the frame and returns; its broker confirm is awaited in the background,
+    and up to `max_in_flight` unconfirmed publishes are in flight at once.
+    Confirms for such a burst come back from RabbitMQ as a few
+    multiple-acks, not one round trip per message. A publish that fails
+    (connection lost, nack, confirm timeout) is retried up to `retries`
+    times, reopening the channel or connection first if it was lost.
+    `flush` waits for every outstanding confirm.
+    """
+    
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        connect: Optional[Callable[[], Awaitable]] = None,
+        exchange_name: str = "aahb.mcp",
+        max_in_flight: Optional[int] = None,
+        confirm_timeout: Optional[float] = None,
+        retries: Optional[int] = None
+    ):
+        self.host = host or settings.rabbitmq_host
+        self.connect = connect or self._connect
+        self.exchange_name = exchange_name
+        self.max_in_flight = max_in_flight or settings.publisher_max_in_flight
+        self.confirm_timeout = confirm_timeout or settings.publisher_confirm_timeout
+        self.retries = retries if retries is not None else settings.publisher_retries
+        self.connection = None
+        self.channel = None
+        self.exchange = None
+        self._lock = asyncio.Lock()
+        self._window: Optional[asyncio.Semaphore] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        self.stats = {"published": 0, "confirmed": 0, "retried": 0, "failed": 0, "reconnects": 0}
+    
+    async def _connect(self):
+        return await aio_pika.connect_robust(
+            host=self.host,
+            login=settings.rabbitmq_user,
+            password=settings.rabbitmq_password
+        )
+    
+    async def start(self):
+        await self._ensure_channel()
+    
+    async def publish(self, message: MCPMessage, routing_key: Optional[str] = None, wait: bool = False):
+        """Publish an MCP message; with `wait`, return only once the broker confirmed it"""
+        body, content_type = encode_message(message)
+        body, content_encoding = compress(body)
+        # Let the broker drop it once the deadline has passed
+        expiration = None
+        if message.header.deadline is not None:
+            expiration = max(message.header.deadline - time.time(), 0.001)
+        amqp_message = aio_pika.Message(
+            body=body,
+            content_type=content_type,
+            content_encoding=content_encoding,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            expiration=expiration,
+            priority=message.header.priority
+        )
+        if routing_key is None:
+            # With node sharding each context goes to the node that owns it;
+            # low-priority requests go to the agent's bulk queue
+            routing_key = shard_routing_key(message.header.destination, message.header.context_id)
+            if message.header.message_type == "request":
+                routing_key = lane_routing_key(routing_key, message.header.priority)
+        await self.publish_raw(amqp_message, routing_key, wait)
+    
+    async def publish_raw(self, amqp_message: aio_pika.Message, routing_key: str, wait: bool = False):
+        if self._window is None:
+            self._window = asyncio.Semaphore(self.max_in_flight)
+        # A full window pushes back on the caller instead of queueing without bound
+        await self._window.acquire()
+        task = asyncio.ensure_future(self._deliver(amqp_message, routing_key))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+        self.stats["published"] += 1
+        if wait and not await task:
+            raise ConnectionError(f"Publish to {routing_key} was not confirmed")
+    
+    async def flush(self):
+        """Wait until every publish so far has been confirmed or given up on"""
+        while self._in_flight:
+            await asyncio.gather(*list(self._in_flight), return_exceptions=True)
+    
+    async def close(self):
+        await self.flush()
+        if self.connection is not None:
+            await self.connection.close()
+        self.connection = self.channel = self.exchange = None
+    
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+    
+    async def _deliver(self, amqp_message: aio_pika.Message, routing_key: str) -> bool:
+        """Publish and wait for the confirm; False once the retries are used up"""
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    exchange = await self._ensure_channel()
+                    await exchange.publish(amqp_message, routing_key=routing_key, timeout=self.confirm_timeout)
+                    self.stats["confirmed"] += 1
+                    return True
+                except Exception as e:
+                    if attempt == self.retries:
+                        self.stats["failed"] += 1
+                        logger.error(f"Publish to {routing_key} failed after {attempt + 1} attempts: {str(e)}")
+                        return False
+                    self.stats["retried"] += 1
+                    logger.warning(f"Publish to {routing_key} failed, retrying: {str(e)}")
+        finally:
+            self._window.release()
+    
+    async def _ensure_channel(self):
+        if self.exchange is not None and not self.channel.is_closed:
+            return self.exchange
+        async with self._lock:
+            # Another publish may have reopened it while we waited
+            if self.exchange is not None and not self.channel.is_closed:
+                return self.exchange
+            if self.connection is None or self.connection.is_closed:
+                if self.connection is not None:
+                    self.stats["reconnects"] += 1
+                self.connection = await self.connect()
+            elif self.channel is not None:
+                self.stats["reconnects"] += 1
+            self.channel = await self.connection.channel(publisher_confirms=True)
+            self.exchange = await self.channel.declare_exchange(
+                self.exchange_name,
+                aio_pika.ExchangeType.DIRECT,
+                durable=True
+            )
+            logger.info(f"Publisher channel open on {self.host}")
+            return self.exchange
+
+# One publisher per process (and event loop), created on first use
+_publisher: Optional[MCPPublisher] = None
+_publisher_lock: Optional[asyncio.Lock] = None
+
+async def get_publisher(host: Optional[str] = None) -> MCPPublisher:
+    global _publisher, _publisher_lock
+    if _publisher_lock is None:
+        _publisher_lock = asyncio.Lock()
+    async with _publisher_lock:
+        if _publisher is None:
+            publisher = MCPPublisher(host)
+            await publisher.start()
+            _publisher = publisher
+    return _publisher
+
+async def close_publisher():
+    global _publisher
+    if _publisher is not None:
+        await _publisher.close()
+        _publisher = None
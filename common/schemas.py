@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, Optional
 
 class MultiModalInput(BaseModel):
     audio: Optional[dict] = None
@@ -27,4 +27,5 @@ class TextProcessingResult(BaseModel):
 class ProcessedOutput(BaseModel):
     status: str
     context_id: str
-    message: str
\ No newline at end of file
+    message: str
+    result: Optional[Dict[str, Any]] = None  # agent reply payload in synchronous mode
\ No newline at end of file
@@ -0,0 +1,78 @@
+import bisect
+import hashlib
+import threading
+from typing import Iterable, Optional, Set
+from .config import settings
+
+class HashRing:
+    """Consistent hash ring with virtual nodes.
+    
+    Adding or removing a node only moves the keys that hash next to that
+    node's points, roughly 1/N of all keys.
+    """
+    
+    def __init__(self, nodes: Iterable[str] = (), replicas: Optional[int] = None):
+        self.replicas = replicas or settings.shard_virtual_nodes
+        self.nodes: Set[str] = set()
+        self._lock = threading.Lock()
+        # (sorted hashes, owner of each hash); swapped as a whole so readers need no lock
+        self._points = ([], [])
+        for node in nodes:
+            self.add(node)
+    
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+    
+    def add(self, node: str):
+        with self._lock:
+            self.nodes.add(node)
+            self._rebuild()
+    
+    def remove(self, node: str):
+        with self._lock:
+            self.nodes.discard(node)
+            self._rebuild()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Node that owns key, or None if the ring is empty"""
+        hashes, owners = self._points
+        if not hashes:
+            return None
+        index = bisect.bisect(hashes, self._hash(key)) % len(hashes)
+        return owners[index]
+    
+    def __len__(self) -> int:
+        return len(self.nodes)
+    
+    def __contains__(self, node: str) -> bool:
+        return node in self.nodes
+    
+    def _rebuild(self):
+        # Caller holds the lock
+        points = sorted(
+            (self._hash(f"{node}#{i}"), node)
+            for node in self.nodes
+            for i in range(self.replicas)
+        )
+        self._points = ([h for h, _ in points], [node for _, node in points])
+
+_node_ring: Optional[HashRing] = None
+
+def node_ring() -> Optional[HashRing]:
+    """Ring over SHARD_NODES, or None when node sharding is off"""
+    global _node_ring
+    nodes = [node.strip() for node in settings.shard_nodes.split(",") if node.strip()]
+    if not nodes:
+        return None
+    if _node_ring is None or _node_ring.nodes != set(nodes):
+        _node_ring = HashRing(nodes)
+    return _node_ring
+
+def shard_routing_key(destination: str, context_id: str) -> str:
+    """Routing key for an agent message; '<agent>.<node>' when nodes are sharded"""
+    agent_id = destination.lower()
+    ring = node_ring()
+    if ring is None:
+        return agent_id
+    return f"{agent_id}.{ring.get(context_id)}"
@@ -0,0 +1,140 @@
+"""Queue layout on the aahb.mcp exchange.
+
+Every agent routing key gets three queues:
+
+* aahb.mcp.<key> - interactive traffic. A priority queue (x-max-priority
+  9, the MCP header priority), so an AR request overtakes anything queued
+  at a lower priority.
+* aahb.mcp.<key>.bulk - requests at or below BROKER_BULK_PRIORITY, e.g.
+  batch ingestion, published under '<key>.bulk'. A lazy queue that keeps
+  its backlog on disk. (Not a stream queue: streams need a per-consumer
+  prefetch and an x-stream-offset, while BrokerConsumer shares one global
+  prefetch window and batched acks across all of an agent's queues.)
+* aahb.mcp.<key>.dead - what the other two reject, expire or push out
+  at their max length, via the aahb.mcp.dlx exchange.
+
+RabbitMQ refuses to redeclare a queue with different arguments, so queues
+declared before this layout (or before a change to these settings) have
+to be deleted once; their messages are lost.
+"""
+from typing import Any, Dict, List, Optional
+import aio_pika
+from .config import settings
+from .logger import get_logger
+
+logger = get_logger("topology")
+
+MAX_PRIORITY = 9
+INTERACTIVE = "interactive"
+BULK = "bulk"
+BULK_SUFFIX = ".bulk"
+
+def traffic_class(priority: int) -> str:
+    return BULK if priority <= settings.broker_bulk_priority else INTERACTIVE
+
+def lane_routing_key(routing_key: str, priority: int) -> str:
+    """Routing key of the queue a message with this priority belongs in"""
+    if traffic_class(priority) == BULK:
+        return f"{routing_key}{BULK_SUFFIX}"
+    return routing_key
+
+class AgentQueues:
+    """The queues declared for one agent routing key"""
+    
+    def __init__(self, routing_key: str, interactive, bulk, dead):
+        self.routing_key = routing_key
+        self.interactive = interactive
+        self.bulk = bulk
+        self.dead = dead
+    
+    @property
+    def consumable(self) -> List:
+        """Queues agents consume; dead letters are left for inspection"""
+        return [self.interactive, self.bulk]
+
+class TopologyManager:
+    """Declares the per-agent queues and reports their depth"""
+    
+    def __init__(
+        self,
+        exchange_name: str = "aahb.mcp",
+        max_length: Optional[int] = None,
+        bulk_max_length: Optional[int] = None,
+        dead_letter_max_length: Optional[int] = None
+    ):
+        self.exchange_name = exchange_name
+        self.dead_letter_exchange = f"{exchange_name}.dlx"
+        self.max_length = max_length if max_length is not None else settings.broker_max_length
+        self.bulk_max_length = bulk_max_length if bulk_max_length is not None else settings.broker_bulk_max_length
+        self.dead_letter_max_length = (
+            dead_letter_max_length if dead_letter_max_length is not None else settings.broker_dead_letter_max_length
+        )
+        self.queues: Dict[str, AgentQueues] = {}
+    
+    def queue_name(self, routing_key: str, lane: str = INTERACTIVE) -> str:
+        name = f"{self.exchange_name}.{routing_key}"
+        return f"{name}{BULK_SUFFIX}" if lane == BULK else name
+    
+    def interactive_arguments(self, routing_key: str) -> Dict[str, Any]:
+        arguments = {
+            "x-max-priority": MAX_PRIORITY,
+            "x-dead-letter-exchange": self.dead_letter_exchange,
+            "x-dead-letter-routing-key": routing_key
+        }
+        if self.max_length:
+            # Overflow drops the oldest message into the dead-letter queue
+            arguments["x-max-length"] = self.max_length
+        return arguments
+    
+    def bulk_arguments(self, routing_key: str) -> Dict[str, Any]:
+        arguments = {
+            "x-queue-mode": "lazy",
+            "x-dead-letter-exchange": self.dead_letter_exchange,
+            "x-dead-letter-routing-key": routing_key
+        }
+        if self.bulk_max_length:
+            arguments["x-max-length"] = self.bulk_max_length
+        return arguments
+    
+    async def declare_agent(self, channel, exchange, routing_key: str) -> AgentQueues:
+        """Declare and bind the interactive, bulk and dead-letter queues for a routing key"""
+        dead_letters = await channel.declare_exchange(
+            self.dead_letter_exchange,
+            aio_pika.ExchangeType.DIRECT,
+            durable=True
+        )
+        dead = await channel.declare_queue(
+            f"{self.queue_name(routing_key)}.dead",
+            durable=True,
+            arguments={"x-max-length": self.dead_letter_max_length} if self.dead_letter_max_length else None
+        )
+        await dead.bind(dead_letters, routing_key=routing_key)
+        
+        interactive = await channel.declare_queue(
+            self.queue_name(routing_key),
+            durable=True,
+            arguments=self.interactive_arguments(routing_key)
+        )
+        await interactive.bind(exchange, routing_key=routing_key)
+        
+        bulk = await channel.declare_queue(
+            self.queue_name(routing_key, BULK),
+            durable=True,
+            arguments=self.bulk_arguments(routing_key)
+        )
+        await bulk.bind(exchange, routing_key=f"{routing_key}{BULK_SUFFIX}")
+        
+        queues = AgentQueues(routing_key, interactive, bulk, dead)
+        self.queues[routing_key] = queues
+        logger.info(f"Declared {interactive.name}, {bulk.name} and {dead.name}")
+        return queues
+    
+    async def queue_stats(self, channel) -> Dict[str, Dict[str, int]]:
+        """Ready messages and consumers per declared queue, from passive declares"""
+        stats = {}
+        for queues in self.queues.values():
+            for queue in (queues.interactive, queues.bulk, queues.dead):
+                declared = await channel.declare_queue(queue.name, passive=True)
+                result = declared.declaration_result
+                stats[queue.name] = {"depth": result.message_count, "consumers": result.consumer_count}
+        return stats
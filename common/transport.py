@@ -0,0 +1,359 @@
+"""Ways for the gateway and the agents to exchange MCP messages.
+
+A transport delivers each message to every subscriber of its routing key,
+the lower-cased destination (see sharding.shard_routing_key for the broker).
+MCP_TRANSPORT picks the implementation:
+
+* rabbitmq - the aahb.mcp exchange; the default and the only one that
+  spans hosts. Agents consume it through BrokerConsumer, which adds
+  prefetch and batched acks on top of durable queues.
+* inprocess - asyncio queues inside one process; messages are handed over
+  as objects, without encoding. Also the stand-in for tests and benchmarks.
+* unix - a Unix domain socket on one host. The agent process serves the
+  socket and the gateway connects; frames carry the binary MCP encoding.
+"""
+import asyncio
+import os
+import struct
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import aio_pika
+from .config import settings
+from .logger import get_logger
+from .mcp_protocol import MCPMessage
+from .mcp_codec import CONTENT_TYPE_BINARY, encode_message, decode_message
+from .compression import decompress
+from .publisher import MCPPublisher, get_publisher
+
+logger = get_logger("transport")
+
+Handler = Callable[[MCPMessage], Awaitable[None]]
+
+class Transport:
+    """Interface shared by all transports"""
+    
+    async def start(self):
+        pass
+    
+    async def send(self, message: MCPMessage, wait: bool = False):
+        raise NotImplementedError
+    
+    async def subscribe(self, routing_key: str, handler: Handler):
+        """Call handler for every message sent to routing_key, one at a time"""
+        raise NotImplementedError
+    
+    async def close(self):
+        pass
+    
+    @staticmethod
+    def routing_key(message: MCPMessage) -> str:
+        return message.header.destination.lower()
+
+class _Subscriber:
+    """A handler fed from a queue on the loop that subscribed it"""
+    
+    def __init__(self, handler: Handler):
+        self.handler = handler
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task = self.loop.create_task(self._run())
+    
+    def put(self, message: MCPMessage):
+        # Senders may be on other threads (orchestrator workers) or loops
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+    
+    async def _run(self):
+        while True:
+            message = await self.queue.get()
+            try:
+                await self.handler(message)
+            except Exception as e:
+                logger.error(f"Subscriber failed on message for {message.header.destination}: {str(e)}")
+    
+    def cancel(self):
+        self.loop.call_soon_threadsafe(self.task.cancel)
+
+class InProcessTransport(Transport):
+    """Hands message objects straight to subscribers in the same process"""
+    
+    def __init__(self):
+        self._subscribers: Dict[str, List[_Subscriber]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"sent": 0, "delivered": 0, "unroutable": 0}
+    
+    async def send(self, message: MCPMessage, wait: bool = False):
+        self.deliver(self.routing_key(message), message)
+    
+    def deliver(self, routing_key: str, message: MCPMessage) -> bool:
+        """Queue message for local subscribers; thread-safe, never blocks"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(routing_key, ()))
+        self.stats["sent"] += 1
+        if not subscribers:
+            self.stats["unroutable"] += 1
+            logger.debug(f"No subscriber for {routing_key}")
+            return False
+        for subscriber in subscribers:
+            subscriber.put(message)
+        self.stats["delivered"] += len(subscribers)
+        return True
+    
+    def has_subscribers(self, routing_key: str) -> bool:
+        return bool(self._subscribers.get(routing_key))
+    
+    async def subscribe(self, routing_key: str, handler: Handler):
+        subscriber = _Subscriber(handler)
+        with self._lock:
+            self._subscribers.setdefault(routing_key.lower(), []).append(subscriber)
+    
+    async def close(self):
+        with self._lock:
+            subscribers = [s for group in self._subscribers.values() for s in group]
+            self._subscribers.clear()
+        for subscriber in subscribers:
+            subscriber.cancel()
+
+# Unix socket frames: kind (1 byte), length (4 bytes), data
+_FRAME = struct.Struct("!BI")
+_SUBSCRIBE = 1  # data: routing key
+_MESSAGE = 2  # data: uint16 key length, routing key, binary MCP message
+
+class UnixSocketTransport(InProcessTransport):
+    """Single-host transport over a Unix domain socket.
+    
+    The serving side (the agent process) delivers to its own subscribers
+    and to connected clients that subscribed the routing key; clients send
+    everything to the server and reconnect on the next send if the socket
+    drops, re-subscribing their keys.
+    """
+    
+    def __init__(self, path: Optional[str] = None, server: bool = False):
+        super().__init__()
+        self.path = path or settings.mcp_transport_socket
+        self.server = server
+        self._server = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+        # Server side: which clients subscribed which keys
+        self._peers: Dict[str, Set[asyncio.StreamWriter]] = {}
+        self._clients: Set[asyncio.StreamWriter] = set()
+    
+    async def start(self):
+        if self.server:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self._server = await asyncio.start_unix_server(self._serve_peer, path=self.path)
+            logger.info(f"Serving MCP transport on {self.path}")
+        else:
+            await self._ensure_connected()
+    
+    async def send(self, message: MCPMessage, wait: bool = False):
+        routing_key = self.routing_key(message)
+        if self.server:
+            await self._route(routing_key, message, None)
+            return
+        writer = await self._ensure_connected()
+        writer.write(self._message_frame(routing_key, message))
+        await writer.drain()
+        self.stats["sent"] += 1
+    
+    async def subscribe(self, routing_key: str, handler: Handler):
+        await super().subscribe(routing_key, handler)
+        if not self.server:
+            writer = await self._ensure_connected()
+            await self._write(writer, _SUBSCRIBE, routing_key.lower().encode())
+    
+    async def close(self):
+        if self._server is not None:
+            server, self._server = self._server, None
+            server.close()
+            # Drop connected clients too; they reconnect on their next send
+            for writer in list(self._clients):
+                writer.close()
+            await server.wait_closed()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        await super().close()
+    
+    async def _route(self, routing_key: str, message: MCPMessage, origin: Optional[asyncio.StreamWriter]):
+        delivered = self.deliver(routing_key, message) if self.has_subscribers(routing_key) else False
+        peers = [peer for peer in self._peers.get(routing_key, ()) if peer is not origin and not peer.is_closing()]
+        if not peers:
+            if not delivered:
+                self.stats["unroutable"] += 1
+                logger.debug(f"No subscriber for {routing_key}")
+            return
+        frame = self._message_frame(routing_key, message)
+        for peer in peers:
+            peer.write(frame)
+            await peer.drain()
+        self.stats["delivered"] += len(peers)
+    
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if self._server is None:
+            # Accepted while closing
+            writer.close()
+            return
+        self._clients.add(writer)
+        try:
+            while True:
+                kind, data = await self._read_frame(reader)
+                if kind == _SUBSCRIBE:
+                    self._peers.setdefault(data.decode(), set()).add(writer)
+                elif kind == _MESSAGE:
+                    routing_key, message = self._parse_message(data)
+                    await self._route(routing_key, message, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Dropping transport client: {str(e)}")
+        finally:
+            self._clients.discard(writer)
+            for peers in self._peers.values():
+                peers.discard(writer)
+            writer.close()
+    
+    async def _ensure_connected(self) -> asyncio.StreamWriter:
+        if self._writer is not None and not self._writer.is_closing():
+            return self._writer
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return self._writer
+            reader, writer = await asyncio.open_unix_connection(self.path)
+            for routing_key in list(self._subscribers):
+                await self._write(writer, _SUBSCRIBE, routing_key.encode())
+            self._writer = writer
+            self._reader_task = asyncio.get_running_loop().create_task(self._read_messages(reader))
+            logger.info(f"Connected to MCP transport at {self.path}")
+            return writer
+    
+    async def _read_messages(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                kind, data = await self._read_frame(reader)
+                if kind == _MESSAGE:
+                    routing_key, message = self._parse_message(data)
+                    self.deliver(routing_key, message)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logger.warning(f"Lost MCP transport connection to {self.path}")
+            if self._writer is not None:
+                self._writer.close()
+    
+    @staticmethod
+    async def _read_frame(reader: asyncio.StreamReader):
+        kind, size = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+        return kind, await reader.readexactly(size)
+    
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, kind: int, data: bytes):
+        writer.write(_FRAME.pack(kind, len(data)) + data)
+        await writer.drain()
+    
+    @staticmethod
+    def _message_frame(routing_key: str, message: MCPMessage) -> bytes:
+        key = routing_key.encode()
+        body, _ = encode_message(message, CONTENT_TYPE_BINARY)
+        data = struct.pack("!H", len(key)) + key + body
+        return _FRAME.pack(_MESSAGE, len(data)) + data
+    
+    @staticmethod
+    def _parse_message(data: bytes):
+        (size,) = struct.unpack_from("!H", data)
+        routing_key = data[2:2 + size].decode()
+        return routing_key, decode_message(data[2 + size:], CONTENT_TYPE_BINARY)
+
+class RabbitMQTransport(Transport):
+    """The aahb.mcp exchange: publishes through MCPPublisher, subscribes with
+    an exclusive queue per subscription (replies; agents use BrokerConsumer)"""
+    
+    def __init__(
+        self,
+        connect: Optional[Callable[[], Awaitable]] = None,
+        exchange_name: str = "aahb.mcp",
+        publisher: Optional[MCPPublisher] = None
+    ):
+        self.connect = connect
+        self.exchange_name = exchange_name
+        self.publisher = publisher or (MCPPublisher(connect=connect, exchange_name=exchange_name) if connect else None)
+        self.connection = None
+        self.channel = None
+        self.exchange = None
+    
+    async def send(self, message: MCPMessage, wait: bool = False):
+        publisher = self.publisher or await get_publisher()
+        await publisher.publish(message, wait=wait)
+    
+    async def subscribe(self, routing_key: str, handler: Handler):
+        if self.channel is None:
+            self.connection = await (self.connect or self._connect)()
+            self.channel = await self.connection.channel()
+            self.exchange = await self.channel.declare_exchange(
+                self.exchange_name,
+                aio_pika.ExchangeType.DIRECT,
+                durable=True
+            )
+        queue = await self.channel.declare_queue(exclusive=True, auto_delete=True)
+        await queue.bind(self.exchange, routing_key=routing_key.lower())
+        
+        async def on_message(incoming):
+            try:
+                await handler(decode_message(decompress(incoming.body, incoming.content_encoding), incoming.content_type))
+            except Exception as e:
+                logger.error(f"Failed to handle message on {routing_key}: {str(e)}")
+            await incoming.ack()
+        
+        await queue.consume(on_message)
+    
+    async def close(self):
+        if self.publisher is not None:
+            await self.publisher.close()
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = self.channel = self.exchange = None
+    
+    async def _connect(self):
+        return await aio_pika.connect_robust(
+            host=settings.rabbitmq_host,
+            login=settings.rabbitmq_user,
+            password=settings.rabbitmq_password
+        )
+
+def create_transport(kind: Optional[str] = None, server: bool = False) -> Transport:
+    kind = kind or settings.mcp_transport
+    if kind == "rabbitmq":
+        return RabbitMQTransport()
+    if kind == "inprocess":
+        return InProcessTransport()
+    if kind == "unix":
+        return UnixSocketTransport(server=server)
+    raise ValueError(f"Unknown MCP transport: {kind}")
+
+# One transport per process, created on first use; the agent process serves
+_transport: Optional[Transport] = None
+_transport_lock: Optional[asyncio.Lock] = None
+
+async def get_transport(server: bool = False) -> Transport:
+    global _transport, _transport_lock
+    if _transport_lock is None:
+        _transport_lock = asyncio.Lock()
+    async with _transport_lock:
+        if _transport is None:
+            transport = create_transport(server=server)
+            await transport.start()
+            _transport = transport
+    return _transport
+
+def set_transport(transport: Optional[Transport]):
+    """Install a transport, e.g. one InProcessTransport shared by gateway and agents"""
+    global _transport
+    _transport = transport
+
+async def close_transport():
+    global _transport
+    if _transport is not None:
+        await _transport.close()
+        _transport = None
@@ -0,0 +1,86 @@
+"""Replay a captured MCP trace against the orchestrator and report latency.
+
+Capture a trace with TRACE_CAPTURE_PATH=/data/mcp-trace.jsonl.gz on the agent
+host, then for example:
+
+    python infrastructure/scripts/replay_trace.py /data/mcp-trace.jsonl.gz --speed 4
+    python infrastructure/scripts/replay_trace.py trace.jsonl.gz --mode async --batch VISION_AGENT=8
+    python infrastructure/scripts/replay_trace.py trace.jsonl.gz --real
+
+Stub agents sleep for the handler time recorded with each message, so
+scheduler and batching changes can be compared on the recorded traffic shape
+without loading any models. --real runs the actual agents instead.
+"""
+import argparse
+import json
+from agents.core.orchestrator import AgentOrchestrator
+from agents.core.async_orchestrator import AsyncAgentOrchestrator
+from agents.core.trace import TraceReplayer
+from common.logger import get_logger
+
+logger = get_logger("trace_replay")
+
+def parse_sizes(entries):
+    sizes = {}
+    for entry in entries:
+        agent_id, _, size = entry.partition("=")
+        sizes[agent_id.upper()] = int(size)
+    return sizes
+
+def real_agents():
+    from agents import VisionAgent, KnowledgeAgent, PlanningAgent, PersonalityAgent
+    agents = [VisionAgent(), KnowledgeAgent(), PlanningAgent(), PersonalityAgent()]
+    for agent in agents:
+        agent.initialize()
+    return {agent.name: agent for agent in agents}
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay an MCP trace against the orchestrator")
+    parser.add_argument("trace", help="trace file written by TraceRecorder")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed-up factor (default 1x)")
+    parser.add_argument("--mode", choices=("thread", "async"), default="thread")
+    parser.add_argument("--workers", type=int, default=None, help="workers per agent")
+    parser.add_argument("--batch", action="append", default=[], metavar="AGENT=SIZE",
+                        help="batch an agent's messages (repeatable)")
+    parser.add_argument("--service-time", type=float, default=0.0,
+                        help="stub handler time for messages without a recorded one")
+    parser.add_argument("--real", action="store_true", help="run the real agents instead of stubs")
+    args = parser.parse_args()
+    
+    orchestrator = AsyncAgentOrchestrator() if args.mode == "async" else AgentOrchestrator()
+    replayer = TraceReplayer(orchestrator, args.trace, speed=args.speed)
+    # Replies addressed to the original callers have nowhere to go
+    orchestrator.egress = lambda message: None
+    
+    batch_sizes = parse_sizes(args.batch)
+    agents = real_agents() if args.real else {}
+    destinations = sorted({record["header"]["destination"].upper() for record in replayer.records})
+    for agent_id in destinations:
+        if args.real:
+            agent = agents.get(agent_id)
+            if agent is None:
+                logger.warning(f"No real agent for {agent_id}; using a stub")
+            handler = agent.process if agent else replayer.stub_agent(agent_id, args.service_time)
+            batch_handler = agent.process_batch if agent else None
+        else:
+            handler = replayer.stub_agent(agent_id, args.service_time)
+            batch_handler = None
+        if agent_id in batch_sizes and batch_handler is None:
+            batch_handler = lambda messages, handler=handler: [handler(m) for m in messages]
+        orchestrator.register_agent(
+            agent_id,
+            handler,
+            workers=args.workers,
+            batch_handler=batch_handler if agent_id in batch_sizes else None,
+            max_batch_size=batch_sizes.get(agent_id)
+        )
+    
+    orchestrator.start()
+    try:
+        report = replayer.run()
+    finally:
+        orchestrator.stop()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
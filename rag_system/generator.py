@@ -1,6 +1,6 @@
 # rag_system/generator.py
 import json
-from typing import Dict, Any
+from typing import Any, Dict, List
 from langchain.chains import LLMChain
 from langchain_community.llms import OpenAI
 from langchain.prompts import PromptTemplate
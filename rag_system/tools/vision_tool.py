@@ -30,18 +30,21 @@ class VisionTool:
             
             logger.info(f"Image caption: {caption}")
             return caption
-            
+        
         except Exception as e:
             logger.error(f"Image analysis failed: {str(e)}")
             return ""
     
-    def _decode_image(self, image_data: str) -> Image.Image:
-        if isinstance(image_data, str) and image_data.startswith("data:image"):
+    def _decode_image(self, image_data) -> Image.Image:
+        if isinstance(image_data, (bytes, bytearray, memoryview)):
+            # Raw bytes from a binary MCP frame; no base64 step
+            image_bytes = image_data
+        elif isinstance(image_data, str) and image_data.startswith("data:image"):
             # Data URI format: data:image/jpeg;base64,...
             header, encoded = image_data.split(",", 1)
             image_bytes = base64.b64decode(encoded)
         else:
-            # Assume raw bytes
+            # Plain base64 string
             image_bytes = base64.b64decode(image_data)
-            
+        
         return Image.open(BytesIO(image_bytes))
\ No newline at end of file
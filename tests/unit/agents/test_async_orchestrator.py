@@ -0,0 +1,155 @@
+# tests/unit/agents/test_async_orchestrator.py
+import pytest
+import asyncio
+import threading
+import time
+from agents.core.async_orchestrator import AsyncAgentOrchestrator
+from agents.core.agent import BaseAgent
+from agents.core.mcp_protocol import MCPMessage, MCPHeader
+
+def make_message(destination="ASYNC_AGENT", context_id="ctx-1"):
+    return MCPMessage(
+        header=MCPHeader(
+            source="TESTER",
+            destination=destination,
+            context_id=context_id
+        ),
+        payload={"query": "test"}
+    )
+
+@pytest.fixture
+def orchestrator():
+    orchestrator = AsyncAgentOrchestrator(executor_workers=2)
+    yield orchestrator
+    if orchestrator.running:
+        orchestrator.stop()
+
+def test_async_agents_share_one_loop(orchestrator):
+    done = []
+    threads = set()
+    
+    async def handler(message):
+        threads.add(threading.get_ident())
+        # Simulated LLM round trip
+        await asyncio.sleep(0.2)
+        done.append(message.header.context_id)
+    
+    orchestrator.register_agent("ASYNC_AGENT", handler)
+    orchestrator.start()
+    
+    start_time = time.time()
+    for i in range(50):
+        orchestrator.route_message(make_message(context_id=f"ctx-{i}"))
+    while len(done) < 50 and time.time() - start_time < 2:
+        time.sleep(0.01)
+    
+    assert len(done) == 50
+    assert time.time() - start_time < 1  # concurrent, not 50 x 0.2 s
+    assert threads == {orchestrator.thread.ident}
+
+def test_blocking_agent_offloaded_to_executor(orchestrator):
+    async_done = threading.Event()
+    release = threading.Event()
+    
+    async def async_handler(message):
+        async_done.set()
+    
+    orchestrator.register_agent("ASYNC_AGENT", async_handler)
+    orchestrator.register_agent("BLOCKING_AGENT", lambda message: release.wait(2))
+    orchestrator.start()
+    
+    orchestrator.route_message(make_message(destination="BLOCKING_AGENT"))
+    orchestrator.route_message(make_message(destination="ASYNC_AGENT"))
+    
+    # The blocking call must not freeze the event loop
+    assert async_done.wait(0.5)
+    release.set()
+
+def test_async_batch_handler(orchestrator):
+    batches = []
+    
+    async def batch_handler(messages):
+        batches.append([m.header.context_id for m in messages])
+        return [None] * len(messages)
+    
+    orchestrator.register_agent("ASYNC_AGENT", batch_handler, workers=1, batch_handler=batch_handler, max_batch_size=3)
+    orchestrator.start()
+    for i in range(6):
+        orchestrator.route_message(make_message(context_id=f"ctx-{i}"))
+    time.sleep(0.1)
+    
+    assert sum(len(batch) for batch in batches) == 6
+    assert len(batches) < 6
+
+def test_runs_inside_existing_loop():
+    received = []
+    
+    async def handler(message):
+        received.append(message.payload["query"])
+    
+    async def scenario():
+        orchestrator = AsyncAgentOrchestrator()
+        orchestrator.register_agent("ASYNC_AGENT", handler)
+        await orchestrator.start_async()
+        await orchestrator.aroute_message(make_message())
+        await asyncio.sleep(0.05)
+        await orchestrator.stop_async()
+    
+    asyncio.run(scenario())
+    assert received == ["test"]
+
+def test_route_from_loop_reports_failures(orchestrator):
+    received = []
+    
+    async def forwarder(message):
+        # Routed from the orchestrator's own loop, so the enqueue runs as a task
+        orchestrator.route_message(make_message(destination="SINK_AGENT", context_id="ok"))
+        orchestrator.route_message(make_message(destination="SINK_AGENT", context_id="bad"), overflow="bogus")
+    
+    async def sink(message):
+        received.append(message.header.context_id)
+    
+    orchestrator.register_agent("ASYNC_AGENT", forwarder)
+    orchestrator.register_agent("SINK_AGENT", sink)
+    orchestrator.start()
+    orchestrator.route_message(make_message())
+    time.sleep(0.1)
+    
+    assert received == ["ok"]
+    assert orchestrator.stats["route_failures"] == 1
+    assert not orchestrator._routing
+
+class EchoAgent(BaseAgent):
+    def __init__(self):
+        super().__init__("ASYNC_AGENT")
+    
+    def _load_models(self):
+        pass
+    
+    async def process(self, message):
+        await asyncio.sleep(0.01)
+        return self.send_response(message, {"answer": message.header.context_id})
+
+def test_async_agent_default_batch_is_awaited(orchestrator):
+    agent = EchoAgent()
+    replies = []
+    orchestrator.register_agent("ASYNC_AGENT", agent.process, workers=1, batch_handler=agent.process_batch, max_batch_size=3)
+    orchestrator.register_agent("TESTER", replies.append)
+    orchestrator.start()
+    for i in range(3):
+        orchestrator.route_message(make_message(context_id=f"ctx-{i}"))
+    time.sleep(0.2)
+    
+    assert sorted(reply.payload["answer"] for reply in replies) == ["ctx-0", "ctx-1", "ctx-2"]
+
+def test_coroutine_from_sync_handler_is_awaited(orchestrator):
+    agent = EchoAgent()
+    replies = []
+    # Not a coroutine function itself, so it runs on the executor
+    orchestrator.register_agent("ASYNC_AGENT", lambda message: agent.process(message))
+    orchestrator.register_agent("TESTER", replies.append)
+    orchestrator.start()
+    orchestrator.route_message(make_message(context_id="ctx-1"))
+    time.sleep(0.2)
+    
+    assert [reply.payload["answer"] for reply in replies] == ["ctx-1"]
@@ -0,0 +1,238 @@
+# tests/unit/agents/test_broker_consumer.py
+import pytest
+import asyncio
+import aio_pika
+from unittest.mock import MagicMock
+from agents.core.orchestrator import AgentOrchestrator
+from agents.core.broker_consumer import BrokerConsumer
+from agents.core.mcp_protocol import MCPMessage, MCPHeader
+from common.config import settings
+from common.correlation import ReplyListener
+from common.local_broker import LocalBroker
+from common.publisher import MCPPublisher
+from common.compression import compress, decompress
+from common.mcp_codec import encode_message, decode_message
+
+def make_message(i):
+    return MCPMessage(
+        header=MCPHeader(
+            source="TESTER",
+            destination="ECHO_AGENT",
+            context_id=f"ctx-{i}"
+        ),
+        payload={"index": i}
+    )
+
+def echo(message):
+    return MCPMessage(
+        header=MCPHeader(
+            source="ECHO_AGENT",
+            destination=message.header.source,
+            context_id=message.header.context_id,
+            message_type="response"
+        ),
+        payload=message.payload
+    )
+
+async def publish(exchange, message):
+    await exchange.publish(
+        aio_pika.Message(body=message.serialize().encode()),
+        routing_key=message.header.destination.lower()
+    )
+
+async def wait_for(condition, timeout=2):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition() and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+    return condition()
+
+def test_consumes_and_replies_to_source():
+    async def scenario():
+        broker = LocalBroker()
+        orchestrator = AgentOrchestrator()
+        orchestrator.register_agent("ECHO_AGENT", echo, workers=4)
+        orchestrator.start()
+        consumer = BrokerConsumer(orchestrator, connect=broker.connect, prefetch=8, ack_batch_size=4)
+        await consumer.start()
+        
+        # Listen where replies for TESTER are routed
+        channel = await (await broker.connect()).channel()
+        replies = []
+        reply_queue = await channel.declare_queue("tester-replies")
+        await reply_queue.bind(consumer.exchange, routing_key="tester")
+        
+        async def on_reply(incoming):
+            replies.append(decode_message(incoming.body, incoming.content_type))
+            await incoming.ack()
+        
+        await reply_queue.consume(on_reply)
+        for i in range(40):
+            await publish(consumer.exchange, make_message(i))
+        
+        assert await wait_for(lambda: len(replies) == 40 and consumer.stats["acked"] == 40)
+        await consumer.stop()
+        orchestrator.stop()
+        return consumer, replies
+    
+    consumer, replies = asyncio.run(scenario())
+    assert sorted(reply.payload["index"] for reply in replies) == list(range(40))
+    assert all(reply.header.message_type == "response" for reply in replies)
+    # Acks go out in batches, not one frame per message
+    assert consumer.stats["ack_frames"] < 40
+
+def test_egress_uses_publisher_with_shard_and_lane_keys(monkeypatch):
+    monkeypatch.setattr(settings, "shard_nodes", "node-a")
+    
+    async def scenario():
+        broker = LocalBroker()
+        orchestrator = AgentOrchestrator()
+        orchestrator.register_agent("ECHO_AGENT", echo)
+        orchestrator.start()
+        consumer = BrokerConsumer(orchestrator, connect=broker.connect, shard_id="node-a")
+        await consumer.start()
+        listener = ReplyListener("API_GATEWAY", connect=broker.connect)
+        await listener.start()
+        gateway = MCPPublisher(connect=broker.connect)
+        
+        request = make_message(0)
+        request.header.source = "API_GATEWAY"
+        reply = await listener.request(request, gateway.publish, timeout=2)
+        # A low-priority request from a local agent to one on another node
+        onward = make_message(1)
+        onward.header.destination = "REMOTE_AGENT"
+        onward.header.priority = 1
+        consumer.publish_reply(onward)
+        assert await wait_for(lambda: consumer.publisher.stats["confirmed"] == 2)
+        
+        await gateway.close()
+        await listener.stop()
+        await consumer.stop()
+        orchestrator.stop()
+        return reply, [key for _, key, _ in broker.published]
+    
+    reply, routing_keys = asyncio.run(scenario())
+    assert reply.payload == {"index": 0}
+    assert routing_keys == ["echo_agent.node-a", "api_gateway.node-a", "remote_agent.node-a.bulk"]
+
+def test_compressed_bodies_roundtrip():
+    async def scenario():
+        broker = LocalBroker()
+        orchestrator = AgentOrchestrator()
+        orchestrator.register_agent("ECHO_AGENT", echo, workers=1)
+        orchestrator.start()
+        consumer = BrokerConsumer(orchestrator, connect=broker.connect)
+        await consumer.start()
+        
+        channel = await (await broker.connect()).channel()
+        replies = []
+        reply_queue = await channel.declare_queue("tester-replies")
+        await reply_queue.bind(consumer.exchange, routing_key="tester")
+        
+        async def on_reply(incoming):
+            replies.append((incoming.content_encoding, decode_message(decompress(incoming.body, incoming.content_encoding))))
+            await incoming.ack()
+        
+        await reply_queue.consume(on_reply)
+        message = make_message(0)
+        message.payload["context"] = "retrieved passage " * 2000
+        body, content_type = encode_message(message)
+        body, content_encoding = compress(body, encoding="zlib", threshold=1024)
+        await consumer.exchange.publish(
+            aio_pika.Message(body=body, content_type=content_type, content_encoding=content_encoding),
+            routing_key="echo_agent"
+        )
+        
+        assert await wait_for(lambda: len(replies) == 1)
+        await consumer.stop()
+        orchestrator.stop()
+        return replies
+    
+    [(encoding, reply)] = asyncio.run(scenario())
+    assert encoding == "zlib"
+    assert reply.payload["context"] == "retrieved passage " * 2000
+
+def test_prefetch_limits_in_flight_deliveries():
+    async def scenario():
+        broker = LocalBroker()
+        orchestrator = AgentOrchestrator()
+        # Orchestrator is never started, so no delivery is handled or acked
+        orchestrator.register_agent("ECHO_AGENT", MagicMock())
+        consumer = BrokerConsumer(orchestrator, connect=broker.connect, prefetch=3, ack_batch_size=100, ack_interval=10)
+        await consumer.start()
+        
+        for i in range(10):
+            await publish(consumer.exchange, make_message(i))
+        await asyncio.sleep(0.05)
+        
+        delivered = consumer.stats["received"]
+        await consumer.stop()
+        return delivered
+    
+    assert asyncio.run(scenario()) == 3
+
+def test_full_agent_queue_requeues_after_a_delay():
+    async def scenario():
+        broker = LocalBroker()
+        orchestrator = AgentOrchestrator()
+        # Never started: the first message fills the queue, the others are refused
+        orchestrator.register_agent("ECHO_AGENT", MagicMock(), queue_size=1)
+        consumer = BrokerConsumer(orchestrator, connect=broker.connect, prefetch=8, requeue_delay=0.2)
+        await consumer.start()
+        
+        for i in range(3):
+            await publish(consumer.exchange, make_message(i))
+        await asyncio.sleep(0.5)
+        stats = dict(consumer.stats)
+        await consumer.stop()
+        return stats
+    
+    stats = asyncio.run(scenario())
+    # Two refused messages, each redelivered at most a couple of times
+    assert 2 <= stats["requeued"] <= 6
+    assert stats["received"] <= 9
+
+def test_malformed_message_rejected():
+    async def scenario():
+        broker = LocalBroker()
+        orchestrator = AgentOrchestrator()
+        orchestrator.register_agent("ECHO_AGENT", echo)
+        consumer = BrokerConsumer(orchestrator, connect=broker.connect)
+        await consumer.start()
+        
+        await consumer.exchange.publish(aio_pika.Message(body=b"not json"), routing_key="echo_agent")
+        await wait_for(lambda: consumer.stats["rejected"] == 1)
+        await consumer.stop()
+        return consumer
+    
+    consumer = asyncio.run(scenario())
+    assert consumer.stats["rejected"] == 1
+    assert consumer.stats["acked"] == 0
+
+def test_consumes_bulk_queue_and_reports_utilization():
+    async def scenario():
+        broker = LocalBroker()
+        orchestrator = AgentOrchestrator()
+        # Never started: deliveries stay unacked and the window fills up
+        orchestrator.register_agent("ECHO_AGENT", MagicMock())
+        consumer = BrokerConsumer(orchestrator, connect=broker.connect, prefetch=2, ack_batch_size=100, ack_interval=10)
+        await consumer.start()
+        
+        bulk = make_message(0)
+        bulk.header.priority = 1
+        await consumer.exchange.publish(
+            aio_pika.Message(body=bulk.serialize().encode(), priority=1),
+            routing_key="echo_agent.bulk"
+        )
+        await publish(consumer.exchange, make_message(1))
+        await asyncio.sleep(0.1)
+        
+        stats = await consumer.topology_stats()
+        received = consumer.stats["received"]
+        await consumer.stop()
+        return received, stats
+    
+    received, stats = asyncio.run(scenario())
+    assert received == 2
+    assert stats["queues"]["aahb.mcp.echo_agent.bulk"]["consumers"] == 1
+    assert stats["utilization"] < 0.5
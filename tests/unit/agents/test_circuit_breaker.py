@@ -0,0 +1,52 @@
+# tests/unit/agents/test_circuit_breaker.py
+import pytest
+import time
+from agents.core.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker("test_agent", window=10, min_calls=4, failure_rate=0.5, slow_call=1.0,
+                          reset_timeout=0.1, half_open_calls=2)
+
+def test_opens_on_error_rate(breaker):
+    for success in (True, False, True, False):
+        breaker.record(success, 0.01)
+    
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats["rejected"] == 1
+
+def test_slow_calls_count_as_failures(breaker):
+    for _ in range(4):
+        breaker.record(True, 2.0)
+    
+    assert breaker.state == OPEN
+    assert breaker.stats["slow"] == 4
+
+def test_needs_min_calls(breaker):
+    breaker.record(False, 0.01)
+    breaker.record(False, 0.01)
+    
+    assert breaker.state == CLOSED
+
+def test_half_open_trials_close_breaker(breaker):
+    for _ in range(4):
+        breaker.record(False, 0.01)
+    time.sleep(0.15)
+    
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and breaker.allow()
+    assert not breaker.allow()
+    breaker.record(True, 0.01)
+    breaker.record(True, 0.01)
+    assert breaker.state == CLOSED
+
+def test_failed_trial_reopens(breaker):
+    for _ in range(4):
+        breaker.record(False, 0.01)
+    time.sleep(0.15)
+    
+    assert breaker.allow()
+    breaker.record(False, 0.01)
+    assert breaker.state == OPEN
+    assert breaker.stats["opened"] == 2
@@ -0,0 +1,81 @@
+# tests/unit/agents/test_context_store.py
+import pytest
+import time
+from agents.core.context_store import ContextStore
+from agents.core.mcp_protocol import MCPMessage, MCPHeader
+
+def make_message(context_id="ctx-1", payload=None):
+    return MCPMessage(
+        header=MCPHeader(
+            source="TESTER",
+            destination="TEST_AGENT",
+            context_id=context_id
+        ),
+        payload=payload if payload is not None else {"query": "hello"}
+    )
+
+def test_history_is_capped():
+    store = ContextStore(history_limit=3)
+    for i in range(5):
+        store.record(make_message(payload={"step": i}))
+    
+    history = store.history("ctx-1")
+    assert [record["payload"]["step"] for record in history] == [2, 3, 4]
+
+def test_records_drop_large_payload_fields():
+    store = ContextStore(payload_limit=16)
+    record = store.record(make_message(payload={
+        "image_data": "a" * 1000,
+        "audio": b"\x00" * 64,
+        "query": "short",
+        "nested": {"blob": "b" * 100}
+    }))
+    
+    assert record["payload"]["image_data"] == {"omitted": "str", "size": 1000}
+    assert record["payload"]["audio"] == {"omitted": "bytes", "size": 64}
+    assert record["payload"]["query"] == "short"
+    assert record["payload"]["nested"]["blob"]["size"] == 100
+    assert record["source"] == "TESTER"
+
+def test_unparsed_payload_is_not_decoded():
+    store = ContextStore()
+    loads = []
+    header = make_message().header
+    message = MCPMessage.lazy(header, lambda: loads.append(1) or {"query": "hello"})
+    
+    record = store.record(message)
+    
+    assert record["payload"] == {"omitted": "unparsed"}
+    assert loads == []
+
+def test_lru_eviction():
+    store = ContextStore(max_contexts=2)
+    store.record(make_message("ctx-1"))
+    store.record(make_message("ctx-2"))
+    
+    # Touch ctx-1 so ctx-2 becomes least recently used
+    store.get("ctx-1")
+    store.record(make_message("ctx-3"))
+    
+    assert "ctx-1" in store
+    assert "ctx-2" not in store
+    assert store.stats()["evictions"] == 1
+
+def test_ttl_expiry():
+    store = ContextStore(ttl=0.05)
+    store.record(make_message("ctx-1"))
+    time.sleep(0.1)
+    
+    assert store.get("ctx-1") is None
+    assert store.stats()["expirations"] == 1
+
+def test_hit_and_miss_stats():
+    store = ContextStore()
+    store.record(make_message("ctx-1"))
+    store.get("ctx-1")
+    store.get("ctx-unknown")
+    
+    stats = store.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2  # first record plus unknown lookup
+    assert stats["size"] == 1
@@ -0,0 +1,405 @@
+# tests/unit/agents/test_orchestrator.py
+import pytest
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+from agents.core.orchestrator import AgentOrchestrator, AgentQueueFull
+from agents.core.agent import BaseAgent
+from agents.core.circuit_breaker import CircuitBreaker
+from agents.core.mcp_protocol import MCPMessage, MCPHeader, BACKEND_ERROR
+
+def make_message(destination="TEST_AGENT", context_id="ctx-1", message_type="request"):
+    return MCPMessage(
+        header=MCPHeader(
+            source="TESTER",
+            destination=destination,
+            context_id=context_id,
+            message_type=message_type
+        ),
+        payload={"test": "data"}
+    )
+
+@pytest.fixture
+def orchestrator():
+    orchestrator = AgentOrchestrator()
+    yield orchestrator
+    if orchestrator.running:
+        orchestrator.stop()
+
+def test_dispatch_wakes_on_arrival(orchestrator):
+    handled = threading.Event()
+    orchestrator.register_agent("TEST_AGENT", lambda message: handled.set())
+    orchestrator.start()
+    
+    # Let the dispatcher go idle before sending
+    time.sleep(0.2)
+    start_time = time.time()
+    orchestrator.route_message(make_message())
+    
+    assert handled.wait(1)
+    assert time.time() - start_time < 0.05
+
+def test_stop_without_poll_tick(orchestrator):
+    orchestrator.register_agent("TEST_AGENT", MagicMock(), workers=2)
+    orchestrator.start()
+    threads = list(orchestrator.pools["test_agent"].threads)
+    
+    start_time = time.time()
+    orchestrator.stop()
+    
+    assert not any(thread.is_alive() for thread in threads)
+    assert time.time() - start_time < 0.05
+
+def test_requests_dispatched_before_responses(orchestrator):
+    calls = []
+    orchestrator.register_agent("TEST_AGENT", lambda message: calls.append(message.header.message_type))
+    
+    # Queue before starting so ordering is decided by priority alone
+    orchestrator.route_message(make_message(message_type="response"))
+    orchestrator.route_message(make_message(message_type="request"))
+    orchestrator.route_message(make_message(message_type="request"))
+    orchestrator.start()
+    time.sleep(0.1)
+    
+    assert calls == ["request", "request", "response"]
+
+def test_slow_agent_does_not_block_others(orchestrator):
+    release = threading.Event()
+    handled = threading.Event()
+    orchestrator.register_agent("SLOW_AGENT", lambda message: release.wait(2))
+    orchestrator.register_agent("FAST_AGENT", lambda message: handled.set())
+    orchestrator.start()
+    
+    orchestrator.route_message(make_message(destination="SLOW_AGENT"))
+    orchestrator.route_message(make_message(destination="FAST_AGENT"))
+    
+    assert handled.wait(0.5)
+    release.set()
+
+def test_worker_pool_runs_handlers_concurrently(orchestrator):
+    barrier = threading.Barrier(3, timeout=1)
+    released = []
+    orchestrator.register_agent("TEST_AGENT", lambda message: released.append(barrier.wait()), workers=3)
+    orchestrator.start()
+    
+    for _ in range(3):
+        orchestrator.route_message(make_message())
+    
+    # All three handlers must be in flight at once for the barrier to release
+    time.sleep(0.2)
+    assert len(released) == 3
+
+def test_full_queue_rejects(orchestrator):
+    orchestrator.register_agent("TEST_AGENT", MagicMock(), queue_size=1)
+    
+    orchestrator.route_message(make_message())
+    with pytest.raises(AgentQueueFull):
+        orchestrator.route_message(make_message(), overflow="reject")
+
+def test_full_queue_times_out(orchestrator):
+    orchestrator.register_agent("TEST_AGENT", MagicMock(), queue_size=1)
+    
+    orchestrator.route_message(make_message())
+    start_time = time.time()
+    with pytest.raises(AgentQueueFull):
+        orchestrator.route_message(make_message(), overflow="timeout", timeout=0.1)
+    assert time.time() - start_time >= 0.1
+
+def test_unknown_agent_not_routed(orchestrator):
+    assert orchestrator.route_message(make_message(destination="MISSING_AGENT")) is False
+
+def test_request_waits_for_correlated_reply(orchestrator):
+    def answer(message):
+        return MCPMessage(
+            header=MCPHeader(
+                source="TEST_AGENT",
+                destination=message.header.source,
+                context_id=message.header.context_id,
+                message_type="response",
+                correlation_id=message.header.message_id
+            ),
+            payload={"answer": message.payload["test"]}
+        )
+    
+    orchestrator.register_agent("TEST_AGENT", answer)
+    orchestrator.start()
+    
+    reply = orchestrator.request(make_message(), timeout=1)
+    assert reply.payload["answer"] == "data"
+    assert len(orchestrator.correlator) == 0
+
+class StreamingAgent(BaseAgent):
+    def __init__(self):
+        super().__init__("STREAM_AGENT")
+    
+    def _load_models(self):
+        pass
+    
+    def process(self, message):
+        stream = self.open_stream(message)
+        for token in ("partial ", "output"):
+            stream.send(token)
+        return stream.end({"answer": "partial output"})
+
+def test_agent_streams_chunks_before_reply(orchestrator):
+    agent = StreamingAgent()
+    agent.emitter = orchestrator.route_message
+    orchestrator.register_agent("STREAM_AGENT", agent.process)
+    orchestrator.start()
+    
+    request = make_message(destination="STREAM_AGENT")
+    request.payload["stream"] = True
+    chunks = []
+    pending = orchestrator.correlator.expect(request, on_chunk=chunks.append)
+    orchestrator.route_message(request)
+    
+    reply = pending.result(1)
+    assert [chunk.payload["delta"] for chunk in chunks] == ["partial ", "output"]
+    assert all(chunk.header.correlation_id == request.header.message_id for chunk in chunks)
+    assert reply.header.message_type == "stream_end"
+    assert reply.payload == {"answer": "partial output", "chunks": 2}
+
+class LoopBoundAgent(BaseAgent):
+    """Async agent whose client binds to the loop of its first call, like AsyncOpenAI"""
+    
+    def __init__(self):
+        super().__init__("ASYNC_AGENT")
+        self.client_loop = None
+    
+    def _load_models(self):
+        pass
+    
+    async def process(self, message):
+        if self.client_loop is None:
+            self.client_loop = asyncio.get_running_loop()
+        # Fails with "Event loop is closed" or a different-loop error once the first loop is gone
+        reply = self.client_loop.create_future()
+        self.client_loop.call_soon(reply.set_result, {"answer": message.header.context_id})
+        return self.send_response(message, await reply)
+
+def test_async_agent_keeps_its_loop_across_calls(orchestrator):
+    orchestrator.register_agent("ASYNC_AGENT", LoopBoundAgent().process)
+    orchestrator.start()
+    
+    first = orchestrator.request(make_message(destination="ASYNC_AGENT", context_id="ctx-1"), timeout=1)
+    second = orchestrator.request(make_message(destination="ASYNC_AGENT", context_id="ctx-2"), timeout=1)
+    
+    assert first.header.message_type == second.header.message_type == "response"
+    assert [first.payload["answer"], second.payload["answer"]] == ["ctx-1", "ctx-2"]
+
+def test_request_times_out(orchestrator):
+    orchestrator.register_agent("TEST_AGENT", MagicMock(return_value=None))
+    orchestrator.start()
+    
+    with pytest.raises(TimeoutError):
+        orchestrator.request(make_message(), timeout=0.1)
+
+def test_earliest_deadline_first(orchestrator):
+    calls = []
+    orchestrator.register_agent("TEST_AGENT", lambda message: calls.append(message.header.context_id))
+    
+    now = time.time()
+    for context_id, deadline in (("late", now + 30), ("none", None), ("early", now + 10)):
+        message = make_message(context_id=context_id)
+        message.header.deadline = deadline
+        orchestrator.route_message(message)
+    orchestrator.start()
+    time.sleep(0.1)
+    
+    assert calls == ["early", "late", "none"]
+
+def test_expired_request_dropped_with_error_reply(orchestrator):
+    handler = MagicMock()
+    replies = []
+    orchestrator.register_agent("TEST_AGENT", handler)
+    orchestrator.register_agent("TESTER", replies.append)
+    
+    message = make_message()
+    message.header.deadline = time.time() - 1
+    orchestrator.route_message(message)
+    orchestrator.start()
+    time.sleep(0.1)
+    
+    handler.assert_not_called()
+    assert replies[0].header.message_type == "error"
+    assert replies[0].header.correlation_id == message.header.message_id
+    assert orchestrator.stats["expired"] == 1
+
+def test_queued_messages_coalesced_into_batches(orchestrator):
+    batches = []
+    replies = []
+    
+    def batch_handler(messages):
+        batches.append(len(messages))
+        return [
+            MCPMessage(
+                header=MCPHeader(
+                    source="TEST_AGENT",
+                    destination=m.header.source,
+                    context_id=m.header.context_id,
+                    message_type="response",
+                    correlation_id=m.header.message_id
+                ),
+                payload={}
+            )
+            for m in messages
+        ]
+    
+    orchestrator.register_agent("TEST_AGENT", MagicMock(), batch_handler=batch_handler, max_batch_size=4)
+    orchestrator.register_agent("TESTER", replies.append)
+    for i in range(10):
+        orchestrator.route_message(make_message(context_id=f"ctx-{i}"))
+    orchestrator.start()
+    time.sleep(0.2)
+    
+    assert batches == [4, 4, 2]
+    assert sorted(r.header.context_id for r in replies) == sorted(f"ctx-{i}" for i in range(10))
+    assert orchestrator.stats["batched_messages"] == 10
+
+def test_batch_waits_for_stragglers(orchestrator):
+    batches = []
+    orchestrator.register_agent(
+        "TEST_AGENT",
+        MagicMock(),
+        batch_handler=lambda messages: batches.append(len(messages)) or [None] * len(messages),
+        max_batch_size=8,
+        max_batch_wait=0.2
+    )
+    orchestrator.start()
+    
+    orchestrator.route_message(make_message())
+    time.sleep(0.05)
+    orchestrator.route_message(make_message())
+    time.sleep(0.3)
+    
+    assert batches == [2]
+
+def test_batch_completes_every_message_on_failure(orchestrator):
+    completed = []
+    orchestrator.register_agent("TEST_AGENT", MagicMock(), batch_handler=MagicMock(side_effect=RuntimeError("boom")))
+    for i in range(3):
+        orchestrator.route_message(make_message(context_id=f"ctx-{i}"), on_complete=completed.append)
+    orchestrator.start()
+    time.sleep(0.1)
+    
+    assert len(completed) == 3
+
+def test_async_agent_default_batch_is_awaited(orchestrator):
+    agent = LoopBoundAgent()
+    replies = []
+    orchestrator.register_agent("ASYNC_AGENT", agent.process, batch_handler=agent.process_batch, max_batch_size=4)
+    orchestrator.register_agent("TESTER", replies.append)
+    for i in range(4):
+        orchestrator.route_message(make_message(destination="ASYNC_AGENT", context_id=f"ctx-{i}"))
+    orchestrator.start()
+    time.sleep(0.2)
+    
+    assert orchestrator.stats["batches"] == 1
+    assert all(reply.header.message_type == "response" for reply in replies)
+    assert sorted(reply.payload["answer"] for reply in replies) == [f"ctx-{i}" for i in range(4)]
+
+def test_open_circuit_fails_fast(orchestrator):
+    handler = MagicMock(side_effect=RuntimeError("backend down"))
+    replies = []
+    orchestrator.register_agent("TEST_AGENT", handler)
+    orchestrator.register_agent("TESTER", replies.append)
+    orchestrator.pools["test_agent"].breaker = CircuitBreaker("test_agent", min_calls=3, reset_timeout=60)
+    orchestrator.start()
+    
+    for i in range(10):
+        orchestrator.route_message(make_message(context_id=f"ctx-{i}"))
+    time.sleep(0.2)
+    
+    assert handler.call_count == 3
+    assert len(replies) == 10
+    assert all(reply.header.message_type == "error" for reply in replies)
+    assert orchestrator.stats["fast_failed"] == 7
+    assert orchestrator.circuit_states()["test_agent"]["state"] == "open"
+
+def error_reply(message, error_type=None):
+    return MCPMessage(
+        header=MCPHeader(
+            source="TEST_AGENT",
+            destination=message.header.source,
+            context_id=message.header.context_id,
+            message_type="error",
+            correlation_id=message.header.message_id
+        ),
+        payload={"error": "No query provided", "error_type": error_type}
+    )
+
+def test_validation_errors_leave_circuit_closed(orchestrator):
+    handler = MagicMock(side_effect=error_reply)
+    replies = []
+    orchestrator.register_agent("TEST_AGENT", handler)
+    orchestrator.register_agent("TESTER", replies.append)
+    orchestrator.pools["test_agent"].breaker = CircuitBreaker("test_agent", min_calls=3, reset_timeout=60)
+    orchestrator.start()
+    
+    for i in range(10):
+        orchestrator.route_message(make_message(context_id=f"ctx-{i}"))
+    time.sleep(0.2)
+    
+    assert handler.call_count == 10
+    assert orchestrator.stats["fast_failed"] == 0
+    assert orchestrator.circuit_states()["test_agent"]["state"] == "closed"
+
+def test_backend_errors_open_circuit(orchestrator):
+    handler = MagicMock(side_effect=lambda message: error_reply(message, BACKEND_ERROR))
+    orchestrator.register_agent("TEST_AGENT", handler)
+    orchestrator.register_agent("TESTER", MagicMock())
+    orchestrator.pools["test_agent"].breaker = CircuitBreaker("test_agent", min_calls=3, reset_timeout=60)
+    orchestrator.start()
+    
+    for i in range(10):
+        orchestrator.route_message(make_message(context_id=f"ctx-{i}"))
+    time.sleep(0.2)
+    
+    assert handler.call_count == 3
+    assert orchestrator.circuit_states()["test_agent"]["state"] == "open"
+
+def test_batch_checks_circuit_per_message(orchestrator):
+    batches = []
+    replies = []
+    orchestrator.register_agent(
+        "TEST_AGENT", MagicMock(),
+        batch_handler=lambda messages: batches.append(messages) or [None] * len(messages),
+        max_batch_size=4
+    )
+    orchestrator.register_agent("TESTER", replies.append)
+    breaker = CircuitBreaker("test_agent", min_calls=1, reset_timeout=60)
+    breaker.record(False, 0)
+    orchestrator.pools["test_agent"].breaker = breaker
+    
+    # Routed straight to the queue; the open circuit is only checked when the batch is taken
+    for message in (make_message(context_id="req-1"), make_message(context_id="req-2"),
+                    make_message(context_id="resp", message_type="response")):
+        orchestrator.pools["test_agent"].queue.put(orchestrator._queue_item(message))
+    orchestrator.start()
+    time.sleep(0.1)
+    
+    assert [[m.header.context_id for m in batch] for batch in batches] == [["resp"]]
+    assert sorted(reply.header.context_id for reply in replies) == ["req-1", "req-2"]
+    assert all(reply.header.message_type == "error" for reply in replies)
+
+def test_low_priority_shed_when_queue_fills(orchestrator):
+    replies = []
+    orchestrator.register_agent("TEST_AGENT", MagicMock(), queue_size=10)
+    orchestrator.register_agent("TESTER", replies.append)
+    
+    for i in range(8):
+        orchestrator.route_message(make_message(context_id=f"fill-{i}"))
+    low = make_message(context_id="low")
+    low.header.priority = 0
+    high = make_message(context_id="high")
+    high.header.priority = 9
+    orchestrator.route_message(low)
+    orchestrator.route_message(high)
+    
+    assert orchestrator.pools["test_agent"].depth() == 9
+    assert orchestrator.stats["shed"] == 1
+    orchestrator.start()
+    time.sleep(0.1)
+    assert [reply.header.context_id for reply in replies] == ["low"]
+    assert replies[0].payload["error"] == "test_agent is overloaded"
@@ -0,0 +1,82 @@
+# tests/unit/agents/test_process_pool.py
+import pytest
+import os
+import threading
+from agents.core.agent import BaseAgent
+from agents.core.orchestrator import AgentOrchestrator
+from agents.core.process_pool import ProcessAgentHandler, encode_message, decode_message
+from agents.core.mcp_protocol import MCPMessage, MCPHeader
+
+class CountingAgent(BaseAgent):
+    """Reports which process handled the message and how often it loaded models"""
+    
+    def __init__(self):
+        super().__init__("COUNTING_AGENT")
+        self.loads = 0
+    
+    def _load_models(self):
+        self.loads += 1
+    
+    def process(self, message: MCPMessage):
+        return self.send_response(message, {
+            "pid": os.getpid(),
+            "loads": self.loads,
+            "size": len(message.payload["image_data"])
+        })
+
+def make_message(context_id="ctx-1"):
+    return MCPMessage(
+        header=MCPHeader(
+            source="TESTER",
+            destination="COUNTING_AGENT",
+            context_id=context_id
+        ),
+        payload={"image_data": b"\xff" * 1024}
+    )
+
+def test_encode_roundtrip_keeps_raw_bytes():
+    message = make_message()
+    decoded = decode_message(encode_message(message))
+    
+    assert decoded.header.message_id == message.header.message_id
+    assert decoded.payload["image_data"] == b"\xff" * 1024
+
+def test_encode_accepts_blob_store_views():
+    message = make_message()
+    message.payload["image_data"] = memoryview(b"\xff" * 1024)
+    
+    assert decode_message(encode_message(message)).payload["image_data"] == b"\xff" * 1024
+
+def test_agent_runs_in_worker_process():
+    handler = ProcessAgentHandler(CountingAgent, processes=2, start_method="fork")
+    try:
+        responses = [handler(make_message(f"ctx-{i}")) for i in range(4)]
+    finally:
+        handler.shutdown()
+    
+    assert all(response.payload["pid"] != os.getpid() for response in responses)
+    # Models are loaded once per worker, not per message
+    assert all(response.payload["loads"] == 1 for response in responses)
+    assert responses[0].payload["size"] == 1024
+    assert responses[0].header.context_id == "ctx-0"
+
+def test_orchestrator_process_agent():
+    orchestrator = AgentOrchestrator()
+    replies = []
+    done = threading.Event()
+    
+    def collect(message):
+        replies.append(message)
+        done.set()
+    
+    orchestrator.register_process_agent("COUNTING_AGENT", CountingAgent, processes=2, start_method="fork")
+    orchestrator.register_agent("TESTER", collect)
+    orchestrator.start()
+    try:
+        orchestrator.route_message(make_message())
+        assert done.wait(10)
+    finally:
+        orchestrator.stop()
+    
+    assert replies[0].payload["pid"] != os.getpid()
+    assert orchestrator.process_handlers == []
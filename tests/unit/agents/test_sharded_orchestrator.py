@@ -0,0 +1,193 @@
+# tests/unit/agents/test_sharded_orchestrator.py
+import pytest
+import os
+import threading
+import time
+from agents.core.agent import BaseAgent
+from agents.core.orchestrator import AgentOrchestrator, AgentQueueFull
+from agents.core.sharding import ShardedOrchestrator, ProcessShard
+from agents.core.mcp_protocol import MCPMessage, MCPHeader
+
+class EchoAgent(BaseAgent):
+    def __init__(self):
+        super().__init__("ECHO_AGENT")
+    
+    def _load_models(self):
+        pass
+    
+    def process(self, message: MCPMessage):
+        return self.send_response(message, {"pid": os.getpid()})
+
+def make_message(context_id="ctx-1", seq=0, destination="TEST_AGENT"):
+    return MCPMessage(
+        header=MCPHeader(
+            source="TESTER",
+            destination=destination,
+            context_id=context_id
+        ),
+        payload={"seq": seq}
+    )
+
+def make_shard(calls, delay=0.0):
+    shard = AgentOrchestrator()
+    
+    def handler(message):
+        time.sleep(delay)
+        calls.append((message.header.context_id, message.payload["seq"]))
+    
+    # Several workers, so only the sharded orchestrator keeps contexts in order
+    shard.register_agent("TEST_AGENT", handler, workers=4)
+    return shard
+
+@pytest.fixture
+def orchestrator():
+    orchestrator = ShardedOrchestrator(replicas=16)
+    yield orchestrator
+    if orchestrator.running:
+        orchestrator.stop()
+
+def wait_for(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+def test_context_pinned_to_one_shard(orchestrator):
+    calls = {"a": [], "b": []}
+    orchestrator.add_shard("a", make_shard(calls["a"]))
+    orchestrator.add_shard("b", make_shard(calls["b"]))
+    orchestrator.start()
+    
+    for i in range(20):
+        for seq in range(3):
+            orchestrator.route_message(make_message(f"ctx-{i}", seq))
+    assert wait_for(lambda: len(calls["a"]) + len(calls["b"]) == 60)
+    
+    contexts_a = {context_id for context_id, _ in calls["a"]}
+    contexts_b = {context_id for context_id, _ in calls["b"]}
+    assert contexts_a and contexts_b
+    assert not contexts_a & contexts_b
+
+def test_order_kept_within_context(orchestrator):
+    calls = []
+    orchestrator.add_shard("a", make_shard(calls, delay=0.01))
+    orchestrator.start()
+    
+    for seq in range(10):
+        orchestrator.route_message(make_message("ctx-1", seq))
+    assert wait_for(lambda: len(calls) == 10)
+    
+    assert [seq for _, seq in calls] == list(range(10))
+    assert orchestrator.stats["deferred"] == 9
+
+def test_rebalance_keeps_order_and_moves_history(orchestrator):
+    calls = []
+    shards = {name: make_shard(calls, delay=0.02) for name in ("a", "b", "c")}
+    orchestrator.add_shard("a", shards["a"])
+    orchestrator.start()
+    
+    for seq in range(5):
+        for i in range(10):
+            orchestrator.route_message(make_message(f"ctx-{i}", seq))
+        if seq == 1:
+            orchestrator.add_shard("b", shards["b"])
+            orchestrator.add_shard("c", shards["c"])
+    assert wait_for(lambda: len(calls) == 50)
+    
+    for i in range(10):
+        assert [seq for context_id, seq in calls if context_id == f"ctx-{i}"] == list(range(5))
+    moved = [f"ctx-{i}" for i in range(10) if orchestrator.shard_for(f"ctx-{i}") != "a"]
+    assert moved and orchestrator.stats["moved"] == len(moved)
+    for context_id in moved:
+        owner = shards[orchestrator.shard_for(context_id)]
+        assert len(owner.context_store.history(context_id)) == 5
+        assert context_id not in shards["a"].context_store
+
+def test_remove_shard_hands_contexts_over(orchestrator):
+    calls = []
+    shards = {name: make_shard(calls) for name in ("a", "b")}
+    for name, shard in shards.items():
+        orchestrator.add_shard(name, shard)
+    orchestrator.start()
+    
+    for i in range(10):
+        orchestrator.route_message(make_message(f"ctx-{i}"))
+    assert wait_for(lambda: len(calls) == 10)
+    orchestrator.remove_shard("b", timeout=1)
+    for i in range(10):
+        orchestrator.route_message(make_message(f"ctx-{i}", 1))
+    assert wait_for(lambda: len(calls) == 20)
+    
+    for i in range(10):
+        assert len(shards["a"].context_store.history(f"ctx-{i}")) == 2
+
+def test_deferred_message_dropped_on_full_queue_is_completed(orchestrator):
+    release = threading.Event()
+    completed = []
+    shard = AgentOrchestrator()
+    shard.register_agent("TEST_AGENT", lambda message: release.wait(2), workers=1, queue_size=1)
+    orchestrator.add_shard("a", shard)
+    orchestrator.start()
+    
+    orchestrator.route_message(make_message("ctx-a", 0), on_complete=completed.append)
+    assert wait_for(lambda: shard.pools["test_agent"].depth() == 0)
+    orchestrator.route_message(make_message("ctx-b", 0), on_complete=completed.append)
+    # Deferred behind ctx-a's first message; ctx-b still fills the queue when it is dispatched
+    orchestrator.route_message(make_message("ctx-a", 1), timeout=0.05, on_complete=completed.append)
+    release.set()
+    
+    assert wait_for(lambda: len(completed) == 3)
+    assert orchestrator.stats["dropped"] == 1
+
+def test_waiting_messages_per_context_are_capped():
+    orchestrator = ShardedOrchestrator(replicas=16, queue_size=2)
+    calls = []
+    orchestrator.add_shard("a", make_shard(calls, delay=0.2))
+    orchestrator.start()
+    
+    try:
+        # One in flight, two waiting; the next is over the cap
+        for seq in range(3):
+            orchestrator.route_message(make_message("ctx-1", seq), overflow="reject")
+        with pytest.raises(AgentQueueFull):
+            orchestrator.route_message(make_message("ctx-1", 3), overflow="reject")
+        # Other contexts are not affected
+        orchestrator.route_message(make_message("ctx-2", 0), overflow="reject")
+        
+        # 'timeout' waits until the in-flight message completes
+        started = time.monotonic()
+        orchestrator.route_message(make_message("ctx-1", 4), overflow="timeout", timeout=1)
+        assert 0.1 < time.monotonic() - started < 1
+        assert wait_for(lambda: len(calls) == 5)
+    finally:
+        orchestrator.stop()
+    
+    assert [seq for context_id, seq in calls if context_id == "ctx-1"] == [0, 1, 2, 4]
+
+def test_replies_resolve_requests(orchestrator):
+    shard = AgentOrchestrator()
+    shard.register_agent("ECHO_AGENT", EchoAgent().process)
+    orchestrator.add_shard("a", shard)
+    orchestrator.start()
+    
+    message = make_message(destination="ECHO_AGENT")
+    reply = orchestrator.request(message, timeout=1)
+    
+    assert reply.header.correlation_id == message.header.message_id
+
+def test_process_shards():
+    orchestrator = ShardedOrchestrator(replicas=16)
+    for name in ("a", "b"):
+        orchestrator.add_shard(name, ProcessShard({"ECHO_AGENT": EchoAgent}, start_method="fork"))
+    orchestrator.start()
+    try:
+        replies = [
+            orchestrator.request(make_message(f"ctx-{i}", destination="ECHO_AGENT"), timeout=5)
+            for i in range(10)
+        ]
+    finally:
+        orchestrator.stop()
+    
+    pids = {reply.payload["pid"] for reply in replies}
+    assert os.getpid() not in pids
+    assert len(pids) == 2
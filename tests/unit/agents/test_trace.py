@@ -0,0 +1,124 @@
+# tests/unit/agents/test_trace.py
+import pytest
+import threading
+import time
+from agents.core.orchestrator import AgentOrchestrator
+from agents.core.trace import TraceRecorder, TraceReplayer, load_trace
+from agents.core.mcp_protocol import MCPMessage, MCPHeader
+
+def make_message(context_id="ctx-1", payload=None, destination="TEST_AGENT"):
+    return MCPMessage(
+        header=MCPHeader(
+            source="TESTER",
+            destination=destination,
+            context_id=context_id
+        ),
+        payload=payload if payload is not None else {"text": "hello", "image_data": b"\x01" * 64}
+    )
+
+def capture(path, count=5, gap=0.02, service=0.01, include_payloads=False):
+    orchestrator = AgentOrchestrator()
+    
+    def handler(message):
+        time.sleep(service)
+        return MCPMessage(
+            header=MCPHeader(
+                source="TEST_AGENT",
+                destination="OTHER_AGENT",
+                context_id=message.header.context_id
+            ),
+            payload={}
+        )
+    
+    orchestrator.register_agent("TEST_AGENT", handler)
+    orchestrator.register_agent("OTHER_AGENT", lambda message: None)
+    orchestrator.start_capture(str(path), include_payloads)
+    orchestrator.start()
+    for i in range(count):
+        orchestrator.route_message(make_message(f"ctx-{i}"))
+        time.sleep(gap)
+    time.sleep(0.1)
+    orchestrator.stop()
+
+def test_capture_records_shape_not_payload(tmp_path):
+    path = tmp_path / "trace.jsonl.gz"
+    capture(path)
+    meta, records, service = load_trace(str(path))
+    
+    assert meta["payloads"] is False
+    external = [r for r in records if not r["internal"]]
+    assert len(external) == 5
+    assert len(records) == 10  # plus one agent-to-agent message each
+    assert external[0]["shape"]["image_data"] == {"type": "bytes", "size": 64}
+    assert "payload" not in external[0]
+    assert external[1]["t"] - external[0]["t"] >= 0.015
+    assert all(service[r["header"]["message_id"]] >= 0.01 for r in external)
+
+def test_payloads_roundtrip(tmp_path):
+    path = tmp_path / "trace.jsonl.gz"
+    with TraceRecorder(str(path), include_payloads=True) as recorder:
+        recorder.record(make_message())
+    
+    replayer = TraceReplayer(AgentOrchestrator(), str(path))
+    (_, message), = replayer.build_messages()
+    assert message.payload == {"text": "hello", "image_data": b"\x01" * 64}
+    assert message.header.context_id == "ctx-1"
+
+def test_unparsed_payload_is_not_decoded_by_capture(tmp_path):
+    path = tmp_path / "trace.jsonl.gz"
+    loads = []
+    lazy = MCPMessage.lazy(make_message().header, lambda: loads.append(1) or {"text": "hello"})
+    
+    with TraceRecorder(str(path), include_payloads=True) as recorder:
+        recorder.record(lazy)
+        recorder.record(make_message("ctx-2", {"text": "hello"}))
+    
+    _, (unparsed, parsed), _ = load_trace(str(path))
+    assert loads == []
+    assert unparsed["shape"] is None and "payload" not in unparsed
+    assert parsed["shape"] == {"text": {"type": "str", "size": 5}}
+
+def test_entries_beyond_the_queue_are_dropped(tmp_path):
+    path = tmp_path / "trace.jsonl.gz"
+    recorder = TraceRecorder(str(path), max_pending=2)
+    writing = threading.Event()
+    release = threading.Event()
+    build = recorder._entry
+    
+    def slow_entry(*item):
+        writing.set()
+        release.wait(1)
+        return build(*item)
+    
+    recorder._entry = slow_entry
+    recorder.record(make_message("ctx-0"))
+    assert writing.wait(1)
+    for i in range(1, 4):
+        recorder.record(make_message(f"ctx-{i}"))
+    release.set()
+    recorder.close()
+    
+    _, records, _ = load_trace(str(path))
+    assert recorder.count == 3 and recorder.dropped == 1
+    assert [record["header"]["context_id"] for record in records] == ["ctx-0", "ctx-1", "ctx-2"]
+
+def test_replay_reports_latency(tmp_path):
+    path = tmp_path / "trace.jsonl.gz"
+    capture(path, count=5, gap=0.05, service=0.02)
+    
+    orchestrator = AgentOrchestrator()
+    replayer = TraceReplayer(orchestrator, str(path), speed=2.0)
+    orchestrator.register_agent("TEST_AGENT", replayer.stub_agent("TEST_AGENT"))
+    orchestrator.egress = lambda message: None
+    orchestrator.start()
+    try:
+        report = replayer.run(drain_timeout=2)
+    finally:
+        orchestrator.stop()
+    
+    assert report["messages"] == 5
+    assert report["completed"] == 5
+    assert report["latency"]["p50"] >= 0.02
+    # Recorded gaps of ~0.05s at 2x speed
+    assert 0.08 <= report["duration"] < 0.5
+    assert report["agents"]["test_agent"]["count"] == 5
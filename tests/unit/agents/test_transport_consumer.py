@@ -0,0 +1,51 @@
+# tests/unit/agents/test_transport_consumer.py
+import asyncio
+from agents.core.orchestrator import AgentOrchestrator
+from agents.core.transport_consumer import TransportConsumer
+from agents.core.mcp_protocol import MCPMessage, MCPHeader
+from common.transport import InProcessTransport
+
+def echo(message):
+    return MCPMessage(
+        header=MCPHeader(
+            source="ECHO_AGENT",
+            destination=message.header.source,
+            context_id=message.header.context_id,
+            message_type="response"
+        ),
+        payload=message.payload
+    )
+
+def test_in_process_transport_feeds_orchestrator():
+    async def scenario():
+        transport = InProcessTransport()
+        orchestrator = AgentOrchestrator()
+        orchestrator.register_agent("ECHO_AGENT", echo, workers=2)
+        orchestrator.start()
+        consumer = TransportConsumer(orchestrator, transport)
+        await consumer.start()
+        
+        replies = []
+        
+        async def collect(message):
+            replies.append(message)
+        
+        await transport.subscribe("TESTER", collect)
+        for i in range(5):
+            await transport.send(MCPMessage(
+                header=MCPHeader(source="TESTER", destination="ECHO_AGENT", context_id=f"ctx-{i}"),
+                payload={"index": i}
+            ))
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + 2
+        while len(replies) < 5 and loop.time() < deadline:
+            await asyncio.sleep(0.01)
+        await consumer.stop()
+        await transport.close()
+        orchestrator.stop()
+        return replies, consumer.stats
+    
+    replies, stats = asyncio.run(scenario())
+    assert sorted(reply.payload["index"] for reply in replies) == list(range(5))
+    assert stats["received"] == 5 and stats["replies"] == 5
@@ -0,0 +1,116 @@
+# tests/unit/api_gateway/test_agent_request.py
+import asyncio
+from api_gateway.app.services.agent_request import build_agent_request
+from agents.core.agent import BaseAgent
+from agents.core.orchestrator import AgentOrchestrator
+from agents.core.transport_consumer import TransportConsumer
+from common.correlation import ReplyListener
+from common.schemas import AudioProcessingResult, ImageProcessingResult, TextProcessingResult
+from common.transport import InProcessTransport
+
+class QueryAgent(BaseAgent):
+    """Stand-in for the knowledge agent: answers payload["query"]"""
+    
+    def __init__(self):
+        super().__init__("KNOWLEDGE_AGENT")
+    
+    def _load_models(self):
+        pass
+    
+    async def process(self, message):
+        query = message.payload.get("query")
+        if not query:
+            return self._reply(message, "error", {"error": "No query provided"})
+        if self.wants_stream(message):
+            stream = self.open_stream(message)
+            for word in query.split():
+                stream.send(word + " ")
+            return stream.end({"answer": f"re: {query}"})
+        return self.send_response(message, {"answer": f"re: {query}", "context": message.payload.get("context", {})})
+
+def processed_inputs():
+    return {
+        "audio": AudioProcessingResult(text=" where is the exit? ", language="en", duration=1.5, context_id="ctx-a"),
+        "image": ImageProcessingResult(text="EXIT", width=640, height=480, format="JPEG", context_id="ctx-i"),
+        "text": TextProcessingResult(text="hello", token_count=1, context_id="ctx-t")
+    }
+
+def test_modalities_become_a_query_for_the_gateway_agent():
+    message = build_agent_request(processed_inputs(), "ctx-a", deadline=123.0)
+    
+    assert message.header.destination == "KNOWLEDGE_AGENT"
+    assert message.header.deadline == 123.0
+    assert message.payload["query"] == "hello where is the exit?"
+    assert message.payload["context"] == {
+        "modalities": ["audio", "image", "text"],
+        "image_text": "EXIT",
+        "language": "en"
+    }
+
+def test_image_text_is_the_query_when_nothing_was_said():
+    processed = {"image": processed_inputs()["image"]}
+    
+    assert build_agent_request(processed, "ctx-i").payload["query"] == "EXIT"
+
+def run_request(message):
+    async def scenario():
+        transport = InProcessTransport()
+        orchestrator = AgentOrchestrator()
+        orchestrator.register_agent("KNOWLEDGE_AGENT", QueryAgent().process)
+        orchestrator.start()
+        consumer = TransportConsumer(orchestrator, transport)
+        await consumer.start()
+        listener = ReplyListener("API_GATEWAY", transport=transport)
+        await listener.start()
+        
+        try:
+            return await listener.request(message, transport.send, timeout=2)
+        finally:
+            await consumer.stop()
+            await transport.close()
+            orchestrator.stop()
+    
+    return asyncio.run(scenario())
+
+def test_gateway_request_is_answered_by_the_agent():
+    reply = run_request(build_agent_request(processed_inputs(), "ctx-a"))
+    
+    assert reply.header.message_type == "response"
+    assert reply.header.context_id == "ctx-a"
+    assert reply.payload["answer"] == "re: hello where is the exit?"
+
+def test_streamed_gateway_request_yields_chunks_then_end():
+    async def scenario():
+        transport = InProcessTransport()
+        orchestrator = AgentOrchestrator()
+        agent = QueryAgent()
+        orchestrator.register_agent("KNOWLEDGE_AGENT", agent.process)
+        # Chunks leave through the orchestrator, as in start_agents
+        agent.emitter = orchestrator.route_message
+        orchestrator.start()
+        consumer = TransportConsumer(orchestrator, transport)
+        await consumer.start()
+        listener = ReplyListener("API_GATEWAY", transport=transport)
+        await listener.start()
+        
+        message = build_agent_request(processed_inputs(), "ctx-a", stream=True)
+        try:
+            return [reply async for reply in listener.stream(message, transport.send, timeout=2)]
+        finally:
+            await consumer.stop()
+            await transport.close()
+            orchestrator.stop()
+    
+    received = asyncio.run(scenario())
+    assert [m.header.message_type for m in received] == ["stream_chunk"] * 5 + ["stream_end"]
+    assert "".join(m.payload["delta"] for m in received[:-1]) == "hello where is the exit? "
+    assert received[-1].payload["chunks"] == 5
+
+def test_speech_transcript_is_answered_by_the_agent():
+    # The speech endpoint sends each final utterance this way
+    utterance = {"audio": AudioProcessingResult(text="turn left here", language="en", duration=0.9, context_id="ctx-s")}
+    reply = run_request(build_agent_request(utterance, "ctx-s"))
+    
+    assert reply.header.message_type == "response"
+    assert reply.payload["answer"] == "re: turn left here"
+    assert reply.payload["context"] == {"modalities": ["audio"], "language": "en"}
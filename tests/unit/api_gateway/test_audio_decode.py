@@ -0,0 +1,70 @@
+# tests/unit/api_gateway/test_audio_decode.py
+import io
+import wave
+import numpy as np
+import pytest
+from api_gateway.app.services import audio_decode
+from api_gateway.app.services.audio_decode import AudioDecodeError, decode_audio, sniff_format
+
+def make_wav(samples: np.ndarray, rate: int) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1 if samples.ndim == 1 else samples.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue()
+
+def tone(frequency: float, rate: int, seconds: float = 1.0) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    return (np.sin(2 * np.pi * frequency * t) * 16000).astype(np.int16)
+
+def dominant_frequency(audio: np.ndarray, rate: int = 16000) -> float:
+    spectrum = np.abs(np.fft.rfft(audio))
+    return np.fft.rfftfreq(len(audio), 1 / rate)[np.argmax(spectrum)]
+
+def test_wav_header_is_not_read_as_samples():
+    samples = np.array([0, 16384, -16384, 32767], dtype=np.int16)
+    audio = decode_audio(make_wav(samples, 16000))
+    
+    assert audio.dtype == np.float32
+    assert np.allclose(audio, samples / 32768.0)
+
+def test_stereo_wav_is_mixed_down():
+    left = np.full(160, 8192, dtype=np.int16)
+    right = np.full(160, -8192, dtype=np.int16)
+    audio = decode_audio(make_wav(np.stack([left, right], axis=1), 16000))
+    
+    assert audio.shape == (160,)
+    assert np.allclose(audio, 0)
+
+@pytest.mark.parametrize("use_scipy", [True, False])
+def test_wav_is_resampled_to_16k(monkeypatch, use_scipy):
+    if not use_scipy:
+        monkeypatch.setattr(audio_decode, "resample_poly", None)
+    elif audio_decode.resample_poly is None:
+        pytest.skip("scipy is not installed")
+    audio = decode_audio(make_wav(tone(440, 44100), 44100))
+    
+    assert audio.dtype == np.float32
+    assert abs(len(audio) - 16000) <= 1
+    assert abs(dominant_frequency(audio) - 440) <= 2
+    assert 0.4 < np.max(np.abs(audio[100:-100])) < 0.55
+
+def test_raw_pcm_uses_content_type_parameters():
+    samples = np.stack([tone(300, 8000), tone(300, 8000)], axis=1)
+    little = decode_audio(samples.astype("<i2").tobytes(), "capture.pcm", "audio/pcm;rate=8000;channels=2")
+    big = decode_audio(samples.astype(">i2").tobytes(), None, "audio/L16;rate=8000;channels=2")
+    
+    assert sniff_format(b"\x00\x01" * 10, "capture.pcm") == "pcm"
+    assert abs(len(little) - 16000) <= 1
+    assert abs(dominant_frequency(little) - 300) <= 2
+    assert np.allclose(little, big)
+
+def test_compressed_audio_without_soundfile(monkeypatch):
+    monkeypatch.setattr(audio_decode, "soundfile", None)
+    
+    assert sniff_format(b"OggS\x00\x02") == "ogg"
+    assert sniff_format(b"ID3\x04\x00") == "mp3"
+    with pytest.raises(AudioDecodeError, match="soundfile"):
+        decode_audio(b"ID3\x04\x00\x00\x00\x00\x00\x00", "clip.mp3")
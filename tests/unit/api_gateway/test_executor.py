@@ -0,0 +1,45 @@
+# tests/unit/api_gateway/test_executor.py
+import pytest
+import asyncio
+import time
+from api_gateway.app.services import executor
+from common.config import settings
+
+@pytest.fixture(autouse=True)
+def thread_executor(monkeypatch):
+    monkeypatch.setattr(settings, "gateway_executor", "thread")
+    monkeypatch.setattr(settings, "gateway_executor_workers", 2)
+    executor.shutdown_executor()
+    yield
+    executor.shutdown_executor()
+
+def test_blocking_work_leaves_loop_responsive():
+    async def scenario():
+        ticks = []
+        
+        async def ticker():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+        
+        task = asyncio.create_task(ticker())
+        # Two CPU-bound uploads at once, like audio and image in one request
+        started = time.monotonic()
+        results = await asyncio.gather(
+            executor.run_blocking(time.sleep, 0.2),
+            executor.run_blocking(time.sleep, 0.2)
+        )
+        elapsed = time.monotonic() - started
+        task.cancel()
+        return results, elapsed, ticks
+    
+    results, elapsed, ticks = asyncio.run(scenario())
+    assert results == [None, None]
+    # Ran side by side, and the loop kept ticking meanwhile
+    assert elapsed < 0.35
+    assert len(ticks) > 10
+
+def test_unknown_executor(monkeypatch):
+    monkeypatch.setattr(settings, "gateway_executor", "fiber")
+    with pytest.raises(ValueError):
+        executor.get_executor()
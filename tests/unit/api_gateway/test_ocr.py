@@ -0,0 +1,113 @@
+# tests/unit/api_gateway/test_ocr.py
+import pytest
+import asyncio
+import threading
+import time
+from io import BytesIO
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from api_gateway.app.services.ocr import OCRService, prepare_image
+
+class FakeEngine:
+    """Stands in for TesseractEngine; reports the region size and the thread"""
+    
+    created = []
+    
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.thread = threading.get_ident()
+        FakeEngine.created.append(self)
+    
+    def __call__(self, region):
+        time.sleep(self.delay)
+        return f"{region.width}x{region.height}\n"
+
+@pytest.fixture(autouse=True)
+def reset_engines():
+    FakeEngine.created = []
+
+def photo(width=1920, height=1080):
+    """Smooth shading and soft blotches, like a camera frame without text"""
+    y, x = np.mgrid[0:height, 0:width]
+    shading = 100 + 60 * np.sin(x / 200) + 40 * np.cos(y / 150)
+    noise = np.random.default_rng(0).random((height, width)) * 255
+    blotches = np.asarray(Image.fromarray(noise.astype(np.uint8)).filter(ImageFilter.GaussianBlur(6)), dtype=np.float64)
+    return Image.fromarray((shading + (blotches - 128) * 0.8).clip(0, 255).astype(np.uint8)).convert("RGB")
+
+def jpeg(image):
+    buffer = BytesIO()
+    image.save(buffer, "JPEG")
+    return buffer.getvalue()
+
+def test_text_free_photo_skips_ocr():
+    async def scenario():
+        service = OCRService(FakeEngine, workers=2)
+        prepared = prepare_image(jpeg(photo()))
+        text = await service.recognize(prepared.regions)
+        metrics = service.metrics()
+        service.close()
+        return prepared, text, metrics
+    
+    prepared, text, metrics = asyncio.run(scenario())
+    assert prepared.regions == [] and text == ""
+    assert (prepared.width, prepared.height, prepared.format) == (1920, 1080, "JPEG")
+    assert FakeEngine.created == []
+    assert metrics["text_free"] == 1 and metrics["text_free_ratio"] == 1.0
+
+def draw_text(image, position, text, scale=10):
+    """Draw white text `scale` times the size of the built-in bitmap font"""
+    font = ImageFont.load_default()
+    _, _, width, height = font.getbbox(text)
+    glyphs = Image.new("L", (width, height))
+    ImageDraw.Draw(glyphs).text((0, 0), text, fill=255, font=font)
+    glyphs = glyphs.resize((width * scale, height * scale), Image.NEAREST)
+    image.paste("white", position, mask=glyphs)
+
+def test_sign_is_cropped_downscaled_and_binarized():
+    image = photo(4000, 2250)
+    draw = ImageDraw.Draw(image)
+    # Light text on a dark sign
+    draw.rectangle((1000, 800, 3000, 1150), fill="black")
+    draw_text(image, (1050, 840), "EXIT THIS WAY")
+    draw_text(image, (1050, 980), "Platform 4 trains")
+    prepared = prepare_image(jpeg(image), max_side=1600)
+    
+    assert (prepared.width, prepared.height) == (4000, 2250)
+    assert len(prepared.regions) == 1
+    left, top, right, bottom = prepared.boxes[0]
+    # The box is in the 1600 px copy and covers both lines
+    assert left <= 1050 * 0.4 and top <= 840 * 0.4 and bottom >= 1080 * 0.4
+    assert right - left < 1600 / 2
+    region = np.asarray(prepared.regions[0])
+    assert set(np.unique(region)) <= {0, 255}
+    # Inverted to dark text on a light background
+    assert region.mean() > 127
+
+def test_workers_keep_their_engines():
+    async def scenario():
+        service = OCRService(lambda: FakeEngine(delay=0.02), workers=2)
+        regions = [Image.new("L", (10 * (i + 1), 5)) for i in range(8)]
+        first = await service.recognize(regions[:4])
+        second = await service.recognize(regions[4:])
+        metrics = service.metrics()
+        service.close()
+        return first, second, metrics
+    
+    first, second, metrics = asyncio.run(scenario())
+    # Text comes back in region order
+    assert first.split("\n") == ["10x5", "20x5", "30x5", "40x5"]
+    assert second.split("\n") == ["50x5", "60x5", "70x5", "80x5"]
+    assert len(FakeEngine.created) == 2 == metrics["engines"]
+    assert len({engine.thread for engine in FakeEngine.created}) == 2
+    assert metrics["regions"] == 8 and metrics["text_free"] == 0
+
+def test_slow_ocr_times_out():
+    async def scenario():
+        service = OCRService(lambda: FakeEngine(delay=0.3), workers=1)
+        with pytest.raises(TimeoutError):
+            await service.recognize([Image.new("L", (10, 10))], timeout=0.05)
+        metrics = service.metrics()
+        service.close()
+        return metrics
+    
+    assert asyncio.run(scenario())["timeouts"] == 1
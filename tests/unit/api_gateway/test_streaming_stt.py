@@ -0,0 +1,70 @@
+# tests/unit/api_gateway/test_streaming_stt.py
+import asyncio
+import numpy as np
+from api_gateway.app.services.streaming_stt import SpeechStream, VoiceActivityDetector
+
+class FakeService:
+    def __init__(self):
+        self.calls = 0
+    
+    async def transcribe(self, audio):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return {"text": f" {len(audio)} samples ", "language": "en", "duration": len(audio) / 16000}
+
+def tone(seconds, amplitude=0.3):
+    t = np.arange(int(16000 * seconds)) / 16000
+    return (np.sin(2 * np.pi * 220 * t) * amplitude * 32767).astype(np.int16).tobytes()
+
+def silence(seconds):
+    return np.zeros(int(16000 * seconds), dtype=np.int16).tobytes()
+
+def run(chunks, flush=False, pace=0, **kwargs):
+    async def scenario():
+        events = []
+        
+        async def emit(event):
+            events.append(event)
+        
+        stream = SpeechStream(emit, service=FakeService(), vad=VoiceActivityDetector(energy_threshold=0.01), **kwargs)
+        for chunk in chunks:
+            # Capture-sized pieces that do not line up with VAD frames
+            for offset in range(0, len(chunk), 1000):
+                stream.feed(chunk[offset:offset + 1000])
+                await asyncio.sleep(pace)
+        if flush:
+            await stream.flush()
+        else:
+            await asyncio.sleep(0.2)
+        await stream.close()
+        return events
+    
+    return asyncio.run(scenario())
+
+def test_partials_then_final_when_speech_stops():
+    events = run(
+        [silence(0.5), tone(1.5), silence(0.9)],
+        pace=0.005, silence_ms=600, partial_interval=0.5, preroll_ms=90
+    )
+    types = [event["type"] for event in events]
+    assert types[-1] == "final" and "partial" in types
+    assert types.count("final") == 1
+    final = events[-1]
+    assert final["utterance"] == 0
+    # Speech plus pre-roll plus the trailing silence that ended it, not the leading silence
+    samples = int(final["text"].split()[0])
+    assert 16000 * 1.5 < samples < 16000 * (1.5 + 0.09 + 0.7)
+
+def test_two_utterances_in_order():
+    events = run([tone(0.6), silence(0.7), tone(0.6), silence(0.7)], silence_ms=600, partial_interval=5)
+    finals = [event for event in events if event["type"] == "final"]
+    assert [event["utterance"] for event in finals] == [0, 1]
+
+def test_short_noise_is_not_an_utterance():
+    events = run([silence(0.3), tone(0.06), silence(0.9)], silence_ms=600, min_speech_ms=240)
+    assert events == []
+
+def test_flush_finishes_current_utterance():
+    events = run([tone(0.8)], flush=True, partial_interval=5)
+    assert [event["type"] for event in events] == ["final"]
+    assert events[0]["text"] == f"{int(16000 * 0.8) // 480 * 480} samples"
@@ -0,0 +1,81 @@
+# tests/unit/api_gateway/test_transcription.py
+import pytest
+import asyncio
+import time
+import numpy as np
+from api_gateway.app.services.transcription import TranscriptionService
+
+class FakeWhisper:
+    """Stands in for WhisperBatch; records batch sizes"""
+    
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.batches = []
+    
+    def __call__(self, clips):
+        self.batches.append(len(clips))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("decoder exploded")
+        return [{"text": f"{len(clip)} samples", "language": "en", "duration": len(clip) / 16000} for clip in clips]
+
+def clip(samples):
+    return np.zeros(samples, dtype=np.float32)
+
+def test_concurrent_requests_share_batches():
+    async def scenario():
+        whisper = FakeWhisper(delay=0.05)
+        service = TranscriptionService(whisper, max_batch_size=4, max_wait=0.05, workers=1)
+        results = await asyncio.gather(*(service.transcribe(clip(100 * (i + 1))) for i in range(10)))
+        metrics = service.metrics()
+        service.close()
+        return whisper, results, metrics
+    
+    whisper, results, metrics = asyncio.run(scenario())
+    # Every caller gets its own clip's result back
+    assert [result["text"] for result in results] == [f"{100 * (i + 1)} samples" for i in range(10)]
+    assert sum(whisper.batches) == 10 and max(whisper.batches) == 4
+    assert len(whisper.batches) < 10
+    assert metrics["batches"] == len(whisper.batches) and metrics["largest_batch"] == 4
+    assert metrics["queue_depth"] == 0
+
+def test_lone_request_waits_at_most_the_window():
+    async def scenario():
+        service = TranscriptionService(FakeWhisper(), max_batch_size=8, max_wait=0.02)
+        started = time.monotonic()
+        await service.transcribe(clip(16000))
+        elapsed = time.monotonic() - started
+        service.close()
+        return elapsed
+    
+    assert asyncio.run(scenario()) < 0.5
+
+def test_request_timeout():
+    async def scenario():
+        whisper = FakeWhisper(delay=0.2)
+        service = TranscriptionService(whisper, max_batch_size=1, max_wait=0, workers=1)
+        slow = asyncio.ensure_future(service.transcribe(clip(10)))
+        await asyncio.sleep(0.01)
+        # Queued behind the slow batch and dropped before it runs
+        with pytest.raises(TimeoutError):
+            await service.transcribe(clip(20), timeout=0.05)
+        await slow
+        await asyncio.sleep(0.05)
+        service.close()
+        return whisper, service.metrics()
+    
+    whisper, metrics = asyncio.run(scenario())
+    assert metrics["timeouts"] == 1
+    assert whisper.batches == [1]
+
+def test_batch_failure_reaches_every_caller():
+    async def scenario():
+        service = TranscriptionService(FakeWhisper(fail=True), max_batch_size=4, max_wait=0.02)
+        results = await asyncio.gather(*(service.transcribe(clip(10)) for _ in range(3)), return_exceptions=True)
+        service.close()
+        return results, service.metrics()
+    
+    results, metrics = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert metrics["failed"] == 3
@@ -0,0 +1,86 @@
+# tests/unit/common/test_blob_store.py
+import pytest
+import os
+import time
+from unittest.mock import patch
+from common.blob_store import FileBlobStore, MemoryBlobStore, BlobNotFound, set_blob_store, offload, resolve
+from common.mcp_codec import CONTENT_TYPE_BINARY, CONTENT_TYPE_JSON, encode_message, decode_message
+from common.mcp_protocol import MCPMessage, MCPHeader
+
+IMAGE = bytes(range(256)) * 1024
+
+@pytest.fixture
+def store(tmp_path):
+    store = FileBlobStore(root=str(tmp_path), ttl=60)
+    set_blob_store(store)
+    yield store
+    set_blob_store(None)
+
+def make_message():
+    return MCPMessage(
+        header=MCPHeader(source="API_GATEWAY", destination="VISION_AGENT", context_id="ctx-1"),
+        payload={"image_data": IMAGE, "thumbnail": b"\x01\x02", "text": "hi"}
+    )
+
+def test_file_store_roundtrip_without_copy(store):
+    key = store.put(IMAGE)
+    view = store.get(key)
+    
+    assert isinstance(view, memoryview)
+    assert view.readonly
+    assert view == IMAGE
+
+def test_rejects_keys_outside_the_store(store):
+    with pytest.raises(BlobNotFound):
+        store.get("../../etc/passwd")
+    with pytest.raises(BlobNotFound):
+        store.get(f"{int(time.time()) + 60}-{'0' * 32}")
+
+@pytest.mark.parametrize("blobs", [MemoryBlobStore, lambda ttl: FileBlobStore(ttl=ttl)])
+def test_blobs_expire(blobs, tmp_path):
+    with patch("common.blob_store.settings.blob_store_path", str(tmp_path)):
+        store = blobs(ttl=60)
+    key = store.put(IMAGE)
+    stale = store.put(IMAGE, ttl=-5)
+    
+    assert store.sweep() == 1
+    with pytest.raises(BlobNotFound):
+        store.get(stale)
+    assert store.get(key) == IMAGE
+
+def test_offload_only_large_fields():
+    store = MemoryBlobStore()
+    payload = offload({"image_data": IMAGE, "frames": [IMAGE], "small": b"\x00"}, store, threshold=1024)
+    
+    assert payload["image_data"]["size"] == len(IMAGE)
+    assert payload["small"] == b"\x00"
+    assert len(store) == 2
+    assert resolve(payload, store) == {"image_data": IMAGE, "frames": [IMAGE], "small": b"\x00"}
+
+@pytest.mark.parametrize("content_type", [CONTENT_TYPE_BINARY, CONTENT_TYPE_JSON])
+def test_broker_body_carries_only_references(store, content_type):
+    body, _ = encode_message(make_message(), content_type)
+    
+    assert len(body) < 1024
+    assert store.stats["stored"] == 1
+    
+    decoded = decode_message(body, content_type)
+    assert store.stats["resolved"] == 0
+    assert decoded.payload["image_data"] == IMAGE
+    assert decoded.payload["thumbnail"] == b"\x01\x02"
+    assert store.stats["resolved"] == 1
+
+def test_json_for_logging_keeps_bytes_inline(store):
+    message = MCPMessage.parse_raw(make_message().json())
+    
+    assert store.stats["stored"] == 0
+    assert message.payload["image_data"] == IMAGE
+
+def test_missing_blob_fails_when_read(store):
+    body, _ = encode_message(make_message(), CONTENT_TYPE_BINARY)
+    for key in os.listdir(store.root):
+        store.delete(key)
+    
+    decoded = decode_message(body, CONTENT_TYPE_BINARY)
+    with pytest.raises(BlobNotFound):
+        decoded.payload
@@ -0,0 +1,47 @@
+# tests/unit/common/test_compression.py
+import pytest
+import os
+import json
+from common.compression import compress, decompress, compression_stats, reset_stats
+
+TEXT = json.dumps({"context": ["retrieved passage about the museum exhibit"] * 200}).encode()
+
+@pytest.fixture(autouse=True)
+def fresh_stats():
+    reset_stats()
+
+def test_large_text_compressed_and_restored():
+    body, encoding = compress(TEXT, encoding="zlib", threshold=1024)
+    
+    assert encoding == "zlib"
+    assert len(body) < len(TEXT) / 10
+    assert decompress(body, encoding) == TEXT
+    
+    stats = compression_stats()
+    assert stats["compressed"] == 1
+    assert stats["decompressed"] == 1
+    assert stats["ratio"] < 0.1
+    assert stats["compress_seconds"] > 0
+
+def test_small_bodies_left_alone():
+    body, encoding = compress(b'{"text":"hi"}', encoding="zlib", threshold=1024)
+    
+    assert encoding is None
+    assert body == b'{"text":"hi"}'
+    assert compression_stats()["skipped"] == 1
+
+def test_incompressible_body_sent_as_is():
+    noise = os.urandom(16384)
+    body, encoding = compress(noise, encoding="zlib", threshold=1024)
+    
+    assert encoding is None
+    assert body == noise
+    assert compression_stats()["incompressible"] == 1
+
+def test_disabled_and_unknown_encodings():
+    assert compress(TEXT, encoding="", threshold=0) == (TEXT, None)
+    assert decompress(TEXT, None) == TEXT
+    with pytest.raises(ValueError):
+        decompress(TEXT, "brotli")
+    with pytest.raises(ValueError):
+        decompress(b"not zlib", "zlib")
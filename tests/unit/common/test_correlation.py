@@ -0,0 +1,160 @@
+# tests/unit/common/test_correlation.py
+import pytest
+import asyncio
+import threading
+import aio_pika
+from common.correlation import ResponseCorrelator, ReplyListener
+from common.local_broker import LocalBroker
+from common.mcp_protocol import MCPMessage, MCPHeader
+
+def make_request(context_id="ctx-1"):
+    return MCPMessage(
+        header=MCPHeader(
+            source="API_GATEWAY",
+            destination="KNOWLEDGE_AGENT",
+            context_id=context_id
+        ),
+        payload={"query": "test"}
+    )
+
+def make_reply(request, correlated=True, answer="42"):
+    return MCPMessage(
+        header=MCPHeader(
+            source="KNOWLEDGE_AGENT",
+            destination=request.header.source,
+            context_id=request.header.context_id,
+            message_type="response",
+            correlation_id=request.header.message_id if correlated else None
+        ),
+        payload={"answer": answer}
+    )
+
+def test_reply_resolves_by_message_id():
+    correlator = ResponseCorrelator()
+    first, second = make_request(), make_request()
+    pending_first = correlator.expect(first)
+    pending_second = correlator.expect(second)
+    
+    assert correlator.resolve(make_reply(second, answer="second"))
+    assert pending_second.result(0.1).payload["answer"] == "second"
+    assert not pending_first.future.done()
+
+def test_reply_falls_back_to_context_id():
+    correlator = ResponseCorrelator()
+    request = make_request("ctx-legacy")
+    pending = correlator.expect(request)
+    
+    assert correlator.resolve(make_reply(request, correlated=False))
+    assert pending.result(0.1).header.context_id == "ctx-legacy"
+    assert len(correlator) == 0
+
+def test_unmatched_reply():
+    correlator = ResponseCorrelator()
+    
+    assert not correlator.resolve(make_reply(make_request()))
+    assert correlator.stats["unmatched"] == 1
+
+def test_timeout_discards_pending():
+    correlator = ResponseCorrelator()
+    pending = correlator.expect(make_request())
+    
+    with pytest.raises(TimeoutError):
+        pending.result(0.05)
+    assert len(correlator) == 0
+    assert correlator.stats["timeouts"] == 1
+
+def test_resolve_from_another_thread():
+    correlator = ResponseCorrelator()
+    request = make_request()
+    pending = correlator.expect(request)
+    
+    async def wait():
+        threading.Timer(0.05, correlator.resolve, args=(make_reply(request),)).start()
+        return await pending.wait(1)
+    
+    assert asyncio.run(wait()).payload["answer"] == "42"
+
+def test_reply_listener_round_trip():
+    async def scenario():
+        broker = LocalBroker()
+        listener = ReplyListener("API_GATEWAY", connect=broker.connect)
+        await listener.start()
+        exchange = broker.exchanges["aahb.mcp"]
+        
+        async def send(message):
+            # Stand-in agent answering through the exchange
+            reply = make_reply(message)
+            await exchange.publish(aio_pika.Message(body=reply.json().encode()), routing_key="api_gateway")
+        
+        reply = await listener.request(make_request(), send, timeout=1)
+        await listener.stop()
+        return reply
+    
+    assert asyncio.run(scenario()).payload["answer"] == "42"
+
+def make_chunk(request, index):
+    return MCPMessage(
+        header=MCPHeader(
+            source="KNOWLEDGE_AGENT",
+            destination=request.header.source,
+            context_id=request.header.context_id,
+            message_type="stream_chunk",
+            correlation_id=request.header.message_id
+        ),
+        payload={"delta": f"tok{index} ", "index": index}
+    )
+
+def test_stream_chunks_leave_request_pending():
+    correlator = ResponseCorrelator()
+    request = make_request()
+    chunks = []
+    pending = correlator.expect(request, on_chunk=chunks.append)
+    
+    assert correlator.resolve(make_chunk(request, 0))
+    assert correlator.resolve(make_chunk(request, 1))
+    assert not pending.future.done()
+    assert [chunk.payload["index"] for chunk in chunks] == [0, 1]
+    
+    assert correlator.resolve(make_reply(request))
+    assert pending.result(0.1).payload["answer"] == "42"
+    assert correlator.stats["chunks"] == 2
+
+def test_reply_listener_streams_chunks_then_reply():
+    async def scenario():
+        broker = LocalBroker()
+        listener = ReplyListener("API_GATEWAY", connect=broker.connect)
+        await listener.start()
+        exchange = broker.exchanges["aahb.mcp"]
+        
+        async def send(message):
+            for index in range(3):
+                chunk = make_chunk(message, index)
+                await exchange.publish(aio_pika.Message(body=chunk.json().encode()), routing_key="api_gateway")
+            reply = make_reply(message)
+            reply.header.message_type = "stream_end"
+            await exchange.publish(aio_pika.Message(body=reply.json().encode()), routing_key="api_gateway")
+        
+        received = [message async for message in listener.stream(make_request(), send, timeout=1)]
+        await listener.stop()
+        return received, listener.correlator
+    
+    received, correlator = asyncio.run(scenario())
+    assert [m.header.message_type for m in received] == ["stream_chunk"] * 3 + ["stream_end"]
+    assert "".join(m.payload["delta"] for m in received[:3]) == "tok0 tok1 tok2 "
+    assert len(correlator) == 0
+
+def test_stalled_stream_times_out():
+    async def scenario():
+        listener = ReplyListener("API_GATEWAY", connect=LocalBroker().connect)
+        await listener.start()
+        
+        async def send(message):
+            pass
+        
+        with pytest.raises(TimeoutError):
+            async for _ in listener.stream(make_request(), send, timeout=0.05):
+                pass
+        await listener.stop()
+        return listener.correlator
+    
+    assert asyncio.run(scenario()).stats["timeouts"] == 1
@@ -0,0 +1,56 @@
+# tests/unit/common/test_mcp_codec.py
+import pytest
+import json
+from common.mcp_codec import (
+    CONTENT_TYPE_BINARY, CONTENT_TYPE_JSON, MCPCodecError,
+    encode_message, decode_message
+)
+from common.mcp_protocol import MCPMessage, MCPHeader
+
+IMAGE = bytes(range(256)) * 64
+
+def make_message():
+    return MCPMessage(
+        header=MCPHeader(
+            source="API_GATEWAY",
+            destination="VISION_AGENT",
+            context_id="ctx-1",
+            deadline=1234.5
+        ),
+        payload={"image_data": IMAGE, "frames": [b"\x00\x01", {"audio": b"\xff"}], "text": "hi"}
+    )
+
+@pytest.mark.parametrize("content_type", [CONTENT_TYPE_BINARY, CONTENT_TYPE_JSON])
+def test_roundtrip(content_type):
+    message = make_message()
+    body, used = encode_message(message, content_type)
+    decoded = decode_message(body, used)
+    
+    assert used == content_type
+    assert decoded.header == message.header
+    assert decoded.payload == message.payload
+
+def test_binary_carries_bytes_raw():
+    binary, _ = encode_message(make_message(), CONTENT_TYPE_BINARY)
+    text, _ = encode_message(make_message(), CONTENT_TYPE_JSON)
+    
+    assert IMAGE in binary
+    assert len(binary) < len(IMAGE) + 1024
+    assert len(text) > len(IMAGE) * 4 / 3
+
+def test_sniffs_encoding_without_content_type():
+    binary, _ = encode_message(make_message(), CONTENT_TYPE_BINARY)
+    assert decode_message(binary).payload["image_data"] == IMAGE
+    
+    # Plain JSON from older senders still decodes
+    legacy = json.dumps({"header": make_message().header.dict(), "payload": {"text": "hi"}})
+    assert decode_message(legacy.encode()).payload == {"text": "hi"}
+
+def test_truncated_frame_rejected():
+    binary, _ = encode_message(make_message(), CONTENT_TYPE_BINARY)
+    with pytest.raises(MCPCodecError):
+        decode_message(binary[:-10], CONTENT_TYPE_BINARY)
+
+def test_unknown_content_type():
+    with pytest.raises(MCPCodecError):
+        encode_message(make_message(), "text/plain")
@@ -0,0 +1,54 @@
+# tests/unit/common/test_mcp_protocol.py
+import pytest
+from common.mcp_codec import CONTENT_TYPE_BINARY, CONTENT_TYPE_JSON, MCPCodecError, encode_message, decode_message
+from common.mcp_protocol import MCPMessage, MCPHeader
+
+def make_header(**fields):
+    return MCPHeader(source="API_GATEWAY", destination="VISION_AGENT", context_id="ctx-1", **fields)
+
+def test_header_defaults_are_per_message():
+    first, second = make_header(), make_header()
+    assert first.message_id != second.message_id
+    assert second.timestamp >= first.timestamp
+
+def test_agents_share_the_common_model():
+    from agents.core.mcp_protocol import MCPMessage as AgentMessage
+    assert AgentMessage is MCPMessage
+
+@pytest.mark.parametrize("content_type", [CONTENT_TYPE_BINARY, CONTENT_TYPE_JSON])
+def test_payload_parsed_on_first_read(content_type):
+    body, _ = encode_message(MCPMessage(header=make_header(), payload={"image_data": b"\x00" * 64}), content_type)
+    message = decode_message(body, content_type)
+    
+    assert message.header.destination == "VISION_AGENT"
+    assert not message.payload_loaded
+    assert message.payload["image_data"] == b"\x00" * 64
+    assert message.payload_loaded
+
+def test_bad_payload_fails_when_read():
+    body, _ = encode_message(MCPMessage(header=make_header(), payload={"text": "hi"}), CONTENT_TYPE_BINARY)
+    # Corrupt the payload JSON but keep the frame layout intact
+    message = decode_message(body.replace(b'"text"', b'"text}'), CONTENT_TYPE_BINARY)
+    
+    assert message.header.source == "API_GATEWAY"
+    with pytest.raises(MCPCodecError):
+        message.payload
+
+def test_header_validated_on_decode():
+    body, _ = encode_message(MCPMessage(header=make_header(), payload={}), CONTENT_TYPE_JSON)
+    with pytest.raises(MCPCodecError):
+        decode_message(body.replace(b'"priority":5', b'"priority":12'), CONTENT_TYPE_JSON)
+
+def test_validation_and_trusted_construct():
+    with pytest.raises(ValueError):
+        MCPMessage(header=make_header(), payload=["not", "a", "dict"])
+    with pytest.raises(ValueError):
+        MCPMessage(header={"source": "API_GATEWAY"}, payload={})
+    
+    trusted = MCPMessage.construct({"source": "A", "destination": "B", "context_id": "c"}, {"x": 1})
+    assert trusted.header.message_id
+    assert trusted.payload == {"x": 1}
+
+def test_serialize_roundtrip_keeps_bytes():
+    message = MCPMessage(header=make_header(), payload={"audio": b"\xff\xfe", "text": "hi"})
+    assert MCPMessage.deserialize(message.serialize()) == message
@@ -0,0 +1,121 @@
+# tests/unit/common/test_publisher.py
+import pytest
+import asyncio
+from unittest.mock import patch
+import common.publisher as publisher_module
+from common.local_broker import LocalBroker
+from common.mcp_codec import decode_message
+from common.mcp_protocol import MCPMessage, MCPHeader
+from common.publisher import MCPPublisher
+
+def make_message(i=0):
+    return MCPMessage(
+        header=MCPHeader(
+            source="API_GATEWAY",
+            destination="KNOWLEDGE_AGENT",
+            context_id=f"ctx-{i}"
+        ),
+        payload={"index": i}
+    )
+
+async def bound_queue(broker, routing_key="knowledge_agent"):
+    channel = await (await broker.connect()).channel()
+    await channel.declare_exchange("aahb.mcp")
+    queue = await channel.declare_queue(routing_key)
+    await queue.bind("aahb.mcp", routing_key=routing_key)
+    return queue
+
+def test_reuses_one_channel_and_declares_once():
+    async def scenario():
+        broker = LocalBroker()
+        queue = await bound_queue(broker)
+        declared = broker.declarations
+        publisher = MCPPublisher(connect=broker.connect)
+        for i in range(100):
+            await publisher.publish(make_message(i))
+        # Publishing returned before the confirms came back
+        assert publisher.in_flight > 0
+        await publisher.flush()
+        await publisher.close()
+        return broker, queue, publisher, broker.declarations - declared
+    
+    broker, queue, publisher, declarations = asyncio.run(scenario())
+    assert len(broker.connections) == 2  # the test's own and the publisher's
+    assert declarations == 1
+    assert publisher.stats["confirmed"] == 100
+    bodies = [decode_message(body) for body, *_ in queue.queue.messages]
+    assert [m.payload["index"] for m in bodies] == list(range(100))
+
+def test_reconnects_after_broker_restart():
+    async def scenario():
+        broker = LocalBroker()
+        queue = await bound_queue(broker)
+        publisher = MCPPublisher(connect=broker.connect)
+        await publisher.publish(make_message(0), wait=True)
+        await broker.drop_connections()
+        await publisher.publish(make_message(1), wait=True)
+        await publisher.close()
+        return queue, publisher
+    
+    queue, publisher = asyncio.run(scenario())
+    assert publisher.stats["reconnects"] == 1
+    assert publisher.stats["confirmed"] == 2
+    assert queue.queue.message_count == 2
+
+def test_unconfirmed_publish_raises_when_waited_on():
+    async def scenario():
+        broker = LocalBroker()
+        publisher = MCPPublisher(connect=broker.connect, retries=1)
+        with patch("common.local_broker.LocalExchange.publish", side_effect=ConnectionError("nack")):
+            with pytest.raises(ConnectionError):
+                await publisher.publish(make_message(), wait=True)
+            # Fire-and-forget failures are counted and logged, not raised
+            await publisher.publish(make_message())
+            await publisher.flush()
+        return publisher
+    
+    publisher = asyncio.run(scenario())
+    assert publisher.stats["failed"] == 2
+    assert publisher.stats["retried"] == 2
+
+def test_window_limits_unconfirmed_publishes():
+    async def scenario():
+        broker = LocalBroker()
+        publisher = MCPPublisher(connect=broker.connect, max_in_flight=4)
+        gate = asyncio.Event()
+        peak = 0
+        
+        async def slow_confirm(*args, **kwargs):
+            await gate.wait()
+        
+        with patch("common.local_broker.LocalExchange.publish", side_effect=slow_confirm):
+            sender = asyncio.ensure_future(asyncio.gather(*(publisher.publish(make_message(i)) for i in range(10))))
+            await asyncio.sleep(0.05)
+            peak = publisher.in_flight
+            gate.set()
+            await sender
+            await publisher.flush()
+        return peak, publisher
+    
+    peak, publisher = asyncio.run(scenario())
+    assert peak == 4
+    assert publisher.stats["confirmed"] == 10
+
+def test_send_mcp_message_uses_shared_publisher():
+    from common.utilis import send_mcp_message
+    
+    async def scenario():
+        broker = LocalBroker()
+        queue = await bound_queue(broker)
+        publisher_module._publisher = MCPPublisher(connect=broker.connect)
+        try:
+            await send_mcp_message(make_message(1), "unused-host")
+            await send_mcp_message(make_message(2), "unused-host", wait=True)
+            await publisher_module.close_publisher()
+        finally:
+            publisher_module._publisher = None
+        return broker, queue
+    
+    broker, queue = asyncio.run(scenario())
+    assert queue.queue.message_count == 2
+    assert len(broker.connections) == 2
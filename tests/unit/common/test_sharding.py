@@ -0,0 +1,33 @@
+# tests/unit/common/test_sharding.py
+import pytest
+from collections import Counter
+from common.config import settings
+from common.sharding import HashRing, shard_routing_key
+
+def test_ring_spreads_keys_across_nodes():
+    ring = HashRing(["a", "b", "c"], replicas=64)
+    owners = Counter(ring.get(f"ctx-{i}") for i in range(3000))
+    
+    assert set(owners) == {"a", "b", "c"}
+    assert min(owners.values()) > 600
+
+def test_adding_node_moves_only_its_share():
+    ring = HashRing(["a", "b", "c"], replicas=64)
+    before = {f"ctx-{i}": ring.get(f"ctx-{i}") for i in range(3000)}
+    ring.add("d")
+    moved = [key for key, owner in before.items() if ring.get(key) != owner]
+    
+    assert all(ring.get(key) == "d" for key in moved)
+    assert len(moved) < 1200
+
+def test_empty_ring():
+    assert HashRing().get("ctx-1") is None
+
+def test_routing_key_with_and_without_nodes(monkeypatch):
+    monkeypatch.setattr(settings, "shard_nodes", "")
+    assert shard_routing_key("VISION_AGENT", "ctx-1") == "vision_agent"
+    
+    monkeypatch.setattr(settings, "shard_nodes", "node-a,node-b")
+    key = shard_routing_key("VISION_AGENT", "ctx-1")
+    assert key in ("vision_agent.node-a", "vision_agent.node-b")
+    assert shard_routing_key("VISION_AGENT", "ctx-1") == key
@@ -0,0 +1,106 @@
+# tests/unit/common/test_topology.py
+import pytest
+import asyncio
+from common.local_broker import LocalBroker
+from common.mcp_codec import decode_message
+from common.mcp_protocol import MCPMessage, MCPHeader
+from common.publisher import MCPPublisher
+from common.topology import TopologyManager, lane_routing_key
+
+def make_message(i=0, priority=5):
+    return MCPMessage(
+        header=MCPHeader(
+            source="API_GATEWAY",
+            destination="KNOWLEDGE_AGENT",
+            context_id=f"ctx-{i}",
+            priority=priority
+        ),
+        payload={"index": i}
+    )
+
+async def declare(broker, **kwargs):
+    channel = await (await broker.connect()).channel()
+    exchange = await channel.declare_exchange("aahb.mcp")
+    topology = TopologyManager(**kwargs)
+    queues = await topology.declare_agent(channel, exchange, "knowledge_agent")
+    return topology, channel, queues
+
+def indexes(queue):
+    return [decode_message(body).payload["index"] for body, *_ in queue.queue.messages]
+
+def test_interactive_and_bulk_traffic_use_separate_queues():
+    async def scenario():
+        broker = LocalBroker()
+        _, _, queues = await declare(broker)
+        publisher = MCPPublisher(connect=broker.connect)
+        # Batch ingestion at priority 1, AR requests at 5 and 9
+        for i, priority in enumerate([1, 5, 1, 9, 5]):
+            await publisher.publish(make_message(i, priority))
+        await publisher.close()
+        return queues
+    
+    queues = asyncio.run(scenario())
+    assert queues.interactive.name == "aahb.mcp.knowledge_agent"
+    assert queues.bulk.name == "aahb.mcp.knowledge_agent.bulk"
+    # Highest priority first, FIFO within a priority
+    assert indexes(queues.interactive) == [3, 1, 4]
+    assert indexes(queues.bulk) == [0, 2]
+
+def test_rejected_and_overflowing_messages_are_dead_lettered():
+    async def scenario():
+        broker = LocalBroker()
+        _, _, queues = await declare(broker, max_length=2)
+        publisher = MCPPublisher(connect=broker.connect)
+        for i in range(3):
+            await publisher.publish(make_message(i))
+        await publisher.flush()
+        
+        rejected = asyncio.Event()
+        
+        async def reject(incoming):
+            await incoming.reject(requeue=False)
+            rejected.set()
+        
+        await queues.interactive.consume(reject)
+        await asyncio.wait_for(rejected.wait(), 1)
+        await publisher.close()
+        return queues
+    
+    queues = asyncio.run(scenario())
+    # 0 was pushed out by the max length, 1 was rejected by the consumer
+    assert indexes(queues.dead)[:2] == [0, 1]
+
+def test_queue_stats_report_depth_and_consumers():
+    async def scenario():
+        broker = LocalBroker()
+        topology, channel, queues = await declare(broker)
+        publisher = MCPPublisher(connect=broker.connect)
+        for i in range(4):
+            await publisher.publish(make_message(i, priority=1))
+        await publisher.close()
+        
+        async def hold(incoming):
+            pass
+        
+        await queues.interactive.consume(hold)
+        return await topology.queue_stats(channel)
+    
+    stats = asyncio.run(scenario())
+    assert stats["aahb.mcp.knowledge_agent"] == {"depth": 0, "consumers": 1}
+    assert stats["aahb.mcp.knowledge_agent.bulk"] == {"depth": 4, "consumers": 0}
+    assert stats["aahb.mcp.knowledge_agent.dead"] == {"depth": 0, "consumers": 0}
+
+def test_queue_arguments():
+    topology = TopologyManager(max_length=100, bulk_max_length=1000)
+    interactive = topology.interactive_arguments("vision_agent")
+    assert interactive["x-max-priority"] == 9
+    assert interactive["x-dead-letter-exchange"] == "aahb.mcp.dlx"
+    assert interactive["x-max-length"] == 100
+    assert topology.bulk_arguments("vision_agent") == {
+        "x-queue-mode": "lazy",
+        "x-dead-letter-exchange": "aahb.mcp.dlx",
+        "x-dead-letter-routing-key": "vision_agent",
+        "x-max-length": 1000
+    }
+    assert lane_routing_key("vision_agent.node-a", 0) == "vision_agent.node-a.bulk"
+    assert lane_routing_key("vision_agent.node-a", 5) == "vision_agent.node-a"
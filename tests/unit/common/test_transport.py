@@ -0,0 +1,143 @@
+# tests/unit/common/test_transport.py
+import pytest
+import asyncio
+from common.correlation import ReplyListener
+from common.mcp_protocol import MCPMessage, MCPHeader
+from common.transport import InProcessTransport, UnixSocketTransport, create_transport
+
+def make_message(destination="ECHO_AGENT", source="TESTER", payload=None, message_type="request"):
+    return MCPMessage(
+        header=MCPHeader(
+            source=source,
+            destination=destination,
+            context_id="ctx-1",
+            message_type=message_type
+        ),
+        payload=payload if payload is not None else {"data": b"\x00\x01", "text": "hi"}
+    )
+
+async def wait_for(condition, timeout=2):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition() and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+    return condition()
+
+def test_in_process_delivers_objects_to_every_subscriber():
+    async def scenario():
+        transport = InProcessTransport()
+        first, second = [], []
+        
+        async def collect_first(message):
+            first.append(message)
+        
+        async def collect_second(message):
+            second.append(message)
+        
+        await transport.subscribe("ECHO_AGENT", collect_first)
+        await transport.subscribe("echo_agent", collect_second)
+        message = make_message()
+        await transport.send(message)
+        await transport.send(make_message(destination="NOBODY"))
+        await wait_for(lambda: first and second)
+        await transport.close()
+        return message, first, second, transport.stats
+    
+    message, first, second, stats = asyncio.run(scenario())
+    # No encoding on the way: subscribers get the very same object
+    assert first == [message] and first[0] is message and second[0] is message
+    assert stats == {"sent": 2, "delivered": 2, "unroutable": 1}
+
+def test_unix_socket_round_trip(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "mcp.sock")
+        server = UnixSocketTransport(path, server=True)
+        await server.start()
+        
+        async def echo(message):
+            await server.send(make_message(
+                destination=message.header.source,
+                source="ECHO_AGENT",
+                payload=message.payload,
+                message_type="response"
+            ))
+        
+        await server.subscribe("ECHO_AGENT", echo)
+        client = UnixSocketTransport(path)
+        await client.start()
+        replies = []
+        
+        async def collect(message):
+            replies.append(message)
+        
+        await client.subscribe("TESTER", collect)
+        await client.send(make_message())
+        await wait_for(lambda: replies)
+        await client.close()
+        await server.close()
+        return replies
+    
+    replies = asyncio.run(scenario())
+    assert len(replies) == 1
+    assert replies[0].header.message_type == "response"
+    assert bytes(replies[0].payload["data"]) == b"\x00\x01"
+
+def test_unix_client_resubscribes_after_server_restart(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "mcp.sock")
+        server = UnixSocketTransport(path, server=True)
+        await server.start()
+        client = UnixSocketTransport(path)
+        replies = []
+        
+        async def collect(message):
+            replies.append(message)
+        
+        await client.subscribe("TESTER", collect)
+        await wait_for(lambda: server._peers.get("tester"))
+        await server.close()
+        await wait_for(lambda: client._writer is None or client._writer.is_closing())
+        
+        server = UnixSocketTransport(path, server=True)
+        await server.start()
+        # The next send reconnects and subscribes TESTER again
+        await client.send(make_message(destination="NOBODY"))
+        await wait_for(lambda: server._peers.get("tester"))
+        await server.send(make_message(destination="TESTER", source="ECHO_AGENT"))
+        await wait_for(lambda: replies)
+        await client.close()
+        await server.close()
+        return replies
+    
+    assert len(asyncio.run(scenario())) == 1
+
+def test_reply_listener_over_in_process_transport():
+    async def scenario():
+        transport = InProcessTransport()
+        
+        async def agent(message):
+            await transport.send(MCPMessage(
+                header=MCPHeader(
+                    source="KNOWLEDGE_AGENT",
+                    destination=message.header.source,
+                    context_id=message.header.context_id,
+                    message_type="response",
+                    correlation_id=message.header.message_id
+                ),
+                payload={"answer": "42"}
+            ))
+        
+        await transport.subscribe("KNOWLEDGE_AGENT", agent)
+        listener = ReplyListener("API_GATEWAY", transport=transport)
+        await listener.start()
+        request = make_message(destination="KNOWLEDGE_AGENT", source="API_GATEWAY")
+        reply = await listener.request(request, transport.send, timeout=1)
+        await listener.stop()
+        await transport.close()
+        return reply
+    
+    assert asyncio.run(scenario()).payload["answer"] == "42"
+
+def test_unknown_transport():
+    with pytest.raises(ValueError):
+        create_transport("carrier-pigeon")